@@ -0,0 +1,22 @@
+import base64
+import numpy as np
+import sys
+import timeit
+
+from mldataforge.encoding import a85decode, a85encode
+
+sizes = [int(arg) for arg in sys.argv[1:]] or [2**6, 2**8, 2**10, 2**14, 2**18, 2**22]
+rng = np.random.default_rng(42)
+
+print(f"{'size':>10} {'enc base64':>12} {'enc numpy':>12} {'speedup':>8} {'dec base64':>12} {'dec numpy':>12} {'speedup':>8}")
+for size in sizes:
+    data = rng.integers(0, 256, size=size, dtype=np.uint8).tobytes()
+    encoded = base64.a85encode(data)
+    assert a85encode(data) == encoded
+    assert a85decode(encoded) == data
+    number = max(1, 2**20 // size)
+    enc_ref = timeit.timeit(lambda: base64.a85encode(data), number=number) / number
+    enc_new = timeit.timeit(lambda: a85encode(data), number=number) / number
+    dec_ref = timeit.timeit(lambda: base64.a85decode(encoded, foldspaces=True), number=number) / number
+    dec_new = timeit.timeit(lambda: a85decode(encoded), number=number) / number
+    print(f"{size:>10} {enc_ref*1e6:>10.1f}us {enc_new*1e6:>10.1f}us {enc_ref/enc_new:>7.1f}x {dec_ref*1e6:>10.1f}us {dec_new*1e6:>10.1f}us {dec_ref/dec_new:>7.1f}x")
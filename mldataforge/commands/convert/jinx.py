@@ -25,12 +25,17 @@ def jinx():
 @sort_key_option()
 @lazy_option()
 @override_encoding_option()
+@index_cache_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@where_option()
 def jsonl(**kwargs):
     jinx_to_jsonl(**kwargs)
-def jinx_to_jsonl(output_file, jinx_paths, compression, compression_args, overwrite, yes, trafo, mmap, split, shuffle, index, sort_key, lazy, override_encoding):
+def jinx_to_jsonl(output_file, jinx_paths, compression, compression_args, overwrite, yes, trafo, mmap, split, shuffle, index, sort_key, lazy, override_encoding, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, where=None):
     check_arguments(output_file, overwrite, yes, jinx_paths)
     save_jsonl(
-        load_jinx_paths(jinx_paths, split=split, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, split=split, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -53,18 +58,27 @@ def jinx_to_jsonl(output_file, jinx_paths, compression, compression_args, overwr
 @sort_key_option()
 @lazy_option()
 @override_encoding_option()
+@index_cache_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@append_option()
+@where_option()
+@flush_workers_option()
 def mds(**kwargs):
     jinx_to_mds(**kwargs)
-def jinx_to_mds(output_dir, jinx_paths, compression, compression_args, overwrite, yes, buf_size, shard_size, no_pigz, trafo, mmap, shuffle, index, sort_key, lazy, override_encoding):
-    check_arguments(output_dir, overwrite, yes, jinx_paths)
+def jinx_to_mds(output_dir, jinx_paths, compression, compression_args, overwrite, yes, buf_size, shard_size, no_pigz, trafo, mmap, shuffle, index, sort_key, lazy, override_encoding, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, append=False, where=None, flush_workers=None):
+    check_arguments(output_dir, overwrite, yes, jinx_paths, append=append)
     save_mds(
-        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where),
         output_dir,
         compression=compression,
         compression_args=compression_args,
         buf_size=buf_size,
         pigz=use_pigz(compression, no_pigz),
         shard_size=shard_size,
+        append=append,
+        flush_workers=flush_workers,
     )
 
 @jinx.command()
@@ -81,12 +95,17 @@ def jinx_to_mds(output_dir, jinx_paths, compression, compression_args, overwrite
 @sort_key_option()
 @lazy_option()
 @override_encoding_option()
+@index_cache_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@where_option()
 def msgpack(**kwargs):
     jinx_to_msgpack(**kwargs)
-def jinx_to_msgpack(output_file, jinx_paths, compression, compression_args, overwrite, yes, trafo, mmap, shuffle, index, sort_key, lazy, override_encoding):
+def jinx_to_msgpack(output_file, jinx_paths, compression, compression_args, overwrite, yes, trafo, mmap, shuffle, index, sort_key, lazy, override_encoding, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, where=None):
     check_arguments(output_file, overwrite, yes, jinx_paths)
     save_msgpack(
-        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -107,12 +126,17 @@ def jinx_to_msgpack(output_file, jinx_paths, compression, compression_args, over
 @sort_key_option()
 @lazy_option()
 @override_encoding_option()
+@index_cache_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@where_option()
 def parquet(**kwargs):
     jinx_to_parquet(**kwargs)
-def jinx_to_parquet(output_file, jinx_paths, compression, compression_args, overwrite, yes, batch_size, trafo, mmap, shuffle, index, sort_key, lazy, override_encoding):
+def jinx_to_parquet(output_file, jinx_paths, compression, compression_args, overwrite, yes, batch_size, trafo, mmap, shuffle, index, sort_key, lazy, override_encoding, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, where=None):
     check_arguments(output_file, overwrite, yes, jinx_paths)
     save_parquet(
-        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where),
         output_file,
         compression=compression,
         compression_args=compression_args,
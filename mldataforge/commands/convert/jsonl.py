@@ -24,10 +24,20 @@ def jsonl():
 @encoding_option()
 @binary_threshold_option()
 @ext_sep_option()
+@workers_option()
+@unordered_option()
+@zstd_dict_size_option()
+@zstd_dict_samples_option()
+@compress_rules_option()
+@block_compression_option()
+@block_size_option()
+@block_lines_option()
+@append_option()
+@stats_keys_option()
 def jinx(**kwargs):
     jsonl_to_jinx(**kwargs)
-def jsonl_to_jinx(output_file, jsonl_files, compression, compression_args, overwrite, yes, shard_size, trafo, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep):
-    check_arguments(output_file, overwrite, yes, jsonl_files)
+def jsonl_to_jinx(output_file, jsonl_files, compression, compression_args, overwrite, yes, shard_size, trafo, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, workers=None, unordered=False, zstd_dict_size=None, zstd_dict_samples=2**10, compress_rules=None, block_compression=None, block_size=2**20, block_lines=None, append=False, stats_keys=None):
+    check_arguments(output_file, overwrite, yes, jsonl_files, append=append)
     save_jinx(
         load_jsonl_files(jsonl_files),
         output_file,
@@ -40,6 +50,16 @@ def jsonl_to_jinx(output_file, jsonl_files, compression, compression_args, overw
         encoding=encoding,
         binary_threshold=binary_threshold,
         ext_sep=ext_sep,
+        workers=workers,
+        unordered=unordered,
+        zstd_dict_size=zstd_dict_size,
+        zstd_dict_samples=zstd_dict_samples,
+        compress_rules=compress_rules,
+        block_compression=block_compression,
+        block_size=block_size,
+        block_lines=block_lines,
+        append=append,
+        stats_keys=stats_keys,
     )
 
 @jsonl.command()
@@ -53,10 +73,12 @@ def jsonl_to_jinx(output_file, jsonl_files, compression, compression_args, overw
 @shard_size_option()
 @no_pigz_option()
 @trafo_option()
+@append_option()
+@flush_workers_option()
 def mds(**kwargs):
     jsonl_to_mds(**kwargs)
-def jsonl_to_mds(output_dir, jsonl_files, compression, compression_args, overwrite, yes, buf_size, shard_size, no_pigz, trafo):
-    check_arguments(output_dir, overwrite, yes, jsonl_files)
+def jsonl_to_mds(output_dir, jsonl_files, compression, compression_args, overwrite, yes, buf_size, shard_size, no_pigz, trafo, append=False, flush_workers=None):
+    check_arguments(output_dir, overwrite, yes, jsonl_files, append=append)
     save_mds(
         load_jsonl_files(jsonl_files),
         output_dir,
@@ -66,6 +88,8 @@ def jsonl_to_mds(output_dir, jsonl_files, compression, compression_args, overwri
         pigz=use_pigz(compression, no_pigz),
         shard_size=shard_size,
         trafo=trafo,
+        append=append,
+        flush_workers=flush_workers,
     )
 
 @jsonl.command()
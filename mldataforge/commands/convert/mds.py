@@ -30,12 +30,29 @@ def mds():
 @encoding_option()
 @binary_threshold_option()
 @ext_sep_option()
+@workers_option()
+@unordered_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@zstd_dict_size_option()
+@zstd_dict_samples_option()
+@compress_rules_option()
+@block_compression_option()
+@block_size_option()
+@block_lines_option()
+@append_option()
+@stats_keys_option()
+@scratch_dir_option()
+@scratch_bytes_option()
+@where_option()
+@shard_workers_option()
 def jinx(**kwargs):
     mds_to_jinx(**kwargs)
-def mds_to_jinx(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, shard_size, trafo, shuffle, index, sort_key, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep):
-    check_arguments(output_file, overwrite, yes, mds_directories)
+def mds_to_jinx(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, shard_size, trafo, shuffle, index, sort_key, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, workers=None, unordered=False, prefetch=None, prefetch_backend="process", columns=None, zstd_dict_size=None, zstd_dict_samples=2**10, compress_rules=None, block_compression=None, block_size=2**20, block_lines=None, append=False, stats_keys=None, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None):
+    check_arguments(output_file, overwrite, yes, mds_directories, append=append)
     save_jinx(
-        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key),
+        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes, where=where, shard_workers=shard_workers),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -46,6 +63,16 @@ def mds_to_jinx(output_file, mds_directories, compression, compression_args, ove
         encoding=encoding,
         binary_threshold=binary_threshold,
         ext_sep=ext_sep,
+        workers=workers,
+        unordered=unordered,
+        zstd_dict_size=zstd_dict_size,
+        zstd_dict_samples=zstd_dict_samples,
+        compress_rules=compress_rules,
+        block_compression=block_compression,
+        block_size=block_size,
+        block_lines=block_lines,
+        append=append,
+        stats_keys=stats_keys,
     )
 
 @mds.command()
@@ -62,12 +89,19 @@ def mds_to_jinx(output_file, mds_directories, compression, compression_args, ove
 @shuffle_option()
 @index_option()
 @sort_key_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@scratch_dir_option()
+@scratch_bytes_option()
+@where_option()
+@shard_workers_option()
 def jsonl(**kwargs):
     mds_to_jsonl(**kwargs)
-def mds_to_jsonl(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, trafo, shuffle, index, sort_key):
+def mds_to_jsonl(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, trafo, shuffle, index, sort_key, prefetch=None, prefetch_backend="process", columns=None, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None):
     check_arguments(output_file, overwrite, yes, mds_directories)
     save_jsonl(
-        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key),
+        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes, where=where, shard_workers=shard_workers),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -88,12 +122,19 @@ def mds_to_jsonl(output_file, mds_directories, compression, compression_args, ov
 @shuffle_option()
 @index_option()
 @sort_key_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@scratch_dir_option()
+@scratch_bytes_option()
+@where_option()
+@shard_workers_option()
 def msgpack(**kwargs):
     mds_to_msgpack(**kwargs)
-def mds_to_msgpack(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, trafo, shuffle, index, sort_key):
+def mds_to_msgpack(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, trafo, shuffle, index, sort_key, prefetch=None, prefetch_backend="process", columns=None, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None):
     check_arguments(output_file, overwrite, yes, mds_directories)
     save_msgpack(
-        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key),
+        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes, where=where, shard_workers=shard_workers),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -115,12 +156,19 @@ def mds_to_msgpack(output_file, mds_directories, compression, compression_args,
 @shuffle_option()
 @index_option()
 @sort_key_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@scratch_dir_option()
+@scratch_bytes_option()
+@where_option()
+@shard_workers_option()
 def parquet(**kwargs):
     mds_to_parquet(**kwargs)
-def mds_to_parquet(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, trafo, shuffle, index, sort_key):
+def mds_to_parquet(output_file, mds_directories, compression, compression_args, overwrite, yes, split, batch_size, reader, trafo, shuffle, index, sort_key, prefetch=None, prefetch_backend="process", columns=None, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None):
     check_arguments(output_file, overwrite, yes, mds_directories)
     save_parquet(
-        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key),
+        load_mds_directories(mds_directories, split=split, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes, where=where, shard_workers=shard_workers),
         output_file,
         compression=compression,
         compression_args=compression_args,
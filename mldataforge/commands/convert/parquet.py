@@ -24,12 +24,23 @@ def parquet():
 @encoding_option()
 @binary_threshold_option()
 @ext_sep_option()
+@workers_option()
+@unordered_option()
+@columns_option()
+@zstd_dict_size_option()
+@zstd_dict_samples_option()
+@compress_rules_option()
+@block_compression_option()
+@block_size_option()
+@block_lines_option()
+@append_option()
+@stats_keys_option()
 def jinx(**kwargs):
     parquet_to_jinx(**kwargs)
-def parquet_to_jinx(output_file, parquet_files, compression, compression_args, overwrite, yes, shard_size, trafo, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep):
-    check_arguments(output_file, overwrite, yes, parquet_files)
+def parquet_to_jinx(output_file, parquet_files, compression, compression_args, overwrite, yes, shard_size, trafo, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, workers=None, unordered=False, columns=None, zstd_dict_size=None, zstd_dict_samples=2**10, compress_rules=None, block_compression=None, block_size=2**20, block_lines=None, append=False, stats_keys=None):
+    check_arguments(output_file, overwrite, yes, parquet_files, append=append)
     save_jinx(
-        load_parquet_files(parquet_files),
+        load_parquet_files(parquet_files, columns=columns),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -40,6 +51,16 @@ def parquet_to_jinx(output_file, parquet_files, compression, compression_args, o
         encoding=encoding,
         binary_threshold=binary_threshold,
         ext_sep=ext_sep,
+        workers=workers,
+        unordered=unordered,
+        zstd_dict_size=zstd_dict_size,
+        zstd_dict_samples=zstd_dict_samples,
+        compress_rules=compress_rules,
+        block_compression=block_compression,
+        block_size=block_size,
+        block_lines=block_lines,
+        append=append,
+        stats_keys=stats_keys,
     )
 
 @parquet.command()
@@ -50,12 +71,13 @@ def parquet_to_jinx(output_file, parquet_files, compression, compression_args, o
 @overwrite_option()
 @yes_option()
 @trafo_option()
+@columns_option()
 def jsonl(**kwargs):
     parquet_to_jsonl(**kwargs)
-def parquet_to_jsonl(output_file, parquet_files, compression, compression_args, overwrite, yes, trafo):
+def parquet_to_jsonl(output_file, parquet_files, compression, compression_args, overwrite, yes, trafo, columns=None):
     check_arguments(output_file, overwrite, yes, parquet_files)
     save_jsonl(
-        load_parquet_files(parquet_files),
+        load_parquet_files(parquet_files, columns=columns),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -73,12 +95,15 @@ def parquet_to_jsonl(output_file, parquet_files, compression, compression_args,
 @shard_size_option()
 @no_pigz_option()
 @trafo_option()
+@columns_option()
+@append_option()
+@flush_workers_option()
 def mds(**kwargs):
     parquet_to_mds(**kwargs)
-def parquet_to_mds(output_dir, parquet_files, compression, compression_args, overwrite, yes, buf_size, shard_size, no_pigz, trafo):
-    check_arguments(output_dir, overwrite, yes, parquet_files)
+def parquet_to_mds(output_dir, parquet_files, compression, compression_args, overwrite, yes, buf_size, shard_size, no_pigz, trafo, columns=None, append=False, flush_workers=None):
+    check_arguments(output_dir, overwrite, yes, parquet_files, append=append)
     save_mds(
-        load_parquet_files(parquet_files),
+        load_parquet_files(parquet_files, columns=columns),
         output_dir,
         compression=compression,
         compression_args=compression_args,
@@ -86,6 +111,8 @@ def parquet_to_mds(output_dir, parquet_files, compression, compression_args, ove
         pigz=use_pigz(compression, no_pigz=no_pigz),
         shard_size=shard_size,
         trafo=trafo,
+        append=append,
+        flush_workers=flush_workers,
     )
 
 @parquet.command()
@@ -96,12 +123,13 @@ def parquet_to_mds(output_dir, parquet_files, compression, compression_args, ove
 @overwrite_option()
 @yes_option()
 @trafo_option()
+@columns_option()
 def msgpack(**kwargs):
     parquet_to_msgpack(**kwargs)
-def parquet_to_msgpack(output_file, parquet_files, compression, compression_args, overwrite, yes, trafo):
+def parquet_to_msgpack(output_file, parquet_files, compression, compression_args, overwrite, yes, trafo, columns=None):
     check_arguments(output_file, overwrite, yes, parquet_files)
     save_msgpack(
-        load_parquet_files(parquet_files),
+        load_parquet_files(parquet_files, columns=columns),
         output_file,
         compression=compression,
         compression_args=compression_args,
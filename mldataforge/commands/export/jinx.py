@@ -23,11 +23,14 @@ def jinx():
 @sort_key_option()
 @lazy_option()
 @override_encoding_option()
+@index_cache_option()
+@columns_option()
+@where_option()
 def pyarrow(**kwargs):
     jinx_to_pyarrow(**kwargs)
-def jinx_to_pyarrow(output_file, jinx_paths, overwrite, yes, trafo, mmap, split, shuffle, index, sort_key, lazy, override_encoding):
+def jinx_to_pyarrow(output_file, jinx_paths, overwrite, yes, trafo, mmap, split, shuffle, index, sort_key, lazy, override_encoding, index_cache=False, columns=None, where=None):
     check_arguments(output_file, overwrite, yes, jinx_paths)
     export_pyarrow(
-        load_jinx_paths(jinx_paths, split=split, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, split=split, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, columns=columns, where=where),
         output_file,
     )
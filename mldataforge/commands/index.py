@@ -1,10 +1,12 @@
 import click
+import os
 
 from ..indexing import *
+from ..jinx import MANIFEST_NAME, create_manifest, write_manifest
 from ..options import *
 from ..utils import *
 
-__all__ = ["identity", "join", "random", "reverse", "slice"]
+__all__ = ["identity", "join", "manifest", "random", "reverse", "slice"]
 
 @click.group()
 def index():
@@ -45,6 +47,22 @@ def index_join(output_file, input_files, overwrite, yes, number, percentage, off
     indices = process_indices(indices, every=every, offset=offset, number=number, percentage=percentage)
     save_index(indices, output_file)
 
+@index.command()
+@click.argument("jinx_directories", type=click.Path(exists=True, file_okay=False), nargs=-1)
+@overwrite_option()
+@yes_option()
+def manifest(**kwargs):
+    index_manifest(**kwargs)
+def index_manifest(jinx_directories, overwrite, yes):
+    if not jinx_directories:
+        raise click.BadArgumentUsage("No input paths provided.")
+    for jinx_directory in jinx_directories:
+        entries = create_manifest(jinx_directory)
+        if not entries:
+            raise click.BadParameter(f"No JINX shards found in '{jinx_directory}'.")
+        check_arguments(os.path.join(jinx_directory, MANIFEST_NAME), overwrite, yes)
+        write_manifest(jinx_directory, entries)
+
 @index.command()
 @click.argument("output_file", type=click.Path(exists=False), required=True)
 @click.argument("mds_directories", type=click.Path(exists=True), nargs=-1)
@@ -96,15 +114,19 @@ def index_reverse(output_file, input_file, overwrite, yes, number, percentage, o
 @offset_option()
 @every_option()
 @shuffle_option(default=42)
+@scratch_dir_option()
+@scratch_bytes_option()
 def shuffle(**kwargs):
     index_shuffle(**kwargs)
-def index_shuffle(output_file, mds_directories, overwrite, yes, split, batch_size, reader, number, percentage, offset, every, shuffle):
+def index_shuffle(output_file, mds_directories, overwrite, yes, split, batch_size, reader, number, percentage, offset, every, shuffle, scratch_dir=None, scratch_bytes=None):
     check_arguments(output_file, overwrite, yes)
     ds = load_mds_directories(
         mds_directories,
         split=split,
         batch_size=batch_size,
         reader=reader,
+        scratch_dir=scratch_dir,
+        scratch_bytes=scratch_bytes,
     )
     indices = shuffle_permutation(len(ds), seed=shuffle)
     indices = process_indices(indices, every=every, offset=offset, number=number, percentage=percentage)
@@ -123,15 +145,21 @@ def index_shuffle(output_file, mds_directories, overwrite, yes, split, batch_siz
 @offset_option()
 @every_option()
 @sort_key_option()
+@columns_option()
+@scratch_dir_option()
+@scratch_bytes_option()
 def sort(**kwargs):
     index_sort(**kwargs)
-def index_sort(output_file, mds_directories, overwrite, yes, split, batch_size, reader, number, percentage, offset, every, sort_key):
+def index_sort(output_file, mds_directories, overwrite, yes, split, batch_size, reader, number, percentage, offset, every, sort_key, columns=None, scratch_dir=None, scratch_bytes=None):
     check_arguments(output_file, overwrite, yes)
     ds = load_mds_directories(
         mds_directories,
         split=split,
         batch_size=batch_size,
         reader=reader,
+        columns=columns,
+        scratch_dir=scratch_dir,
+        scratch_bytes=scratch_bytes,
     )
     indices = sort_permutation(ds, sort_key)
     indices = process_indices(indices, every=every, offset=offset, number=number, percentage=percentage)
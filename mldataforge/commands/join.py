@@ -30,12 +30,27 @@ def join():
 @binary_threshold_option()
 @ext_sep_option()
 @override_encoding_option()
+@workers_option()
+@unordered_option()
+@index_cache_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@zstd_dict_size_option()
+@zstd_dict_samples_option()
+@compress_rules_option()
+@block_compression_option()
+@block_size_option()
+@block_lines_option()
+@append_option()
+@where_option()
+@stats_keys_option()
 def jinx(**kwargs):
     join_jinx(**kwargs)
-def join_jinx(output_file, jinx_paths, compression, compression_args, overwrite, yes, shard_size, trafo, mmap, shuffle, index, sort_key, lazy, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, override_encoding):
-    check_arguments(output_file, overwrite, yes, jinx_paths)
+def join_jinx(output_file, jinx_paths, compression, compression_args, overwrite, yes, shard_size, trafo, mmap, shuffle, index, sort_key, lazy, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, override_encoding, workers=None, unordered=False, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, zstd_dict_size=None, zstd_dict_samples=2**10, compress_rules=None, block_compression=None, block_size=2**20, block_lines=None, append=False, where=None, stats_keys=None):
+    check_arguments(output_file, overwrite, yes, jinx_paths, append=append)
     save_jinx(
-        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where),
         output_file,
         compression=compression,
         compression_args=compression_args,
@@ -45,6 +60,16 @@ def join_jinx(output_file, jinx_paths, compression, compression_args, overwrite,
         encoding=encoding,
         binary_threshold=binary_threshold,
         ext_sep=ext_sep,
+        workers=workers,
+        unordered=unordered,
+        zstd_dict_size=zstd_dict_size,
+        zstd_dict_samples=zstd_dict_samples,
+        compress_rules=compress_rules,
+        block_compression=block_compression,
+        block_size=block_size,
+        block_lines=block_lines,
+        append=append,
+        stats_keys=stats_keys,
     )
 
 @join.command()
@@ -83,12 +108,21 @@ def join_jsonl(output_file, jsonl_files, compression, compression_args, overwrit
 @shuffle_option()
 @index_option()
 @sort_key_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@append_option()
+@scratch_dir_option()
+@scratch_bytes_option()
+@where_option()
+@shard_workers_option()
+@flush_workers_option()
 def mds(**kwargs):
     join_mds(**kwargs)
-def join_mds(output_dir, mds_directories, compression, compression_args, overwrite, yes, batch_size, buf_size, reader, shard_size, no_pigz, trafo, shuffle, index, sort_key):
-    check_arguments(output_dir, overwrite, yes, mds_directories)
+def join_mds(output_dir, mds_directories, compression, compression_args, overwrite, yes, batch_size, buf_size, reader, shard_size, no_pigz, trafo, shuffle, index, sort_key, prefetch=None, prefetch_backend="process", columns=None, append=False, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None, flush_workers=None):
+    check_arguments(output_dir, overwrite, yes, mds_directories, append=append)
     save_mds(
-        load_mds_directories(mds_directories, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key),
+        load_mds_directories(mds_directories, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes, where=where, shard_workers=shard_workers),
         output_dir,
         compression=compression,
         compression_args=compression_args,
@@ -96,6 +130,8 @@ def join_mds(output_dir, mds_directories, compression, compression_args, overwri
         shard_size=shard_size,
         pigz=use_pigz(compression, no_pigz),
         trafo=trafo,
+        append=append,
+        flush_workers=flush_workers,
     )
 
 @join.command()
@@ -127,12 +163,13 @@ def join_msgpack(output_file, msgpack_files, compression, compression_args, over
 @yes_option()
 @batch_size_option()
 @trafo_option()
+@columns_option()
 def parquet(**kwargs):
     join_parquet(**kwargs)
-def join_parquet(output_file, parquet_files, compression, compression_args, overwrite, yes, batch_size, trafo):
+def join_parquet(output_file, parquet_files, compression, compression_args, overwrite, yes, batch_size, trafo, columns=None):
     check_arguments(output_file, overwrite, yes, parquet_files)
     save_parquet(
-        load_parquet_files(parquet_files),
+        load_parquet_files(parquet_files, columns=columns),
         output_file,
         compression=compression,
         compression_args=compression_args,
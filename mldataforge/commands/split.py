@@ -32,11 +32,25 @@ def split():
 @binary_threshold_option()
 @ext_sep_option()
 @override_encoding_option()
+@workers_option()
+@unordered_option()
+@index_cache_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@zstd_dict_size_option()
+@zstd_dict_samples_option()
+@compress_rules_option()
+@block_compression_option()
+@block_size_option()
+@block_lines_option()
+@where_option()
+@stats_keys_option()
 def jinx(*args, **kwargs):
     split_jinx(*args, **kwargs)
-def split_jinx(jinx_paths, prefix, output_dir, size_hint, compression, compression_args, overwrite, yes, shard_size, trafo, mmap, shuffle, index, sort_key, lazy, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, override_encoding):
+def split_jinx(jinx_paths, prefix, output_dir, size_hint, compression, compression_args, overwrite, yes, shard_size, trafo, mmap, shuffle, index, sort_key, lazy, compress_threshold, compress_ratio, encoding, binary_threshold, ext_sep, override_encoding, workers=None, unordered=False, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, zstd_dict_size=None, zstd_dict_samples=2**10, compress_rules=None, block_compression=None, block_size=2**20, block_lines=None, where=None, stats_keys=None):
     save_jinx(
-        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding),
+        load_jinx_paths(jinx_paths, shuffle=shuffle, index=index, sort_key=sort_key, lazy=lazy, trafo=trafo, mmap=mmap, encoding=override_encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where),
         output_file=f"{output_dir}/{prefix}{{part:04d}}.jinx",
         compression=compression,
         compression_args=compression_args,
@@ -49,6 +63,15 @@ def split_jinx(jinx_paths, prefix, output_dir, size_hint, compression, compressi
         encoding=encoding,
         binary_threshold=binary_threshold,
         ext_sep=ext_sep,
+        workers=workers,
+        unordered=unordered,
+        zstd_dict_size=zstd_dict_size,
+        zstd_dict_samples=zstd_dict_samples,
+        compress_rules=compress_rules,
+        block_compression=block_compression,
+        block_size=block_size,
+        block_lines=block_lines,
+        stats_keys=stats_keys,
     )
 
 @split.command()
@@ -93,11 +116,19 @@ def split_jsonl(jsonl_files, prefix, output_dir, size_hint, compression, compres
 @shuffle_option()
 @index_option()
 @sort_key_option()
+@prefetch_option()
+@prefetch_backend_option()
+@columns_option()
+@scratch_dir_option()
+@scratch_bytes_option()
+@where_option()
+@shard_workers_option()
+@flush_workers_option()
 def mds(*args, **kwargs):
     split_mds(*args, **kwargs)
-def split_mds(mds_directories, prefix, output_dir, size_hint, compression, compression_args, overwrite, yes, buf_size, batch_size, reader, shard_size, no_pigz, trafo, shuffle, index, sort_key):
+def split_mds(mds_directories, prefix, output_dir, size_hint, compression, compression_args, overwrite, yes, buf_size, batch_size, reader, shard_size, no_pigz, trafo, shuffle, index, sort_key, prefetch=None, prefetch_backend="process", columns=None, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None, flush_workers=None):
     save_mds(
-        load_mds_directories(mds_directories, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key),
+        load_mds_directories(mds_directories, batch_size=batch_size, reader=reader, shuffle=shuffle, index=index, sort_key=sort_key, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes, where=where, shard_workers=shard_workers),
         output_dir=f"{output_dir}/{prefix}{{part:04d}}",
         compression=compression,
         compression_args=compression_args,
@@ -108,6 +139,7 @@ def split_mds(mds_directories, prefix, output_dir, size_hint, compression, compr
         overwrite=overwrite,
         yes=yes,
         trafo=trafo,
+        flush_workers=flush_workers,
     )
 
 @split.command()
@@ -144,11 +176,12 @@ def split_msgpack(msgpack_files, prefix, output_dir, size_hint, compression, com
 @yes_option()
 @batch_size_option()
 @trafo_option()
+@columns_option()
 def parquet(*args, **kwargs):
     split_parquet(*args, **kwargs)
-def split_parquet(parquet_files, prefix, output_dir, size_hint, compression, overwrite, yes, batch_size, trafo):
+def split_parquet(parquet_files, prefix, output_dir, size_hint, compression, overwrite, yes, batch_size, trafo, columns=None):
     save_parquet(
-        load_parquet_files(parquet_files),
+        load_parquet_files(parquet_files, columns=columns),
         output_file=f"{output_dir}/{prefix}{{part:04d}}.parquet",
         compression=compression,
         batch_size=batch_size,
@@ -2,13 +2,13 @@ import bz2
 import brotli
 import click
 import inspect
-import io
 from isal import igzip as gzip
-import lz4
+import lz4.frame
 import lzma
 import os
 import shutil
 import snappy
+import threading
 import zstandard
 
 from .brotli import brotli_open
@@ -16,6 +16,7 @@ from .pigz import pigz_open
 from .snappy import snappy_open
 
 __all__ = [
+    "JINX_BLOCK_COMPRESSIONS",
     "JINX_COMPRESSIONS",
     "JSONL_COMPRESSIONS",
     "MDS_COMPRESSIONS",
@@ -30,9 +31,14 @@ __all__ = [
     "open_compression",
     "pigz_available",
     "pigz_compress",
+    "register_codec",
     "use_pigz",
 ]
 
+JINX_BLOCK_COMPRESSIONS = dict(
+    default=None,
+    choices=["none", "lz4", "zstd"],
+)
 JINX_COMPRESSIONS = dict(
     default=None,
     choices=["none", "brotli", "bz2", "gzip", "lz4", "lzma", "pigz", "snappy", "xz", "zstd"],
@@ -54,89 +60,65 @@ PARQUET_COMPRESSIONS = dict(
     choices=["snappy", "brotli", "gzip", "lz4", "zstd"],
 )
 
-def compress_data(data, ext, chunk_size=65536):
-    if ext is None or ext == "none":
-        return data
+_CONTEXTS = threading.local()
 
-    output = io.BytesIO()
+def _context(name, factory):
+    context = getattr(_CONTEXTS, name, None)
+    if context is None:
+        context = factory()
+        setattr(_CONTEXTS, name, context)
+    return context
 
-    if ext == "zst":
-        cctx = zstandard.ZstdCompressor(level=1)
-        with cctx.stream_writer(output, closefd=False) as compressor:
-            for i in range(0, len(data), chunk_size):
-                compressor.write(data[i:i+chunk_size])
+def _bytes(data):
+    return data if isinstance(data, bytes) else bytes(data)
 
-    elif ext == "bz2":
-        compressor = bz2.BZ2Compressor()
-        for i in range(0, len(data), chunk_size):
-            output.write(compressor.compress(data[i:i+chunk_size]))
-        output.write(compressor.flush())
+def _zstd_compress(data, level=None):
+    level = 1 if level is None else level
+    return _context(f"zstd_compressor_{level}", lambda: zstandard.ZstdCompressor(level=level)).compress(data)
 
-    elif ext in ("lzma", "xz"):
-        compressor = lzma.LZMACompressor()
-        for i in range(0, len(data), chunk_size):
-            output.write(compressor.compress(data[i:i+chunk_size]))
-        output.write(compressor.flush())
+def _zstd_decompress(data, size=None):
+    dctx = _context("zstd_decompressor", zstandard.ZstdDecompressor)
+    if zstandard.frame_content_size(data) >= 0:
+        return dctx.decompress(data)
+    if size is not None:
+        return dctx.decompress(data, max_output_size=size)
+    # frames written by stream writers carry no content size
+    return dctx.decompressobj().decompress(data)
 
-    elif ext == "lz4":
-        compressed = lz4.frame.compress(data)
-        output.write(compressed)
+def _snappy_compress(data, level=None):
+    return snappy.StreamCompressor().add_chunk(_bytes(data))
 
-    elif ext == "snappy":
-        compressor = snappy.StreamCompressor()
-        for i in range(0, len(data), chunk_size):
-            output.write(compressor.compress(data[i:i+chunk_size]))
-        output.write(compressor.flush())
+def _snappy_decompress(data, size=None):
+    return snappy.StreamDecompressor().decompress(_bytes(data))
 
-    elif ext == "gz":
-        with gzip.GzipFile(fileobj=output, mode="wb") as compressor:
-            for i in range(0, len(data), chunk_size):
-                compressor.write(data[i:i+chunk_size])
+_CODECS = {
+    "br": (lambda data, level=None: brotli.compress(_bytes(data), quality=11 if level is None else level), lambda data, size=None: brotli.decompress(_bytes(data))),
+    "bz2": (lambda data, level=None: bz2.compress(data, 9 if level is None else level), lambda data, size=None: bz2.decompress(data)),
+    "gz": (lambda data, level=None: gzip.compress(data, compresslevel=2 if level is None else level), lambda data, size=None: gzip.decompress(data)),
+    "lz4": (lambda data, level=None: lz4.frame.compress(data, compression_level=0 if level is None else level), lambda data, size=None: lz4.frame.decompress(data)),
+    "lzma": (lambda data, level=None: lzma.compress(data, preset=level), lambda data, size=None: lzma.decompress(data)),
+    "snappy": (_snappy_compress, _snappy_decompress),
+    "xz": (lambda data, level=None: lzma.compress(data, preset=level), lambda data, size=None: lzma.decompress(data)),
+    "zst": (_zstd_compress, _zstd_decompress),
+}
 
-    elif ext == "br":
-        compressed = brotli.compress(data)
-        output.write(compressed)
+def register_codec(ext, compress, decompress):
+    """Register one-shot compress(data, level=None) and decompress(data, size=None) functions for an extension."""
+    _CODECS[ext] = (compress, decompress)
 
-    else:
-        raise ValueError(f"Unsupported compression extension: {ext}")
+def _codec(ext):
+    try:
+        return _CODECS[ext]
+    except KeyError:
+        raise ValueError(f"Unsupported compression extension: {ext}") from None
 
-    return output.getvalue()
+def compress_data(data, ext, level=None):
+    if ext is None or ext == "none":
+        return data
+    return _codec(ext)[0](data, level)
 
-def decompress_data(data, ext, chunk_size=65536):
-    input_io = io.BytesIO(data)
-    output = io.BytesIO()
-    if ext == "zst":
-        dctx = zstandard.ZstdDecompressor()
-        with dctx.stream_reader(input_io) as reader:
-            while chunk := reader.read(chunk_size):
-                output.write(chunk)
-    elif ext == "bz2":
-        decompressor = bz2.BZ2Decompressor()
-        while chunk := input_io.read(chunk_size):
-            output.write(decompressor.decompress(chunk))
-    elif ext in ("lzma", "xz"):
-        decompressor = lzma.LZMADecompressor()
-        while chunk := input_io.read(chunk_size):
-            output.write(decompressor.decompress(chunk))
-    elif ext == "lz4":
-        with lz4.frame.open(input_io, "rb") as reader:
-            while chunk := reader.read(chunk_size):
-                output.write(chunk)
-    elif ext == "snappy":
-        decompressor = snappy.StreamDecompressor()
-        while chunk := input_io.read(chunk_size):
-            output.write(decompressor.decompress(chunk))
-    elif ext == "gz":
-        with gzip.GzipFile(fileobj=input_io, mode="rb") as reader:
-            while chunk := reader.read(chunk_size):
-                output.write(chunk)
-    elif ext == "br":
-        # Brotli python API does not have streaming decompression, fallback to full decompress
-        decompressed = brotli.decompress(input_io.read())
-        output.write(decompressed)
-    else:
-        raise ValueError(f"Unsupported compression extension: {ext}")
-    return output.getvalue()
+def decompress_data(data, ext, size=None):
+    return _codec(ext)[1](data, size)
 
 def decompress_file(input_path, output_path, ext, chunk_size=65536):
     with open(input_path, "rb") as f_in, open(output_path, "wb") as f_out:
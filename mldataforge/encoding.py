@@ -1,53 +1,83 @@
 import base64
 import io
-import struct
+import numpy as np
 
-__all__ = ["decode_a85_stream_to_file", "decode_b64_stream_to_file"]
+__all__ = ["a85decode", "a85encode"]
 
-def decode_a85_stream_to_file(base85_string, output_file_path):
-    packI = struct.Struct('!I').pack
+_A85_CHUNK_WORDS = 2**20
+_A85_WHITESPACE = b" \t\n\r\v"
+_A85_SMALL = 2**8
 
-    pending = []
-    with open(output_file_path, "wb") as f_out:
-        for c in base85_string:
-            if c.isspace():
-                continue
-            if c == 'z':
-                if pending:
-                    raise ValueError("Invalid 'z' inside base85 tuple")
-                f_out.write(b'\x00\x00\x00\x00')
-            else:
-                pending.append(ord(c) - 33)
-                if len(pending) == 5:
-                    acc = 0
-                    for x in pending:
-                        acc = acc * 85 + x
-                    f_out.write(packI(acc))
-                    pending.clear()
+def a85encode(data):
+    """Vectorized drop-in replacement for base64.a85encode with default arguments."""
+    if len(data) < _A85_SMALL:
+        return base64.a85encode(data)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    padding = (-len(buf)) % 4
+    out = io.BytesIO()
+    step = 4 * _A85_CHUNK_WORDS
+    for start in range(0, len(buf), step):
+        chunk = buf[start:start+step]
+        last = start + step >= len(buf)
+        if last and padding:
+            chunk = np.concatenate([chunk, np.zeros(padding, dtype=np.uint8)])
+        words = chunk.view(">u4").astype(np.uint32)
+        zero = words == 0
+        chars = np.empty((len(words), 5), dtype=np.uint8)
+        for i in range(4, -1, -1):
+            quotient = words // 85
+            chars[:, i] = words - quotient * 85
+            words = quotient
+        chars += 33
+        if last and padding:
+            # the padded tail is never folded, exactly like base64.a85encode
+            zero[-1] = False
+        if zero.any():
+            chars[zero, 0] = ord("z")
+            keep = np.ones(chars.shape, dtype=bool)
+            keep[zero, 1:] = False
+            encoded = chars[keep].tobytes()
+        else:
+            encoded = chars.tobytes()
+        if last and padding:
+            encoded = encoded[:-padding]
+        out.write(encoded)
+    return out.getvalue()
 
-        # Carefully handle pending tail
-        if pending:
-            missing = 5 - len(pending)
-            for _ in range(missing):
-                pending.append(84)  # pad with 'u' (which is 84)
-
-            acc = 0
-            for x in pending:
-                acc = acc * 85 + x
-            decoded = packI(acc)
-            f_out.write(decoded[:4 - missing])
-
-def decode_b64_stream_to_file(base64_string, output_file_path):
-    buffer = io.StringIO(base64_string)
-    decoder = base64.b64decode
-
-    with open(output_file_path, "wb") as f_out:
-        chunk_size = 4096  # characters; must be a multiple of 4 for base64
-        while True:
-            chunk = buffer.read(chunk_size)
-            if not chunk:
-                break
-            if len(chunk) % 4 != 0:
-                padding = 4 - (len(chunk) % 4)
-                chunk += "=" * padding
-            f_out.write(decoder(chunk))
+def a85decode(data, foldspaces=True):
+    """Vectorized drop-in replacement for base64.a85decode with foldspaces=True (as written by JINX)."""
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    if len(data) < _A85_SMALL:
+        return base64.a85decode(data, foldspaces=foldspaces)
+    data = bytes(data).translate(None, _A85_WHITESPACE)
+    arr = np.frombuffer(data, dtype=np.uint8)
+    folded = arr == ord("z")
+    if foldspaces:
+        folded |= arr == ord("y")
+    if folded.any():
+        positions = np.flatnonzero(folded)
+        if np.any((positions + 4 * np.arange(len(positions))) % 5):
+            raise ValueError("z inside Ascii85 5-tuple")
+        data = data.replace(b"z", b"!!!!!")
+        if foldspaces:
+            data = data.replace(b"y", b"+<VdL")
+        arr = np.frombuffer(data, dtype=np.uint8)
+    if np.any((arr < ord("!")) | (arr > ord("u"))):
+        raise ValueError("Non-Ascii85 digit found")
+    padding = (-len(arr)) % 5
+    out = io.BytesIO()
+    step = 5 * _A85_CHUNK_WORDS
+    for start in range(0, len(arr), step):
+        chunk = arr[start:start+step]
+        if start + step >= len(arr) and padding:
+            chunk = np.concatenate([chunk, np.full(padding, ord("u"), dtype=np.uint8)])
+        digits = chunk.reshape(-1, 5) - np.uint8(33)
+        words = digits[:, 0].astype(np.uint64)
+        for i in range(1, 5):
+            words = words * 85 + digits[:, i]
+        if np.any(words > 0xFFFFFFFF):
+            raise ValueError("Ascii85 overflow")
+        out.write(words.astype(">u4").tobytes())
+    decoded = out.getvalue()
+    return decoded[:-padding] if padding else decoded
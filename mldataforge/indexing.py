@@ -1,10 +1,11 @@
 import numpy as np
 
-__all__ = ['IndexedDatasetView', 'compute_remainder', 'identity_permutation', 'process_indices', 'reverse_permutation', 'shuffle_permutation', 'sort_permutation']
+__all__ = ['IndexedDatasetView', 'compute_remainder', 'gather', 'gather_sharded', 'identity_permutation', 'process_indices', 'reverse_permutation', 'shuffle_permutation', 'sort_permutation']
 
 class IndexedDatasetView:
-    def __init__(self, dataset, indices):
+    def __init__(self, dataset, indices, batch_size=2**10):
         self.dataset = dataset
+        self.batch_size = batch_size
         length = len(dataset)
         self.indices = [i for i in indices if 0 <= i < length]
 
@@ -12,13 +13,16 @@ class IndexedDatasetView:
         if isinstance(index, int):
             return self.dataset[self.indices[index]]
         elif isinstance(index, slice):
-            return [self.dataset[i] for i in self.indices[index]]
+            return gather(self.dataset, self.indices[index])
         else:
             raise TypeError("Index must be an int or a slice")
 
+    def __getitems__(self, indices):
+        return gather(self.dataset, [self.indices[i] for i in indices])
+
     def __iter__(self):
-        for idx in self.indices:
-            yield self.dataset[idx]
+        for start in range(0, len(self.indices), self.batch_size):
+            yield from gather(self.dataset, self.indices[start:start+self.batch_size])
 
     def __len__(self):
         return len(self.indices)
@@ -26,6 +30,32 @@ class IndexedDatasetView:
 def compute_remainder(all_indices, indices):
     return all_indices[~np.isin(all_indices, indices)]
 
+def gather(dataset, indices):
+    """Returns the samples at the given indices, using a batched __getitems__ where the dataset provides one."""
+    getitems = getattr(dataset, "__getitems__", None)
+    if getitems is not None:
+        return getitems(indices)
+    return [dataset[int(i)] for i in indices]
+
+def gather_sharded(shards, cumulative_lengths, indices):
+    """Gathers samples from shards with cumulative lengths starting at 0, issuing one batched gather per shard."""
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) and (indices.min() < 0 or indices.max() >= cumulative_lengths[-1]):
+        raise IndexError("Index out of range")
+    starts = np.asarray(cumulative_lengths, dtype=np.int64)
+    shard_ids = np.searchsorted(starts, indices, side="right") - 1
+    order = np.argsort(shard_ids, kind="stable")
+    boundaries = np.flatnonzero(np.diff(shard_ids[order])) + 1
+    results = [None] * len(indices)
+    for group in np.split(order, boundaries):
+        if not len(group):
+            continue
+        shard_idx = shard_ids[group[0]]
+        samples = gather(shards[shard_idx], indices[group] - starts[shard_idx])
+        for position, sample in zip(group, samples):
+            results[position] = sample
+    return results
+
 def identity_permutation(n):
     return np.arange(n, dtype=np.uint64)
 
@@ -49,6 +79,13 @@ def shuffle_permutation(n, seed=int):
     return rng.permutation(n).astype(np.uint64)
 
 def sort_permutation(dataset, sort_key):
+    if isinstance(sort_key, str) and sort_key.isidentifier():
+        # a plain column name sorts by that column, read in one vectorized pass where the dataset supports it
+        if hasattr(dataset, "read_columns"):
+            values = dataset.read_columns(columns=[sort_key])[sort_key]
+        else:
+            values = [item[sort_key] for item in dataset]
+        return np.argsort(values, kind='stable').astype(np.uint64)
     if isinstance(sort_key, str):
         global_context = {}
         exec(sort_key, global_context)
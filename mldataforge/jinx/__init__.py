@@ -1,4 +1,10 @@
+from .compression_policy import *
 from .dataset_reader import *
 from .dataset_writer import *
+from .dictionaries import *
+from .encoder_pool import *
+from .manifest import *
+from .sample_encoder import *
 from .shard_reader import *
 from .shard_writer import *
+from .statistics import *
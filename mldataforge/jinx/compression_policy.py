@@ -0,0 +1,114 @@
+import time
+
+from ..compression import JINX_COMPRESSIONS, compress_data, determine_compression
+
+__all__ = ["CompressionPolicy", "parse_compress_rules"]
+
+def parse_compress_rules(rules):
+    """Parses 'key=codec[:level],...' (e.g. 'images=none,text=zstd:3') or a {key: 'codec[:level]'} mapping into {key: (codec, level)}."""
+    if rules is None:
+        return None
+    if isinstance(rules, str):
+        pairs = []
+        for rule in rules.split(","):
+            if not rule.strip():
+                continue
+            key, sep, codec = rule.partition("=")
+            if not sep or not key.strip() or not codec.strip():
+                raise ValueError(f"Invalid compression rule '{rule}', expected key=codec[:level]")
+            pairs.append((key.strip(), codec.strip()))
+    else:
+        pairs = rules.items()
+    parsed = {}
+    for key, codec in pairs:
+        if isinstance(codec, str):
+            codec, _, level = codec.partition(":")
+            codec, level = codec or "none", int(level) if level else None
+        else:
+            codec, level = codec
+        if codec not in JINX_COMPRESSIONS["choices"]:
+            raise ValueError(f"Unsupported compression '{codec}' for key '{key}'. Supported compressions are {JINX_COMPRESSIONS['choices']}.")
+        parsed[key] = (codec, level)
+    return parsed
+
+class CompressionPolicy:
+    """Decides per key whether and how to compress. Keys with an explicit rule always use it, other keys try the default compression until their values consistently miss the compression ratio, after which only every probe_interval-th value is tried."""
+
+    def __init__(self, compression=None, rules=None, compress_ratio=1.0, level=None, min_trials=2**4, probe_interval=2**8, skip_below=0.1, decay=0.125):
+        self.compression = compression
+        self.rules = {key: (determine_compression("jinx", None, "gzip" if codec == "pigz" else codec), level) for key, (codec, level) in (parse_compress_rules(rules) or {}).items()}
+        self.compress_ratio = compress_ratio
+        self.level = level
+        self.min_trials = min_trials
+        self.probe_interval = probe_interval
+        self.skip_below = skip_below
+        self.decay = decay
+        self.stats = {}
+
+    def has_codec(self, key):
+        if key in self.rules:
+            return self.rules[key][0] is not None
+        return self.compression is not None
+
+    def _stats(self, key):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = dict(values=0, trials=0, compressed=0, bytes_in=0, bytes_out=0, seconds=0.0, success=1.0)
+        return stats
+
+    def compress(self, key, data):
+        """Returns (compressed, ext) if compressing data for key pays off, otherwise (data, None)."""
+        stats = self._stats(key)
+        stats["values"] += 1
+        if key in self.rules:
+            ext, level = self.rules[key]
+            if ext is None:
+                return data, None
+        else:
+            ext, level = self.compression, self.level
+            if ext is None:
+                return data, None
+            if self._skipping(stats) and stats["values"] % self.probe_interval:
+                return data, None
+        start = time.perf_counter()
+        compressed = compress_data(data, ext, level)
+        stats["seconds"] += time.perf_counter() - start
+        stats["trials"] += 1
+        stats["bytes_in"] += len(data)
+        success = len(compressed) <= self.compress_ratio * len(data)
+        stats["success"] += self.decay * (success - stats["success"])
+        if success:
+            stats["compressed"] += 1
+            stats["bytes_out"] += len(compressed)
+            return compressed, ext
+        stats["bytes_out"] += len(data)
+        return data, None
+
+    def _skipping(self, stats):
+        return stats["trials"] >= self.min_trials and stats["success"] < self.skip_below
+
+    def merge(self, stats):
+        """Adds the statistics gathered by another policy, e.g. in an encoder worker process."""
+        for key, other in stats.items():
+            mine = self._stats(key)
+            trials = mine["trials"] + other["trials"]
+            if trials:
+                # success rates are weighted by the trials behind them, so a single skipping worker does not decide for all
+                mine["success"] = (mine["success"] * mine["trials"] + other["success"] * other["trials"]) / trials
+            for name in ("values", "trials", "compressed", "bytes_in", "bytes_out", "seconds"):
+                mine[name] += other[name]
+
+    def report(self):
+        """Returns one line per key describing the learned compression decision."""
+        lines = []
+        for key, stats in sorted(self.stats.items(), key=lambda item: str(item[0])):
+            if key in self.rules:
+                ext, level = self.rules[key]
+                decision = f"rule {ext or 'none'}" + (f":{level}" if level is not None else "")
+            elif self.compression is None:
+                continue
+            else:
+                decision = "skip" if self._skipping(stats) else self.compression + (f":{self.level}" if self.level is not None else "")
+            ratio = stats["bytes_out"] / stats["bytes_in"] if stats["bytes_in"] else 1.0
+            lines.append(f"{key if key is not None else '<item>'}: {decision}, {stats['values']} values, {stats['trials']} trials, {stats['compressed']} compressed, ratio {ratio:.3f}, {stats['seconds']:.3f}s")
+        return lines
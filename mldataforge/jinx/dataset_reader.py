@@ -1,35 +1,108 @@
 import bisect
+from collections import OrderedDict
+import numpy as np
 from pathlib import Path
 
+from ..indexing import gather_sharded
+from ..prefetch import check_prefetch_backend, prefetch, prefetch_shards
+from .manifest import directory_entries, manifest_entry
 from .shard_reader import JinxShardReader
+from .statistics import parse_where, shard_may_match
 
 __all__ = ["JinxDatasetReader"]
 
+def _read_shard(path, reader_kwargs):
+    with JinxShardReader(path, **dict(reader_kwargs, lazy=False)) as shard:
+        return list(shard)
+
+class _ShardCache:
+    """Opens shard readers on first access and keeps at most max_open of them, charging each its index and (if mmapped) file size against max_bytes."""
+
+    def __init__(self, paths, costs, max_open, max_bytes, **reader_kwargs):
+        self.paths = paths
+        self.costs = costs
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.reader_kwargs = reader_kwargs
+        self.open = OrderedDict()
+        self.open_bytes = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        shard = self.open.get(idx)
+        if shard is not None:
+            self.open.move_to_end(idx)
+            return shard
+        shard = JinxShardReader(self.paths[idx], **self.reader_kwargs)
+        self.open[idx] = shard
+        self.open_bytes += self.costs[idx]
+        while len(self.open) > 1 and (len(self.open) > self.max_open or self.open_bytes > self.max_bytes):
+            evicted_idx, evicted = self.open.popitem(last=False)
+            self.open_bytes -= self.costs[evicted_idx]
+            evicted.close()
+        return shard
+
+    def close(self):
+        for shard in self.open.values():
+            shard.close()
+        self.open.clear()
+        self.open_bytes = 0
+
 class JinxDatasetReader:
-    def __init__(self, input_paths, split=None, lazy=False, mmap=False, encoding=None):
+    def __init__(self, input_paths, split=None, lazy=False, mmap=False, encoding=None, index_cache=False, max_open_shards=2**7, max_open_bytes=2**32, prefetch=None, prefetch_backend="process", columns=None, where=None):
+        check_prefetch_backend(prefetch_backend)
+        if lazy and prefetch and prefetch_backend == "process":
+            raise ValueError("Lazy samples cannot be prefetched by worker processes, use the thread prefetch backend instead.")
+        self.prefetch = prefetch
+        self.prefetch_backend = prefetch_backend
         if isinstance(input_paths, (str, Path)):
             input_paths = [input_paths]
 
         self.shard_paths = []
+        entries = []
         for input_path in input_paths:
             input_path = Path(input_path)
             if input_path.is_dir():
-                self.shard_paths.extend(sorted(input_path.glob("shard-*.jinx")))
+                directory = directory_entries(input_path)
+                self.shard_paths.extend(input_path / entry["path"] for entry in directory)
+                entries.extend(directory)
             else:
                 self.shard_paths.append(input_path)
+                entries.append(manifest_entry(input_path))
 
-        self.shards = []
         self.lengths = []
         self.cumulative_lengths = []
 
+        # shards whose key statistics rule out all conditions are skipped without being opened
+        where = parse_where(where)
+        self.pruned = 0
+        costs = []
         total = 0
-        for path in self.shard_paths:
-            shard = JinxShardReader(path, split=split, lazy=lazy, mmap=mmap, encoding=encoding)
-            self.shards.append(shard)
-            self.lengths.append(len(shard))
-            total += len(shard)
+        for entry in entries:
+            length = entry["num_samples"] if split is None or entry["split"] == split else 0
+            if length and not shard_may_match(entry.get("key_stats"), where):
+                length = 0
+                self.pruned += 1
+            self.lengths.append(length)
+            costs.append(8 * (entry["num_samples"] + 1) + (entry["size"] if mmap else 0))
+            total += length
             self.cumulative_lengths.append(total)
 
+        self.shards = _ShardCache(
+            self.shard_paths,
+            costs,
+            max_open_shards,
+            max_open_bytes,
+            split=split,
+            lazy=lazy,
+            mmap=mmap,
+            encoding=encoding,
+            index_cache=index_cache,
+            columns=columns,
+        )
+
     def __len__(self):
         return self.cumulative_lengths[-1] if self.cumulative_lengths else 0
 
@@ -44,16 +117,38 @@ class JinxDatasetReader:
 
         return self.shards[shard_idx][local_idx]
 
+    def __getitems__(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        return gather_sharded(self.shards, [0] + self.cumulative_lengths, indices)
+
     def _find_shard(self, global_idx):
         return bisect.bisect_right(self.cumulative_lengths, global_idx)
 
     def __iter__(self):
-        for shard in self.shards:
-            yield from shard
+        if not self.prefetch:
+            yield from self._iter_shards()
+        elif self.prefetch_backend == "process":
+            shards = ((path, self.shards.reader_kwargs) for path, length in zip(self.shard_paths, self.lengths) if length)
+            yield from prefetch_shards(_read_shard, shards, self.prefetch)
+        else:
+            yield from prefetch(self._iter_shards(), self.prefetch)
+
+    def _iter_shards(self):
+        for shard_idx, length in enumerate(self.lengths):
+            if length:
+                yield from self.shards[shard_idx]
+
+    def iter_raw(self):
+        """Yields (line, shard) with the encoded line of every sample, for copying into shards with identical settings."""
+        for shard_idx, length in enumerate(self.lengths):
+            if length:
+                shard = self.shards[shard_idx]
+                for line in shard.iter_raw():
+                    yield line, shard
 
     def close(self):
-        for shard in self.shards:
-            shard.close()
+        self.shards.close()
 
     def __enter__(self):
         return self
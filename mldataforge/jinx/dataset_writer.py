@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 
+from .manifest import MANIFEST_NAME, directory_entries, manifest_entry, write_manifest
 from .shard_writer import JinxShardWriter
 
 __all__ = ["JinxDatasetWriter"]
@@ -22,6 +23,12 @@ class JinxDatasetWriter:
         encoding="a85",
         binary_threshold=None,
         ext_sep=".",
+        dictionaries=None,
+        compression_policy=None,
+        block_compression=None,
+        block_size=2**20,
+        block_lines=None,
+        stats_keys=None,
     ):
         self.output_path = Path(output_path)
         self.shard_size = shard_size
@@ -34,16 +41,27 @@ class JinxDatasetWriter:
         self.encoding = encoding
         self.binary_threshold = binary_threshold
         self.ext_sep = ext_sep
+        self.dictionaries = dictionaries
+        self.compression_policy = compression_policy
+        self.block_compression = block_compression
+        self.block_size = block_size
+        self.block_lines = block_lines
+        self.stats_keys = stats_keys
         self.previous_shard_path = None
         self.shard_id = 0
+        self.manifest = None
         if self.shard_size is None:
             self.current_path = str(self.output_path)
         else:
             os.makedirs(self.output_path, exist_ok=True)
+            if append and os.listdir(self.output_path) and not (self.output_path / MANIFEST_NAME).exists() and not any(self.output_path.glob("shard-*.jinx")):
+                raise FileExistsError(f"Cannot append to a non-empty directory without JINX shards: {self.output_path}")
+            self.manifest = directory_entries(self.output_path) if append else []
             while True:
                 self.current_path = str(self.output_path / self._SHARD_TEMPLATE.format(shard_id=self.shard_id))
                 if not append or not os.path.exists(self.current_path):
                     break
+                self.previous_shard_path = self.current_path
                 self.shard_id += 1
         self._open_writer()
 
@@ -57,6 +75,12 @@ class JinxDatasetWriter:
             encoding=self.encoding,
             binary_threshold=self.binary_threshold,
             ext_sep=self.ext_sep,
+            dictionaries=self.dictionaries,
+            compression_policy=self.compression_policy,
+            block_compression=self.block_compression,
+            block_size=self.block_size,
+            block_lines=self.block_lines,
+            stats_keys=self.stats_keys,
         )
 
     def _new_shard(self):
@@ -69,21 +93,36 @@ class JinxDatasetWriter:
 
     def _close_writer(self, next_shard_path=None):
         if self.current_writer:
-            self.current_writer.close(
+            header = self.current_writer.close(
                 shard_id=self.shard_id,
                 shard_prev=self.previous_shard_path,
                 shard_next=next_shard_path,
                 split=self.split,
             )
             self.current_writer = None
+            if self.manifest is not None:
+                self.manifest.append(manifest_entry(self.current_path, header))
 
-    def write(self, sample: dict):
+    def _maybe_new_shard(self):
         if self.shard_size is not None and self.current_writer.tell()+self.current_writer.num_offsets*8 > self.shard_size:
             self._new_shard()
+
+    def write(self, sample: dict):
+        self._maybe_new_shard()
         self.current_writer.write_sample(sample)
 
+    def write_raw(self, line, source=None):
+        self._maybe_new_shard()
+        self.current_writer.write_raw(line, source)
+
+    def write_encoded(self, payload, bins, summary=None):
+        self._maybe_new_shard()
+        self.current_writer.write_encoded(payload, bins, summary)
+
     def close(self):
         self._close_writer()
+        if self.manifest is not None:
+            write_manifest(self.output_path, self.manifest)
 
     def __enter__(self):
         return self
@@ -0,0 +1,34 @@
+import zstandard
+
+from ..lazy_dict import LazyDict
+from .sample_encoder import JinxSampleEncoder
+
+__all__ = ["train_dictionaries"]
+
+def _collect_values(encoder, value, key, values):
+    if isinstance(value, (dict, LazyDict)):
+        for k, v in value.items():
+            _collect_values(encoder, v, k, values)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_values(encoder, item, None, values)
+    elif key is not None and not isinstance(value, (int, float, bool, type(None))):
+        data = value.encode("utf-8") if isinstance(value, str) else encoder.serialize(value)[0]
+        if isinstance(data, bytes):
+            values.setdefault(key, []).append(data)
+
+def train_dictionaries(samples, dict_size=2**14, min_values=2**4):
+    """Trains a zstd dictionary per key on the values found in samples. Keys with too few values to train on get no dictionary."""
+    encoder = JinxSampleEncoder()
+    values = {}
+    for sample in samples:
+        _collect_values(encoder, sample, None, values)
+    dictionaries = {}
+    for key, data in values.items():
+        if len(data) < min_values:
+            continue
+        try:
+            dictionaries[key] = zstandard.train_dictionary(dict_size, data).as_bytes()
+        except zstandard.ZstdError:
+            continue
+    return dictionaries
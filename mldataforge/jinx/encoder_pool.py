@@ -0,0 +1,96 @@
+from collections import deque
+import concurrent.futures
+import os
+
+from ..lazy_dict import LazyDict
+from .sample_encoder import JinxSampleEncoder
+from .statistics import sample_summary
+
+__all__ = ["JinxEncoderPool"]
+
+_encoder = None
+_stats_keys = None
+
+def _init_worker(encoder_kwargs, stats_keys):
+    global _encoder, _stats_keys
+    _encoder = JinxSampleEncoder(**encoder_kwargs)
+    _stats_keys = stats_keys
+
+def _encode_batch(batch):
+    encoded = [(*_encoder.encode_sample(sample), sample_summary(sample, _stats_keys) if _stats_keys else None) for sample in batch]
+    return encoded, os.getpid(), _encoder.policy.stats
+
+class JinxEncoderPool:
+    """Encodes samples into JINX lines in a pool of worker processes, yielding (payload, bins, summary) with the statistics summary of stats_keys. Results are yielded in input order unless ordered is False."""
+
+    def __init__(self, workers, ordered=True, batch_size=2**6, max_pending=None, stats_keys=None, **encoder_kwargs):
+        self.workers = workers
+        self.ordered = ordered
+        self.batch_size = batch_size
+        self.max_pending = 2 * workers if max_pending is None else max_pending
+        self.worker_stats = {}
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(encoder_kwargs, stats_keys),
+        )
+
+    def _batches(self, iterable):
+        batch = []
+        for sample in iterable:
+            if isinstance(sample, LazyDict):
+                sample = sample.materialize()
+            batch.append(sample)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def encode(self, iterable):
+        pending = deque() if self.ordered else set()
+        try:
+            for batch in self._batches(iterable):
+                if len(pending) >= self.max_pending:
+                    yield from self._collect(pending)
+                future = self.executor.submit(_encode_batch, batch)
+                if self.ordered:
+                    pending.append(future)
+                else:
+                    pending.add(future)
+            while pending:
+                yield from self._collect(pending)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _collect(self, pending):
+        if self.ordered:
+            yield from self._result(pending.popleft())
+            return
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield from self._result(future)
+
+    def _result(self, future):
+        encoded, pid, stats = future.result()
+        # snapshots are cumulative but can arrive out of order, so the most advanced one per key wins
+        latest = self.worker_stats.setdefault(pid, {})
+        for key, key_stats in stats.items():
+            if key not in latest or key_stats["values"] > latest[key]["values"]:
+                latest[key] = key_stats
+        return encoded
+
+    def compression_stats(self):
+        """Returns the latest compression statistics of each worker process."""
+        return list(self.worker_stats.values())
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,72 @@
+import orjson
+import os
+from pathlib import Path
+
+from .shard_reader import read_jinx_header
+
+__all__ = ["MANIFEST_NAME", "create_manifest", "directory_entries", "manifest_entry", "read_manifest", "write_manifest"]
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = "1.0"
+
+def manifest_entry(path, header=None):
+    """Summarizes a JINX shard for the manifest, reading its footer header unless one is given."""
+    path = Path(path)
+    if header is None:
+        header = read_jinx_header(path)
+    return {
+        "path": path.name,
+        "num_samples": header["num_samples"],
+        "split": header.get("split"),
+        "size": os.path.getsize(path),
+        "encoding": header.get("encoding", "a85"),
+        "compression": header.get("compression"),
+        "block_compression": header.get("block_compression"),
+        "binx": path.with_suffix(".binx").exists(),
+        "key_stats": header.get("key_stats"),
+    }
+
+def create_manifest(directory):
+    return [manifest_entry(path) for path in sorted(Path(directory).glob("shard-*.jinx"))]
+
+def read_manifest(directory):
+    """Returns the shard entries of the manifest in the directory, or None if there is no manifest."""
+    try:
+        with open(Path(directory) / MANIFEST_NAME, "rb") as f:
+            manifest = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported JINX manifest version: {manifest.get('version')}")
+    return manifest["shards"]
+
+def directory_entries(directory):
+    """Returns the entries of the shards in the directory. Manifest entries are used as long as the recorded size still matches the shard, while shards added or rewritten since the manifest was written are read from their footers and removed ones are dropped."""
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return create_manifest(directory)
+    entries = []
+    listed = set()
+    for entry in manifest:
+        path = directory / entry["path"]
+        listed.add(entry["path"])
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            continue
+        entries.append(entry if size == entry["size"] else manifest_entry(path))
+    entries.extend(manifest_entry(path) for path in sorted(directory.glob("shard-*.jinx")) if path.name not in listed)
+    return entries
+
+def write_manifest(directory, entries):
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "num_samples": sum(entry["num_samples"] for entry in entries),
+        "shards": entries,
+    }
+    path = Path(directory) / MANIFEST_NAME
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
@@ -0,0 +1,211 @@
+import base64
+import io
+import numpy as np
+import orjson
+import torch
+import zstandard
+
+from ..lazy_dict import LazyDict
+from ..encoding import a85encode
+from .compression_policy import CompressionPolicy
+
+__all__ = ["JinxSampleEncoder"]
+
+class JinxSampleEncoder:
+    """Turns samples into JINX lines without touching any file. Sidecar (.binx) payloads are deferred and handed back to the caller, which makes this usable in worker processes."""
+
+    def __init__(
+        self,
+        compress_threshold=2**6,
+        compress_ratio=1.0,
+        compression=None,
+        encoding="a85",
+        binary_threshold=None,
+        ext_sep=".",
+        dictionaries=None,
+        compression_policy=None,
+    ):
+        self.compress_threshold = compress_threshold
+        self.compress_ratio = compress_ratio
+        self.compression = compression
+        self.encoding = encoding
+        self.binary_threshold = binary_threshold
+        self.ext_sep = ext_sep
+        self.dictionaries = dictionaries or {}
+        self._dict_compressors = {}
+        self.policy = CompressionPolicy(compression=compression, compress_ratio=compress_ratio) if compression_policy is None else compression_policy
+        self._pending_bins = []
+
+    def encode_sample(self, sample: dict):
+        """Returns the JSON line, or the prepared sample if it still has deferred sidecar payloads, and those payloads."""
+        prepared_sample, _ = self._prepare_sample(sample)
+        bins, self._pending_bins = self._pending_bins, []
+        if bins:
+            return prepared_sample, bins
+        return orjson.dumps(prepared_sample), bins
+
+    def _store_bin(self, data):
+        location = {"offset": None, "length": len(data)}
+        self._pending_bins.append((location, data))
+        return location
+
+    def _dict_compressor(self, key):
+        compressor = self._dict_compressors.get(key)
+        if compressor is None:
+            # the dictionary is implied by the key, so frames carry neither magic number nor dictionary id
+            level = 3 if self.policy.level is None else self.policy.level
+            params = zstandard.ZstdCompressionParameters.from_level(level, format=zstandard.FORMAT_ZSTD1_MAGICLESS, write_dict_id=False)
+            dict_data = zstandard.ZstdCompressionDict(self.dictionaries[key])
+            compressor = self._dict_compressors[key] = zstandard.ZstdCompressor(dict_data=dict_data, compression_params=params)
+        return compressor
+
+    def _prepare_value(self, value, key=None):
+        if isinstance(value, (int, float, bool, type(None))):
+            return value, None
+        if isinstance(value, str):
+            short_limit = min(
+                self.compress_threshold if self.policy.has_codec(key) or (key in self.dictionaries and key not in self.policy.rules) else float("inf"),
+                self.binary_threshold if self.binary_threshold is not None else float("inf")
+            )
+            if len(value) < short_limit:
+                return value, None
+
+            # Encode only here, if string is long enough
+            serialized, ext = value.encode("utf-8"), "str"
+        else:
+            serialized, ext = self.serialize(value)
+        return self._handle_bytes(serialized, ext, key)
+
+
+    def serialize(self, value):
+        """Returns (data, ext) with the bytes a non-string value is stored as and the extension it is decoded by, or the native value of a numpy scalar."""
+        if isinstance(value, np.ndarray):
+            buf = io.BytesIO()
+            np.save(buf, value, allow_pickle=False)
+            return buf.getvalue(), "npy"
+        elif isinstance(value, torch.Tensor):
+            buf = io.BytesIO()
+            torch.save(value, buf)
+            return buf.getvalue(), "pt"
+        elif isinstance(value, bytes):
+            return value, "raw"
+        elif isinstance(value, np.generic):
+            return value.item(), str(value.dtype)
+        else:
+            try:
+                return orjson.dumps(value), None
+            except Exception as e:
+                raise ValueError(f"Failed to serialize value {value}: {e}")
+
+
+    def _handle_bytes(self, data, ext, key=None):
+        # Scalars from np.generic are already native
+        if isinstance(data, (int, float, bool, str, type(None))):
+            return data, ext
+
+        # Values of keys with a trained dictionary try dictionary compression first
+        if key in self.dictionaries and key not in self.policy.rules and len(data) >= self.compress_threshold:
+            compressed = self._dict_compressor(key).compress(data)
+            if len(compressed) <= self.compress_ratio * len(data):
+                return self._store_data(compressed, ext, compression="zdict")
+
+        # Let the policy try compression if large enough
+        if len(data) >= self.compress_threshold:
+            data, compression = self.policy.compress(key, data)
+            return self._store_data(data, ext, compression=compression)
+
+        return self._store_data(data, ext, compression=None)
+
+
+    def _store_data(self, data, ext, compression):
+        extensions = [ext, compression]
+        extensions = [e for e in extensions if e]
+
+        # Sidecar: store large binary data in .bin file
+        if self.binary_threshold is not None and len(data) > self.binary_threshold:
+            extensions.append("bin")
+            return self._store_bin(data), self.ext_sep.join(extensions)
+
+        if extensions == ["str"]:
+            # Handle string separately to avoid double-encoding
+            return data.decode("utf-8"), None
+
+        # Encode bytes into baseXX for JSON embedding
+        if isinstance(data, bytes):
+            return self._encode_bytes(data), self.ext_sep.join(extensions)
+
+        return data, self.ext_sep.join(extensions) if extensions else None
+
+
+    def _encode_bytes(self, data):
+        if self.encoding == "a85":
+            raw = a85encode(data)
+        elif self.encoding == "b64":
+            raw = base64.b64encode(data)
+        elif self.encoding == "hex":
+            raw = data.hex().encode("utf-8")
+        else:
+            raise ValueError(f"Unsupported encoding: {self.encoding}")
+        return raw.decode("utf-8")
+
+    def _prepare_sample(self, value, key=None):
+        if isinstance(value, dict):
+            new_dict = {}
+            for key, val in value.items():
+                compressed_val, ext = self._prepare_sample(val, key)
+                if ext:
+                    key = f"{key}.{ext}"
+                new_dict[key] = compressed_val
+            return new_dict, None
+
+        elif isinstance(value, LazyDict):
+            new_dict = {}
+            for key, val in value.raw_items():
+                if value._key_fn(key) == key:
+                    compressed_val, ext = self._prepare_sample(val, key)
+                    if ext:
+                        key = f"{key}.{ext}"
+                    new_dict[key] = compressed_val
+                    continue
+                if "zdict" in key.split(self.ext_sep) or value._key_fn(key) in self.policy.rules:
+                    # dictionaries are per file, so dictionary-compressed values are always recompressed, as are values of keys with a rule
+                    val = value.context._lazy_load_value(key, val)
+                    key = value._key_fn(key)
+                    compressed_val, ext = self._prepare_sample(val, key)
+                    if ext:
+                        key = f"{key}.{ext}"
+                    new_dict[key] = compressed_val
+                    continue
+                if key.endswith(".bin"):
+                    offset = val["offset"]
+                    length = val["length"]
+                    other = value.context
+                    if (
+                        self.compression != other.header["compression"]
+                        or not self.binary_threshold
+                        or length < self.binary_threshold
+                        or self.compress_ratio != other.header["compress_ratio"]
+                        or (self.compression is not None and length < self.compress_threshold)
+                    ):
+                        # fallback
+                        val = other._lazy_load_value(key, val)
+                        key = value._key_fn(key)
+                        compressed_val, ext = self._prepare_sample(val, key)
+                        if ext:
+                            key = f"{key}.{ext}"
+                        new_dict[key] = compressed_val
+                        continue
+                    new_dict[key] = self._store_bin(other.read_bin(offset, length))
+                    continue
+                new_dict[key] = value.eagerize(val)
+            return new_dict, None
+
+        elif isinstance(value, list):
+            compressed_list = []
+            for item in value:
+                compressed_item, _ = self._prepare_sample(item)
+                compressed_list.append(compressed_item)
+            return compressed_list, None
+
+        else:
+            return self._prepare_value(value, key)
@@ -1,30 +1,74 @@
 import base64
+from collections import OrderedDict
 import io
 import orjson
 import mmap as _mmap
 import numpy as np
 import os
 from pathlib import Path
-import tempfile
+import threading
 import torch
+import zstandard
 
 from ..lazy_dict import LazyDict
-from ..compression import decompress_data, decompress_file
-from ..encoding import decode_a85_stream_to_file, decode_b64_stream_to_file
+from ..compression import decompress_data
+from ..encoding import a85decode
 
-__all__ = ["JinxShardReader"]
+__all__ = ["JinxShardReader", "read_jinx_header"]
+
+_COALESCE_GAP = 2**16
+_RAW_CHUNK_LINES = 2**12
+
+def _pread(file, length, offset):
+    """Reads length bytes at offset without moving the shared file cursor where the platform allows it."""
+    if not hasattr(os, "pread"):
+        file.seek(offset)
+        return file.read(length)
+    data = os.pread(file.fileno(), length, offset)
+    if len(data) == length or not data:
+        return data
+    chunks = [data]
+    while length > len(data):
+        length, offset = length - len(data), offset + len(data)
+        data = os.pread(file.fileno(), length, offset)
+        if not data:
+            break
+        chunks.append(data)
+    return b"".join(chunks)
+
+def _read_header_line(file):
+    file.seek(-min(64, os.fstat(file.fileno()).st_size), os.SEEK_END)
+    last_part = file.read()
+    lines = last_part.strip().split(b"\n")
+    footer_offset = int(lines[-1].decode("utf-8"))
+    file.seek(footer_offset)
+    return file.readline()
+
+def read_jinx_header(path):
+    """Reads the footer header of a JINX shard without decoding its index or keeping the file open."""
+    with open(path, "rb") as f:
+        return orjson.loads(_read_header_line(f))
 
 class JinxShardReader:
-    def __init__(self, path: str, split=None, lazy=True, mmap=False, encoding=None):
+    def __init__(self, path: str, split=None, lazy=True, mmap=False, encoding=None, index_cache=False, columns=None, block_cache=2**4):
         self.path = Path(path)
         self.lazy = lazy
+        self.columns = None if columns is None else set(columns)
         self.mmap = mmap
         self.encoding = encoding
+        self.index_cache = index_cache
+        self.index_cache_path = self.path.with_suffix(".idx")
         self.file = self.path.open("rb")
         if self.mmap:
             self.mmap = _mmap.mmap(self.file.fileno(), length=0, access=_mmap.ACCESS_READ)
         self.bin_path = self.path.with_suffix(".binx")
         self.bin = None
+        self._bin_lock = threading.Lock()
+        self.closed = False
+        self._local = threading.local()
+        self.block_cache = block_cache
+        self._blocks = OrderedDict()
+        self._blocks_lock = threading.Lock()
         self._load_footer(split=split)
 
     def _load_footer(self, split=None):
@@ -35,66 +79,165 @@ class JinxShardReader:
             footer_offset = int(self.mmap[offset:].decode("utf-8"))
             header_line = self.mmap[footer_offset:offset]
         else:
-            self.file.seek(-64, os.SEEK_END)
-            last_part = self.file.read()
-            lines = last_part.strip().split(b"\n")
-            footer_offset = int(lines[-1].decode("utf-8"))
-            self.file.seek(footer_offset)
-            header_line = self.file.readline().decode("utf-8")
+            header_line = _read_header_line(self.file)
         self.header = orjson.loads(header_line)
         self.num_samples = self.header["num_samples"]
         self.ext_sep = self.header.get("ext_sep", ".")
         self.encoding = self.header.get("encoding", "a85" if self.encoding is None else self.encoding)
+        self.key_stats = self.header.get("key_stats")
         if split is not None and self.header.get("split") != split:
             self.num_samples = 0
         index_key = next((k for k in self.header if k.startswith("index.")), None)
         if index_key is None:
             raise ValueError("Missing index in JINX header.")
+        self.zstd_dicts = {
+            key: zstandard.ZstdCompressionDict(self._decode_text(data))
+            for key, data in self.header.get("zstd_dicts", {}).items()
+        }
         index_data = self.header[index_key]
         extensions = index_key.split(self.ext_sep)[1:]
         self.offsets = self._mmap_index(index_data, extensions)
+        self.block_compression = self.header.get("block_compression")
+        if self.block_compression is not None:
+            # line offsets count bytes of the decompressed blocks, block_starts holds the first line of every block
+            self.block_offsets = self._header_array("block_offsets")
+            self.block_starts = self._header_array("block_starts")
+
+    def _header_array(self, name):
+        key = next((k for k in self.header if k.split(self.ext_sep, 1)[0] == name), None)
+        if key is None:
+            raise ValueError(f"Missing {name} in JINX header.")
+        return self._mmap_index(self.header[key], key.split(self.ext_sep)[1:], cache=False)
 
-    def _mmap_index(self, data, extensions):
+    def _mmap_index(self, data, extensions, cache=True):
         if extensions[-1] == "bin":
             location = data
             offset, length = location["offset"], location["length"]
             return np.memmap(self.bin_path, dtype=np.uint64, mode="r", offset=offset, shape=(length // 8))
-        tmp_path = tempfile.NamedTemporaryFile(delete=False).name
+        if not (cache and self.index_cache):
+            return self._decode_index(data, extensions)
+        offsets = self._load_index_cache()
+        if offsets is not None:
+            return offsets
+        offsets = self._decode_index(data, extensions)
+        self._save_index_cache(offsets)
+        return offsets
+
+    def _decode_text(self, data):
         if self.encoding == "a85":
-            decode_a85_stream_to_file(data, tmp_path)
-        elif self.encoding == "b64":
-            decode_b64_stream_to_file(data, tmp_path)
-        else:
-            raise ValueError(f"Unsupported encoding '{self.encoding}' for index data")
-        for i, ext in reversed(list(enumerate(extensions))):
+            return a85decode(data)
+        if self.encoding == "b64":
+            return base64.b64decode(data)
+        if self.encoding == "hex":
+            return bytes.fromhex(data)
+        raise ValueError(f"Unsupported encoding '{self.encoding}' for header data")
+
+    def _decode_index(self, data, extensions):
+        data = self._decode_text(data)
+        for ext in reversed(extensions):
             if ext == "npy":
                 try:
-                    return np.memmap(tmp_path, dtype=np.uint64, mode="r")
+                    return np.frombuffer(data, dtype=np.uint64)
                 except Exception as e:
                     raise ValueError(f"Failed to load .npy array for key 'index': {e}")
             elif ext in {"zst", "bz2", "lz4", "lzma", "snappy", "xz", "gz", "br"}:
-                new_tmp = tempfile.NamedTemporaryFile(delete=False).name
-                decompress_file(tmp_path, new_tmp, ext)
-                os.remove(tmp_path)
-                tmp_path = new_tmp
+                data = decompress_data(data, ext)
             else:
                 raise ValueError(f"Unsupported compression type in index: {ext}")
         raise ValueError("No valid index extension (like .npy) found")
 
+    def _load_index_cache(self):
+        try:
+            if os.path.getmtime(self.index_cache_path) < os.path.getmtime(self.path):
+                return None
+            offsets = np.load(self.index_cache_path, mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        if offsets.dtype != np.uint64 or len(offsets) != self.header["num_samples"] + 1:
+            return None
+        return offsets
+
+    def _save_index_cache(self, offsets):
+        tmp_path = self.index_cache_path.with_name(f".{self.index_cache_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, offsets, allow_pickle=False)
+            os.replace(tmp_path, self.index_cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     def __len__(self):
         return self.num_samples
 
     def __getitem__(self, idx):
+        if self.block_compression is not None:
+            if not (0 <= idx < self.num_samples):
+                raise IndexError(f"Sample index out of range: {idx}")
+            return self._load_line(self._block_line(idx))
         if self.mmap:
             begin, end = self.offsets[idx:idx+2]
             line = self.mmap[begin:end]
         else:
             if not (0 <= idx < self.num_samples):
                 raise IndexError(f"Sample index out of range: {idx}")
-            offset = self.offsets[idx]
-            self.file.seek(offset)
-            line = self.file.readline().decode("utf-8")
+            begin, end = self.offsets[idx:idx+2]
+            line = _pread(self.file, int(end - begin), int(begin))
+        return self._load_line(line)
+
+    def __getitems__(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= self.num_samples):
+            raise IndexError("Sample index out of range")
+        unique, inverse = np.unique(indices, return_inverse=True)
+        samples = [self._load_line(line) for line in self._read_lines(unique)]
+        return [samples[i] for i in inverse]
+
+    def _read_lines(self, indices):
+        """Reads the lines for sorted unique indices, merging reads of lines that are at most _COALESCE_GAP bytes apart."""
+        if self.block_compression is not None:
+            return [self._block_line(idx) for idx in indices]
+        begins = self.offsets[indices].astype(np.int64)
+        ends = self.offsets[indices + 1].astype(np.int64)
+        if self.mmap:
+            return [self.mmap[begin:end] for begin, end in zip(begins, ends)]
+        lines = []
+        breaks = np.flatnonzero(begins[1:] - ends[:-1] > _COALESCE_GAP) + 1
+        for run in np.split(np.arange(len(indices)), breaks):
+            if not len(run):
+                continue
+            base = begins[run[0]]
+            buf = memoryview(_pread(self.file, int(ends[run[-1]] - base), int(base)))
+            lines.extend(buf[begin - base:end - base] for begin, end in zip(begins[run], ends[run]))
+        return lines
+
+    def _read_block(self, block):
+        """Returns the decompressed block, serving recently used blocks from an LRU cache."""
+        with self._blocks_lock:
+            data = self._blocks.get(block)
+            if data is not None:
+                self._blocks.move_to_end(block)
+                return data
+        begin, end = int(self.block_offsets[block]), int(self.block_offsets[block + 1])
+        compressed = self.mmap[begin:end] if self.mmap else _pread(self.file, end - begin, begin)
+        size = int(self.offsets[self.block_starts[block + 1]] - self.offsets[self.block_starts[block]])
+        data = memoryview(decompress_data(compressed, self.block_compression, size=size))
+        with self._blocks_lock:
+            self._blocks[block] = data
+            while len(self._blocks) > self.block_cache:
+                self._blocks.popitem(last=False)
+        return data
+
+    def _block_line(self, idx):
+        block = int(np.searchsorted(self.block_starts, idx, side="right")) - 1
+        data = self._read_block(block)
+        base = self.offsets[self.block_starts[block]]
+        return data[int(self.offsets[idx] - base):int(self.offsets[idx + 1] - base)]
+
+    def _load_line(self, line):
         sample = orjson.loads(line)
+        if self.columns is not None:
+            sample = {k: v for k, v in sample.items() if k.split(self.ext_sep, 1)[0] in self.columns}
         return self._load_sample(sample)
 
     def _lazy_load_value(self, key, value):
@@ -122,6 +265,11 @@ class JinxShardReader:
                     decoded = decompress_data(decoded, ext)
                 except Exception as e:
                     raise ValueError(f"Failed to decompress '{ext}' for key '{key}': {e}")
+            elif ext == "zdict":
+                try:
+                    decoded = self._dict_decompressor(key.split(self.ext_sep, 1)[0]).decompress(decoded)
+                except Exception as e:
+                    raise ValueError(f"Failed to decompress 'zdict' for key '{key}': {e}")
             elif ext == "npy":
                 try:
                     return np.load(io.BytesIO(decoded), allow_pickle=False)
@@ -162,20 +310,29 @@ class JinxShardReader:
         except Exception as e:
             raise ValueError(f"Failed to decode final JSON for key '{key}': {e}")
 
+    def _dict_decompressor(self, key):
+        # decompression contexts are not thread-safe, so every thread gets its own
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(key)
+        if decompressor is None:
+            if key not in self.zstd_dicts:
+                raise ValueError(f"Missing zstd dictionary for key '{key}'")
+            decompressor = decompressors[key] = zstandard.ZstdDecompressor(dict_data=self.zstd_dicts[key], format=zstandard.FORMAT_ZSTD1_MAGICLESS)
+        return decompressor
+
     def _load_bytes(self, key, value, extensions):
         if extensions[-1] == "bin":
             if not isinstance(value, (dict, LazyDict)) or "offset" not in value:
                 raise ValueError(f"Expected offset dict for '.bin' extension in key '{key}'")
             offset, length = value["offset"], value["length"]
-            if not self.bin:
-                self.bin = open(self.bin_path, "rb")
-            self.bin.seek(offset)
-            value = self.bin.read(length)
+            value = self.read_bin(offset, length)
             extensions.pop()
         elif isinstance(value, str):
             if self.encoding == "a85":
                 try:
-                    value = base64.a85decode(value.encode("ascii"), foldspaces=True)
+                    value = a85decode(value.encode("ascii"), foldspaces=True)
                 except Exception as e:
                     raise ValueError(f"Failed to decode base85 for key '{key}': {e}")
             elif self.encoding == "b64":
@@ -192,6 +349,17 @@ class JinxShardReader:
                 raise ValueError(f"Unsupported encoding '{self.encoding}' for key '{key}'")
         return value, extensions
 
+    def read_bin(self, offset, length):
+        if self.closed:
+            # lazy values can outlive their (e.g. evicted) reader, so they read through a short-lived handle
+            with open(self.bin_path, "rb") as f:
+                return _pread(f, length, offset)
+        if self.bin is None:
+            with self._bin_lock:
+                if self.bin is None:
+                    self.bin = open(self.bin_path, "rb")
+        return _pread(self.bin, length, offset)
+
     def _load_sample(self, value):
         if isinstance(value, dict):
             if self.lazy:
@@ -206,12 +374,18 @@ class JinxShardReader:
         return value
 
     def __iter__(self):
-        if self.mmap:
+        if self.block_compression is not None:
+            for block in range(len(self.block_starts) - 1 if self.num_samples else 0):
+                start, stop = int(self.block_starts[block]), int(min(self.block_starts[block + 1], self.num_samples))
+                data = self._read_block(block)
+                base = self.offsets[start]
+                for i in range(start, stop):
+                    yield self._load_line(data[int(self.offsets[i] - base):int(self.offsets[i + 1] - base)])
+        elif self.mmap:
             for i in range(self.num_samples):
                 begin, end = self.offsets[i:i+2]
                 line = self.mmap[begin:end]
-                sample = orjson.loads(line)
-                yield self._load_sample(sample)
+                yield self._load_line(line)
         else:
             original_pos = self.file.tell()
             try:
@@ -222,23 +396,39 @@ class JinxShardReader:
                     line = self.file.readline()
                     if not line:
                         break
-                    sample = orjson.loads(line)
-                    yield self._load_sample(sample)
+                    yield self._load_line(line)
             finally:
                 self.file.seek(original_pos)
 
+    def iter_raw(self):
+        """Yields the encoded lines without their newline and without decoding them."""
+        if self.block_compression is not None:
+            for block in range(len(self.block_starts) - 1 if self.num_samples else 0):
+                start, stop = int(self.block_starts[block]), int(min(self.block_starts[block + 1], self.num_samples))
+                data = self._read_block(block)
+                base = self.offsets[start]
+                for i in range(start, stop):
+                    yield data[int(self.offsets[i] - base):int(self.offsets[i + 1] - base) - 1]
+        elif self.mmap:
+            for i in range(self.num_samples):
+                begin, end = self.offsets[i:i+2]
+                yield self.mmap[begin:end - 1]
+        else:
+            for start in range(0, self.num_samples, _RAW_CHUNK_LINES):
+                for line in self._read_lines(np.arange(start, min(start + _RAW_CHUNK_LINES, self.num_samples))):
+                    yield line[:-1]
+
     def close(self):
+        self.closed = True
         if self.mmap:
-            if hasattr(self, "mmap"):
-                self.mmap.close()
-        else:
-            self.file.close()
-        if hasattr(self, "_index_tmp") and os.path.exists(self._index_tmp):
-            os.remove(self._index_tmp)
+            self.mmap.close()
+        self.file.close()
         if hasattr(self, "offsets"):
-            self.offsets.close()
+            del self.offsets
+        self._blocks.clear()
         if self.bin:
             self.bin.close()
+            self.bin = None
 
     def __enter__(self):
         return self
@@ -1,18 +1,58 @@
-import base64
-import io
 import numpy as np
 import orjson
 import os
 from pathlib import Path
 import tempfile
-import torch
 
-from ..lazy_dict import LazyDict
 from ..compression import compress_data
+from .sample_encoder import JinxSampleEncoder
+from .statistics import KeyStatistics
 
 __all__ = ["JinxShardWriter"]
 
-class JinxShardWriter:
+_BIN_COPY_CHUNK = 2**24
+
+class _OffsetBuffer:
+    """Growable in-memory uint64 array of line end offsets that spills to a temporary file next to the shard once it holds more than max_memory bytes."""
+
+    def __init__(self, path, max_memory=2**27):
+        self.path = Path(path)
+        self.max_memory = max_memory
+        self.array = np.zeros(2**10, dtype=np.uint64)
+        self.size = 1
+        self.spill = None
+        self.spill_path = None
+
+    def append(self, offset):
+        if self.size == len(self.array):
+            if 2 * self.array.nbytes > self.max_memory:
+                self._spill()
+            else:
+                self.array = np.resize(self.array, 2 * len(self.array))
+        self.array[self.size] = offset
+        self.size += 1
+
+    def _spill(self):
+        if self.spill is None:
+            self.spill = tempfile.NamedTemporaryFile(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".offsets", delete=False)
+            self.spill_path = self.spill.name
+        self.spill.write(self.array[:self.size].tobytes())
+        self.size = 0
+
+    def to_array(self):
+        if self.spill is None:
+            return self.array[:self.size]
+        self.spill.flush()
+        spilled = np.fromfile(self.spill_path, dtype=np.uint64)
+        return np.concatenate([spilled, self.array[:self.size]])
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            os.remove(self.spill_path)
+            self.spill = None
+
+class JinxShardWriter(JinxSampleEncoder):
     def __init__(
         self,
         path: str,
@@ -23,182 +63,57 @@ class JinxShardWriter:
         encoding="a85",
         binary_threshold=None,
         ext_sep=".",
+        dictionaries=None,
+        compression_policy=None,
+        offsets_memory=2**27,
+        block_compression=None,
+        block_size=2**20,
+        block_lines=None,
+        stats_keys=None,
     ):
+        super().__init__(
+            compress_threshold=compress_threshold,
+            compress_ratio=compress_ratio,
+            compression=compression,
+            encoding=encoding,
+            binary_threshold=binary_threshold,
+            ext_sep=ext_sep,
+            dictionaries=dictionaries,
+            compression_policy=compression_policy,
+        )
         self.path = Path(path)
-        self.compress_threshold = compress_threshold
-        self.compress_ratio = compress_ratio
-        self.compression = compression
         self.index_compression = index_compression
-        self.encoding = encoding
-        self.binary_threshold = binary_threshold
-        self.ext_sep = ext_sep
         self.file = self.path.open("wb")
         self.current_offset = 0
-        tmp_file = tempfile.NamedTemporaryFile(delete=False)
-        self.offsets_tmp_path = tmp_file.name
-        tmp_file.close()
-        self.offsets_file = open(self.offsets_tmp_path, "wb")
-        self.offsets_file.write(b"\x00" * 8)
+        self.offsets = _OffsetBuffer(self.path, max_memory=offsets_memory)
         self.num_offsets = 0
         self.bin = None
+        self._bin_run = None
+        # in block mode, lines are buffered and written as independently compressed blocks
+        self.block_compression = block_compression
+        self.block_size = block_size
+        self.block_lines = block_lines
+        self.block = []
+        self.block_bytes = 0
+        self.block_count = 0
+        self.file_offset = 0
+        self.block_offsets = [0]
+        self.block_starts = [0]
+        self.key_stats = KeyStatistics(stats_keys) if stats_keys else None
 
-    def _prepare_value(self, value):
-        if isinstance(value, (int, float, bool, type(None))):
-            return value, None
-        if isinstance(value, str):
-            short_limit = min(
-                self.compress_threshold if self.compression is not None else float("inf"),
-                self.binary_threshold if self.binary_threshold is not None else float("inf")
-            )
-            if len(value) < short_limit:
-                return value, None
-
-            # Encode only here, if string is long enough
-            serialized, ext = value.encode("utf-8"), "str"
-        else:
-            serialized, ext = self._serialize(value)
-        return self._handle_bytes(serialized, ext)
-
-
-    def _serialize(self, value):
-        if isinstance(value, np.ndarray):
-            buf = io.BytesIO()
-            np.save(buf, value, allow_pickle=False)
-            return buf.getvalue(), "npy"
-        elif isinstance(value, torch.Tensor):
-            buf = io.BytesIO()
-            torch.save(value, buf)
-            return buf.getvalue(), "pt"
-        elif isinstance(value, bytes):
-            return value, "raw"
-        elif isinstance(value, np.generic):
-            return value.item(), str(value.dtype)
-        else:
-            try:
-                return orjson.dumps(value), None
-            except Exception as e:
-                raise ValueError(f"Failed to serialize value {value}: {e}")
-
-
-    def _handle_bytes(self, data, ext):
-        # Scalars from np.generic are already native
-        if isinstance(data, (int, float, bool, str, type(None))):
-            return data, ext
-
-        # Try compression if enabled, large enough, and not going to sidecar
-        if self.compression is not None and len(data) >= self.compress_threshold:
-            compressed = compress_data(data, self.compression)
-            if len(compressed) <= self.compress_ratio * len(data):
-                return self._store_data(compressed, ext, compressed=True)
-
-        return self._store_data(data, ext, compressed=False)
-
-
-    def _store_data(self, data, ext, compressed):
-        extensions = [ext, self.compression] if compressed else [ext]
-        extensions = [e for e in extensions if e]
-
-        # Sidecar: store large binary data in .bin file
-        if self.binary_threshold is not None and len(data) > self.binary_threshold:
-            if not self.bin:
-                self.bin = open(self.path.with_suffix(".binx"), "wb")
-            offset = self.bin.tell()
-            self.bin.write(data)
-            extensions.append("bin")
-            return {"offset": offset, "length": len(data)}, self.ext_sep.join(extensions)
-
-        if extensions == ["str"]:
-            # Handle string separately to avoid double-encoding
-            return data.decode("utf-8"), None
-
-        # Encode bytes into baseXX for JSON embedding
-        if isinstance(data, bytes):
-            return self._encode_bytes(data), self.ext_sep.join(extensions)
-
-        return data, self.ext_sep.join(extensions) if extensions else None
-
-
-    def _encode_bytes(self, data):
-        if self.encoding == "a85":
-            raw = base64.a85encode(data)
-        elif self.encoding == "b64":
-            raw = base64.b64encode(data)
-        elif self.encoding == "hex":
-            raw = data.hex().encode("utf-8")
-        else:
-            raise ValueError(f"Unsupported encoding: {self.encoding}")
-        return raw.decode("utf-8")
-
-    def _prepare_sample(self, value):
-        if isinstance(value, dict):
-            new_dict = {}
-            for key, val in value.items():
-                compressed_val, ext = self._prepare_sample(val)
-                if ext:
-                    key = f"{key}.{ext}"
-                new_dict[key] = compressed_val
-            return new_dict, None
-
-        elif isinstance(value, LazyDict):
-            new_dict = {}
-            for key, val in value.raw_items():
-                if value._key_fn(key) == key:
-                    compressed_val, ext = self._prepare_sample(val)
-                    if ext:
-                        key = f"{key}.{ext}"
-                    new_dict[key] = compressed_val
-                    continue
-                if key.endswith(".bin"):
-                    offset = val["offset"]
-                    length = val["length"]
-                    other = value.context
-                    if (
-                        self.compression != other.header["compression"]
-                        or not self.binary_threshold
-                        or length < self.binary_threshold
-                        or self.compress_ratio != other.header["compress_ratio"]
-                        or (self.compression is not None and length < self.compress_threshold)
-                    ):
-                        # fallback
-                        val = other._lazy_load_value(key, val)
-                        key = value._key_fn(key)
-                        compressed_val, ext = self._prepare_sample(val)
-                        if ext:
-                            key = f"{key}.{ext}"
-                        new_dict[key] = compressed_val
-                        continue
-                    if not other.bin:
-                        other.bin = open(other.path.with_suffix(".binx"), "rb")
-                    other.bin.seek(offset)
-                    data = other.bin.read(length)
-                    if not self.bin:
-                        self.bin = open(self.path.with_suffix(".binx"), "wb")
-                    offset = self.bin.tell()
-                    self.bin.write(data)
-                    new_dict[key] = {"offset": offset, "length": length}
-                    continue
-                new_dict[key] = value.eagerize(val)
-            return new_dict, None
-
-        elif isinstance(value, list):
-            compressed_list = []
-            for item in value:
-                compressed_item, _ = self._prepare_sample(item)
-                compressed_list.append(compressed_item)
-            return compressed_list, None
-
-        else:
-            return self._prepare_value(value)
+    def _store_bin(self, data):
+        self._flush_bin_run()
+        if not self.bin:
+            self.bin = open(self.path.with_suffix(".binx"), "wb")
+        offset = self.bin.tell()
+        self.bin.write(data)
+        return {"offset": offset, "length": len(data)}
 
     def _prepare_index(self, array: np.ndarray):
         assert isinstance(array, np.ndarray) and array.dtype == np.uint64, "Index must be a NumPy array with dtype=uint64"
         data = array.tobytes()
         if self.binary_threshold is not None and len(data) > self.binary_threshold:
-            if not self.bin:
-                self.bin = open(self.path.with_suffix(".binx"), "wb")
-            offset = self.bin.tell()
-            self.bin.write(data)
-            return {"offset": offset, "length": len(data)}, "npy.bin"
+            return self._store_bin(data), "npy.bin"
         if (
             self.index_compression is not None
             and len(data) >= self.compress_threshold
@@ -211,27 +126,105 @@ class JinxShardWriter:
 
 
     def write_sample(self, sample: dict):
+        if self.key_stats is not None:
+            self.key_stats.add(sample)
         prepared_sample, _ = self._prepare_sample(sample)
-        json_line = orjson.dumps(prepared_sample)
-        self.file.write(json_line)
-        self.file.write(b"\n")
+        self._write_line(orjson.dumps(prepared_sample))
+
+    def write_encoded(self, payload, bins, summary=None):
+        if self.key_stats is not None and summary is not None:
+            self.key_stats.update(summary)
+        for location, data in bins:
+            location.update(self._store_bin(data))
+        if bins:
+            payload = orjson.dumps(payload)
+        self._write_line(payload)
+
+    def write_raw(self, line, source=None):
+        """Writes an encoded line read from a shard with identical settings, copying its sidecar ranges from the source shard."""
+        line = bytes(line)
+        if source is not None and f'{self.ext_sep}bin"'.encode("utf-8") in line:
+            sample = orjson.loads(line)
+            self._rebase_bins(sample, source)
+            line = orjson.dumps(sample)
+        self._write_line(line)
+
+    def _rebase_bins(self, value, source):
+        # sidecar references can be nested in dicts and in lists of dicts
+        if isinstance(value, list):
+            for item in value:
+                self._rebase_bins(item, source)
+            return
+        if not isinstance(value, dict):
+            return
+        for key, item in value.items():
+            if key.endswith(f"{self.ext_sep}bin") and isinstance(item, dict) and "offset" in item:
+                item.update(self._copy_bin(source, item["offset"], item["length"]))
+            else:
+                self._rebase_bins(item, source)
+
+    def _copy_bin(self, source, offset, length):
+        # consecutive sidecar ranges of the same source are copied with a single read
+        run = self._bin_run
+        if run is not None and (run[0] is not source or run[1] + run[2] != offset or run[2] + length > _BIN_COPY_CHUNK):
+            self._flush_bin_run()
+            run = None
+        if run is None:
+            if not self.bin:
+                self.bin = open(self.path.with_suffix(".binx"), "wb")
+            run = self._bin_run = [source, offset, 0, self.bin.tell()]
+        location = {"offset": run[3] + run[2], "length": length}
+        run[2] += length
+        return location
+
+    def _flush_bin_run(self):
+        if self._bin_run is not None:
+            source, offset, length, _ = self._bin_run
+            self._bin_run = None
+            self.bin.write(source.read_bin(offset, length))
+
+    def _write_line(self, json_line: bytes):
         self.num_offsets += 1
         self.current_offset += len(json_line)+1
-        self.offsets_file.write(self.current_offset.to_bytes(8, byteorder='little'))
+        self.offsets.append(self.current_offset)
+        if self.block_compression is None:
+            self.file.write(json_line)
+            self.file.write(b"\n")
+            self.file_offset = self.current_offset
+            return
+        self.block.append(json_line)
+        self.block.append(b"\n")
+        self.block_bytes += len(json_line)+1
+        self.block_count += 1
+        if self.block_bytes >= self.block_size or (self.block_lines is not None and self.block_count >= self.block_lines):
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self.block:
+            return
+        compressed = compress_data(b"".join(self.block), self.block_compression)
+        self.file.write(compressed)
+        self.file_offset += len(compressed)
+        self.block_offsets.append(self.file_offset)
+        self.block_starts.append(self.num_offsets)
+        self.block = []
+        self.block_bytes = 0
+        self.block_count = 0
 
     def close(self, shard_id: int, shard_prev: str = None, shard_next: str = None,
               split: str = None, dataset_name: str = None, hash_value: str = None):
-        self.offsets_file.close()
-        with open(self.offsets_tmp_path, "rb") as f:
-            offsets = np.fromfile(f, dtype=np.uint64)
-        index, ext = self._prepare_index(offsets)
+        if self.block_compression is not None:
+            self._flush_block()
+        self._flush_bin_run()
+        index, ext = self._prepare_index(self.offsets.to_array())
+        self.offsets.close()
         index_key = f"index.{ext}"
-        header_offset = self.current_offset
+        header_offset = self.file_offset
         header = {
             index_key: index,
             "num_samples": self.num_offsets,
             "shard_id": shard_id,
-            "version": "1.0",
+            "version": "1.0" if self.block_compression is None else "1.1",
             "encoding": self.encoding,
             "binary_threshold": self.binary_threshold,
             "compression": self.compression,
@@ -240,6 +233,12 @@ class JinxShardWriter:
             "compress_ratio": self.compress_ratio,
             "ext_sep": self.ext_sep,
         }
+        if self.block_compression is not None:
+            header["block_compression"] = self.block_compression
+            block_offsets, ext = self._prepare_index(np.array(self.block_offsets, dtype=np.uint64))
+            header[f"block_offsets.{ext}"] = block_offsets
+            block_starts, ext = self._prepare_index(np.array(self.block_starts, dtype=np.uint64))
+            header[f"block_starts.{ext}"] = block_starts
         if shard_prev:
             header["shard_prev"] = shard_prev
         if shard_next:
@@ -250,13 +249,17 @@ class JinxShardWriter:
             header["dataset_name"] = dataset_name
         if hash_value:
             header["hash"] = hash_value
+        if self.key_stats is not None:
+            header["key_stats"] = self.key_stats.stats
+        if self.dictionaries:
+            header["zstd_dicts"] = {key: self._encode_bytes(data) for key, data in self.dictionaries.items()}
         header_json = orjson.dumps(header)
         self.file.write(header_json)
         self.file.write(f"\n{header_offset}\n".encode("utf-8"))
         self.file.close()
-        os.remove(self.offsets_tmp_path)
         if self.bin:
             self.bin.close()
+        return header
 
     def __enter__(self):
         return self
@@ -265,4 +268,9 @@ class JinxShardWriter:
         self.close(shard_id=-1)
 
     def tell(self):
-        return self.current_offset
+        """Returns the current shard size. The pending block is estimated at the compression ratio of the blocks written so far, or at its uncompressed size before the first block."""
+        if not self.block_bytes:
+            return self.file_offset
+        flushed = self.current_offset - self.block_bytes
+        ratio = self.file_offset / flushed if flushed else 1.0
+        return self.file_offset + int(self.block_bytes * ratio)
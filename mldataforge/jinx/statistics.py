@@ -0,0 +1,146 @@
+import math
+import numbers
+import operator
+import re
+
+import numpy as np
+
+__all__ = ["KeyStatistics", "column_mask", "parse_where", "sample_matches", "sample_summary", "shard_may_match"]
+
+_OPERATORS = {
+    "<=": operator.le,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "<": operator.lt,
+    ">": operator.gt,
+}
+_CONDITION = re.compile(r"^\s*(?:len\(\s*(?P<len_key>[^)]+?)\s*\)|(?P<key>[^<>=]+?))\s*(?P<op><=|>=|==|<|>)\s*(?P<value>\S+)\s*$")
+
+def _measures(value):
+    """Returns (number, length) of a non-null value, either of which is None if it does not apply. Non-finite floats have no number."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return (None if isinstance(value, float) and not math.isfinite(value) else value), None
+    if isinstance(value, np.ndarray):
+        return None, (len(value) if value.ndim else None)
+    if isinstance(value, (str, bytes, bytearray, list, tuple)):
+        return None, len(value)
+    return None, None
+
+def sample_summary(sample, keys):
+    """Reduces the values of keys in a sample to what the shard statistics need, i.e. None for missing or null values and (number, length) otherwise."""
+    return {key: None if sample.get(key) is None else _measures(sample[key]) for key in keys}
+
+class KeyStatistics:
+    """Accumulates per-key statistics for a shard: number of non-null values, nulls, min/max of numbers and min/max length of strings, bytes and lists."""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.stats = {key: dict(count=0, nulls=0) for key in self.keys}
+
+    def update(self, summary):
+        for key, measures in summary.items():
+            stats = self.stats[key]
+            if measures is None:
+                stats["nulls"] += 1
+                continue
+            stats["count"] += 1
+            number, length = measures
+            if number is not None:
+                self._extend(stats, "min", "max", number)
+            if length is not None:
+                self._extend(stats, "min_len", "max_len", length)
+
+    def add(self, sample):
+        self.update(sample_summary(sample, self.keys))
+
+    @staticmethod
+    def _extend(stats, low, high, value):
+        if low not in stats:
+            stats[low] = stats[high] = value
+        elif value < stats[low]:
+            stats[low] = value
+        elif value > stats[high]:
+            stats[high] = value
+
+def _parse_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def parse_where(where):
+    """Parses comma-separated numeric conditions like 'len(text)<=2048,score>=0.5' into (key, measure, op, value) tuples, where measure is 'len' or 'value'."""
+    if where is None or not isinstance(where, str):
+        return where
+    conditions = []
+    for condition in where.split(","):
+        if not condition.strip():
+            continue
+        match = _CONDITION.match(condition)
+        if match is None:
+            raise ValueError(f"Invalid condition '{condition}', expected KEY<op>NUMBER or len(KEY)<op>NUMBER with <op> one of {list(_OPERATORS)}")
+        try:
+            value = _parse_value(match["value"])
+        except ValueError:
+            raise ValueError(f"Invalid number '{match['value']}' in condition '{condition}'")
+        if match["len_key"] is not None:
+            conditions.append((match["len_key"], "len", match["op"], value))
+        else:
+            conditions.append((match["key"], "value", match["op"], value))
+    return conditions
+
+def _range_may_match(low, high, op, value):
+    if op == "<=":
+        return low <= value
+    if op == "<":
+        return low < value
+    if op == ">=":
+        return high >= value
+    if op == ">":
+        return high > value
+    return low <= value <= high
+
+def shard_may_match(key_stats, conditions):
+    """Returns False if the statistics of a shard prove that none of its samples satisfies all conditions."""
+    if not conditions or not key_stats:
+        return True
+    for key, measure, op, value in conditions:
+        stats = key_stats.get(key)
+        if stats is None:
+            continue
+        low, high = ("min_len", "max_len") if measure == "len" else ("min", "max")
+        if low not in stats:
+            return False
+        if stats[low] is None or stats[high] is None:
+            continue
+        if not _range_may_match(stats[low], stats[high], op, value):
+            return False
+    return True
+
+def sample_matches(sample, conditions):
+    """Returns True if the sample satisfies all conditions."""
+    for key, measure, op, value in conditions:
+        if sample.get(key) is None:
+            return False
+        number, length = _measures(sample[key])
+        actual = length if measure == "len" else number
+        if actual is None or not _OPERATORS[op](actual, value):
+            return False
+    return True
+
+def column_mask(columns, conditions):
+    """Returns a boolean mask of the samples in columns, as returned by read_columns, that satisfy all conditions. Conditions on numeric array columns are evaluated vectorized."""
+    mask = None
+    for condition in conditions:
+        key, measure, op, value = condition
+        column = columns[key]
+        if isinstance(column, np.ndarray) and measure == "value":
+            matches = _OPERATORS[op](column, value)
+            if np.issubdtype(column.dtype, np.floating):
+                matches &= np.isfinite(column)
+        else:
+            matches = np.fromiter((sample_matches({key: item}, [condition]) for item in column), dtype=bool, count=len(column))
+        mask = matches if mask is None else mask & matches
+    return mask
@@ -2,13 +2,38 @@ from collections.abc import MutableMapping
 
 __all__ = ["LazyDict"]
 
+_CONTAINERS = (dict, list, set, tuple)
+
 class LazyDict(MutableMapping):
 
+    __slots__ = ("_transform_fn", "_key_fn", "context", "_store", "_pending", "_keys", "_wrapped")
+
     def __init__(self, data, transform_fn, key_fn=lambda x: x, context=None):
         self._transform_fn = transform_fn
         self._key_fn = key_fn
         self.context = context
-        self._store = {k: self._wrap_dicts(v) for k, v in data.items()}
+        # nested dicts and lists are wrapped on first access, _wrapped holds the keys whose values need no wrapping anymore
+        self._store = dict(data)
+        self._wrapped = set()
+        # logical key -> full key of values that have not been transformed yet, built on the first miss
+        self._pending = None
+        self._keys = None
+
+    def _pending_keys(self):
+        if self._pending is None:
+            self._pending = {}
+            keys = {}
+            for full_key in self._store:
+                keys[self._add_pending(full_key)] = None
+            if self._keys is None:
+                self._keys = tuple(keys)
+        return self._pending
+
+    def _add_pending(self, full_key):
+        logical_key = self._key_fn(full_key)
+        if logical_key != full_key:
+            self._pending.setdefault(logical_key, full_key)
+        return logical_key
 
     def materialize(self):
         return self._materialize(self)
@@ -39,11 +64,18 @@ class LazyDict(MutableMapping):
         else:
             return obj
 
+    def _value(self, key):
+        value = self._store[key]
+        if isinstance(value, _CONTAINERS) and key not in self._wrapped:
+            value = self._store[key] = self._wrap_dicts(value)
+            self._wrapped.add(key)
+        return value
+
     def __getitem__(self, key):
         if key in self._store:
-            return self._store[key]
+            return self._value(key)
 
-        full_key = self._resolve_full_key(key)
+        full_key = self._pending_keys().get(key)
         if full_key is None:
             raise KeyError(f"No key resolved for logical key '{key}'")
 
@@ -53,16 +85,14 @@ class LazyDict(MutableMapping):
         new_value = self._transform_fn(full_key, wrapped_value)
 
         self._store[key] = new_value
-        to_delete = [full_key for full_key in self._store if full_key != key and self._key_fn(full_key) == key]
-        for full_key in to_delete:
-            del self._store[full_key]
+        self._wrapped.add(key)
+        del self._store[full_key]
+        self._wrapped.discard(full_key)
+        del self._pending[key]
         return new_value
 
-    def _resolve_full_key(self, logical_key):
-        for full_key in self._store:
-            if self._key_fn(full_key) == logical_key:
-                return full_key
-        return None
+    def __contains__(self, key):
+        return key in self._store or key in self._pending_keys()
 
     def _wrap_dicts(self, obj):
         if isinstance(obj, dict):
@@ -77,20 +107,40 @@ class LazyDict(MutableMapping):
             return obj
 
     def __setitem__(self, key, value):
+        if key not in self._store:
+            if self._pending is not None:
+                self._add_pending(key)
+            self._keys = None
         self._store[key] = value
+        self._wrapped.add(key)
 
     def __delitem__(self, key):
-        full_key = self._resolve_full_key(key)
-        if full_key is None:
+        full_key = self._pending_keys().pop(key, None)
+        if full_key is not None:
+            del self._store[full_key]
+            self._wrapped.discard(full_key)
+        elif key not in self._store:
             raise KeyError(key)
-        del self._store[full_key]
+        if key in self._store:
+            del self._store[key]
+            self._wrapped.discard(key)
+            logical_key = self._key_fn(key)
+            if self._pending.get(logical_key) == key:
+                del self._pending[logical_key]
+        self._keys = None
+
+    def _logical_keys(self):
+        if self._keys is None and self._pending is None:
+            self._pending_keys()
+        elif self._keys is None:
+            self._keys = tuple(dict.fromkeys(self._key_fn(k) for k in self._store))
+        return self._keys
 
     def __iter__(self):
-        logical_keys = {self._key_fn(k) for k in self._store}
-        return iter(logical_keys)
+        return iter(self._logical_keys())
 
     def __len__(self):
-        return len(set(self._key_fn(k) for k in self._store))
+        return len(self._logical_keys())
 
     def items(self):
         for key in self:
@@ -98,7 +148,7 @@ class LazyDict(MutableMapping):
 
     def raw_items(self):
         for key in self._store:
-            yield key, self._store[key]
+            yield key, self._value(key)
 
     def values(self):
         for key in self:
@@ -1,4 +1,6 @@
 import bisect
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from datasets import Dataset
 import json
@@ -6,6 +8,7 @@ import mmap
 import numpy as np
 import os
 import shutil
+import struct
 from streaming.base.compression import compress, decompress, get_compression_extension, is_compression
 from streaming.base.format import _readers
 from streaming.base.format.base.reader import FileInfo, JointReader
@@ -14,8 +17,15 @@ from streaming.base.format.mds.encodings import mds_decode, mds_encode, is_mds_e
 from streaming.base.hashing import get_hash, is_hash
 from streaming.base.util import bytes_to_int
 from typing import Any, Optional, Generator, Self, Union
+try:
+    from streaming.base.format.mds.encodings import _get_coder
+except ImportError:
+    _get_coder = None
 
 from .compression import open_compression
+from .indexing import gather_sharded
+from .prefetch import check_prefetch_backend, prefetch, prefetch_shards
+from .scratch import ScratchCache
 
 __all__ = [
     "MDSBulkDatasetReader",
@@ -31,14 +41,71 @@ MDS_READERS = dict(
     choices=["streaming", "bulk", "ram"],
 )
 
+# encodings with fixed-size numeric values that read_columns decodes in one vectorized pass
+_FIXED_DTYPES = {
+    "int": np.int64,
+    "int8": np.int8,
+    "int16": np.int16,
+    "int32": np.int32,
+    "int64": np.int64,
+    "uint8": np.uint8,
+    "uint16": np.uint16,
+    "uint32": np.uint32,
+    "uint64": np.uint64,
+    "float16": np.float16,
+    "float32": np.float32,
+    "float64": np.float64,
+}
+
+def _decoder(encoding: str):
+    """Returns a function decoding values of encoding, using the private coder lookup of streaming when available and the public mds_decode otherwise."""
+    if _get_coder is not None:
+        coder = _get_coder(encoding)
+        if coder is None:
+            raise ValueError(f"Unsupported encoding: {encoding}.")
+        return coder.decode
+    if not is_mds_encoding(encoding):
+        raise ValueError(f"Unsupported encoding: {encoding}.")
+    return lambda data, encoding=encoding: mds_decode(encoding, data)
+
+def _concat_columns(parts: list[dict[str, Any]], columns: list[str]) -> dict[str, Any]:
+    result = {}
+    for name in columns:
+        values = [part[name] for part in parts]
+        if values and all(isinstance(value, np.ndarray) for value in values):
+            result[name] = np.concatenate(values)
+        else:
+            result[name] = [item for value in values for item in value]
+    return result
+
+def _read_shard(reader_class: type, shard: dict[str, Any]) -> list[dict[str, Any]]:
+    with reader_class(**shard) as reader:
+        return list(reader)
+
 class MDSBulkDatasetReader:
-    """Reader for MDS format that reads samples fast in linear order. Does not support random access. Supports sample compression."""
+    """Reader for MDS format that reads samples fast in linear order. Does not support random access. Supports sample compression.
+
+    With shard_workers, shards are decompressed and decoded by that many worker processes while the samples are still
+    yielded in shard order. At most prefetch shards (default: twice the number of workers) are in flight at a time.
+    """
 
     def __init__(
         self,
         dirnames: list[str],
         split: Optional[str],
+        prefetch: Optional[int] = None,
+        prefetch_backend: str = "process",
+        columns: Optional[list[str]] = None,
+        shard_workers: Optional[int] = None,
     ) -> None:
+        check_prefetch_backend(prefetch_backend)
+        if shard_workers is not None and shard_workers < 1:
+            raise ValueError(f"Number of shard workers must be positive, got {shard_workers}.")
+        if shard_workers and prefetch and prefetch < shard_workers:
+            raise ValueError(f"Prefetch depth ({prefetch}) must be at least the number of shard workers ({shard_workers}).")
+        self.prefetch = prefetch
+        self.prefetch_backend = prefetch_backend
+        self.shard_workers = shard_workers
         self.shards = []
         self.samples = 0
         for dirname in dirnames:
@@ -51,6 +118,7 @@ class MDSBulkDatasetReader:
                 self.shards.append({
                     "filename": filename,
                     "compression": shard['compression'],
+                    "columns": columns,
                 })
                 self.samples += shard['samples']
 
@@ -58,6 +126,17 @@ class MDSBulkDatasetReader:
         return self.samples
 
     def __iter__(self) -> Generator[dict[str, Any], None, None]:
+        shards = ((MDSBulkReader, shard) for shard in self.shards)
+        if self.shard_workers:
+            yield from prefetch_shards(_read_shard, shards, self.prefetch or 2 * self.shard_workers, workers=self.shard_workers)
+        elif not self.prefetch:
+            yield from self._iter_shards()
+        elif self.prefetch_backend == "process":
+            yield from prefetch_shards(_read_shard, shards, self.prefetch)
+        else:
+            yield from prefetch(self._iter_shards(), self.prefetch)
+
+    def _iter_shards(self) -> Generator[dict[str, Any], None, None]:
         for shard in self.shards:
             with MDSBulkReader(**shard) as reader:
                 yield from reader
@@ -70,13 +149,23 @@ class MDSBulkDatasetReader:
             shard["fp"].close()
 
 class MDSBulkReader:
-    """Reader for MDS shards that reads samples fast in linear order. Does not support random access. Supports sample compression."""
+    """Reader for MDS shards that reads samples fast in linear order. Does not support random access. Supports sample compression.
+
+    The shard is read in blocks of block_size bytes and samples are sliced out of the current block as memoryviews. With
+    debug, the stream position is checked against the offsets index after every read.
+    """
 
     def __init__(
         self,
         filename: str,
         compression: Optional[str],
+        columns: Optional[list[str]] = None,
+        block_size: int = 2**24,
+        debug: bool = False,
     ) -> None:
+        self.columns = None if columns is None else set(columns)
+        self.block_size = block_size
+        self.debug = debug
         self.sample_compression = None
         if compression is not None and compression.startswith("sample::"):
             compression, self.sample_compression = None, compression.removeprefix("sample::")
@@ -87,37 +176,62 @@ class MDSBulkReader:
         self.column_encodings = info["column_encodings"]
         self.column_names = info["column_names"]
         self.column_sizes = info["column_sizes"]
-        assert self.fp.tell() == self.index[0]
-
-    def decode_sample(self, data: bytes) -> dict[str, Any]:
-        sizes = []
-        idx = 0
-        for key, size in zip(self.column_names, self.column_sizes):
-            if size:
-                sizes.append(size)
-            else:
-                size, = np.frombuffer(data[idx:idx + 4], np.uint32)
-                sizes.append(size)
-                idx += 4
+        # sizes of variable-size columns and decoders are resolved once per shard instead of once per value
+        self.variable_sizes = struct.Struct(f"<{sum(1 for size in self.column_sizes if not size)}I")
+        self.decoders = []
+        for key, encoding, size in zip(self.column_names, self.column_encodings, self.column_sizes):
+            decode = _decoder(encoding)
+            # numeric values are copied by decoding, everything else is copied out of the block first
+            copy = encoding not in _FIXED_DTYPES
+            self.decoders.append((decode if self.columns is None or key in self.columns else None, size, copy, key))
+        if self.debug:
+            assert self.fp.tell() == self.index[0]
+        self.block = memoryview(b"")
+        self.block_start = int(self.index[0])
+
+    def decode_sample(self, data: Union[bytes, memoryview]) -> dict[str, Any]:
+        # the sizes of all variable-size columns precede the column data
+        variable_sizes = iter(self.variable_sizes.unpack_from(data))
+        idx = self.variable_sizes.size
         sample = {}
-        for key, encoding, size in zip(self.column_names, self.column_encodings, sizes):
-            value = data[idx:idx + size]
-            sample[key] = mds_decode(encoding, value)
+        for decode, size, copy, key in self.decoders:
+            if not size:
+                size = next(variable_sizes)
+            if decode is not None:
+                value = data[idx:idx + size]
+                sample[key] = decode(bytes(value) if copy else value)
             idx += size
         return sample
 
-    def get_sample_data(self, idx: int) -> bytes:
-        begin, end = self.index[idx:idx+2]
-        assert self.fp.tell() == begin
-        data = self.fp.read(end - begin)
-        assert self.fp.tell() == end
-        assert data
+    def get_sample_data(self, idx: int) -> memoryview:
+        begin, end = int(self.index[idx]), int(self.index[idx+1])
+        if end - self.block_start > len(self.block):
+            self._read_block(begin, end)
+        data = self.block[begin - self.block_start:end - self.block_start]
+        if self.debug:
+            assert len(data) == end - begin and data
         return data
 
+    def _read_block(self, begin: int, end: int) -> None:
+        # the unread tail of the current block is carried over, so the stream is only ever read forward
+        rest = self.block[begin - self.block_start:]
+        chunks = [rest] if len(rest) else []
+        needed = end - begin - len(rest)
+        while needed > 0:
+            chunk = self.fp.read(max(self.block_size, needed))
+            if not chunk:
+                raise EOFError(f"Shard ended before the end of sample data at offset {end}")
+            chunks.append(chunk)
+            needed -= len(chunk)
+        self.block = memoryview(chunks[0] if len(chunks) == 1 else b"".join(chunks))
+        self.block_start = begin
+        if self.debug:
+            assert self.fp.tell() == self.block_start + len(self.block)
+
     def get_item(self, idx: int) -> dict[str, Any]:
         data = self.get_sample_data(idx)
         if self.sample_compression is not None:
-            data = decompress(self.sample_compression, data)
+            data = decompress(self.sample_compression, bytes(data))
         return self.decode_sample(data)
 
     def __iter__(self) -> Generator[dict[str, Any], None, None]:
@@ -128,15 +242,54 @@ class MDSBulkReader:
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.block = None
         self.fp.close()
 
+class _ReaderCache:
+    """Opens MDSRAMReaders on first access and keeps at most max_open of them open, closing the least recently used."""
+
+    def __init__(self, shards: list[dict[str, Any]], max_open: int, **reader_kwargs: Any) -> None:
+        self.shards = shards
+        self.max_open = max_open
+        self.reader_kwargs = reader_kwargs
+        self.open = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def __getitem__(self, idx: int) -> "MDSRAMReader":
+        reader = self.open.get(idx)
+        if reader is not None:
+            self.open.move_to_end(idx)
+            return reader
+        reader = MDSRAMReader(**self.shards[idx], **self.reader_kwargs)
+        self.open[idx] = reader
+        while len(self.open) > max(self.max_open, 1):
+            _, evicted = self.open.popitem(last=False)
+            evicted.__exit__(None, None, None)
+        return reader
+
+    def close(self) -> None:
+        for reader in self.open.values():
+            reader.__exit__(None, None, None)
+        self.open.clear()
+
 class MDSRAMDatasetReader(Dataset):
     def __init__(
         self,
         dirnames: list[str],
         split: Optional[str],
+        prefetch: Optional[int] = None,
+        prefetch_backend: str = "process",
+        columns: Optional[list[str]] = None,
+        scratch_dir: Optional[str] = None,
+        scratch_bytes: Optional[int] = None,
+        max_open_shards: int = 2**7,
     ) -> None:
-        self.readers = []
+        check_prefetch_backend(prefetch_backend)
+        self.prefetch = prefetch
+        self.prefetch_backend = prefetch_backend
+        self.shards = []
         self.cumulative_lengths = [0]
         for dirname in dirnames:
             if split is not None:
@@ -145,16 +298,30 @@ class MDSRAMDatasetReader(Dataset):
             for shard in index["shards"]:
                 basename = shard['raw_data']['basename'] if shard['zip_data'] is None else shard['zip_data']['basename']
                 filename = os.path.join(dirname, basename)
-                self.readers.append(MDSRAMReader(filename=filename, compression=shard['compression']))
+                self.shards.append({
+                    "filename": filename,
+                    "compression": shard['compression'],
+                    "columns": columns,
+                })
                 self.cumulative_lengths.append(self.cumulative_lengths[-1] + shard['samples'])
+        # shards are sized from index.json and only opened (and decompressed) when first touched
+        self.readers = _ReaderCache(self.shards, max_open_shards, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes)
 
     def __len__(self) -> int:
         return self.cumulative_lengths[-1]
 
     def __iter__(self) -> Generator[dict[str, Any], None, None]:
-        for reader in self.readers:
-            for sample in reader:
-                    yield sample
+        if not self.prefetch:
+            yield from self._iter_shards()
+        elif self.prefetch_backend == "process":
+            # workers read sequentially, which is faster than random access for a single pass
+            yield from prefetch_shards(_read_shard, ((MDSBulkReader, shard) for shard in self.shards), self.prefetch)
+        else:
+            yield from prefetch(self._iter_shards(), self.prefetch)
+
+    def _iter_shards(self) -> Generator[dict[str, Any], None, None]:
+        for idx in range(len(self.readers)):
+            yield from self.readers[idx]
 
     def __getitem__(self, index):
         if index < 0 or index >= len(self):
@@ -163,12 +330,31 @@ class MDSRAMDatasetReader(Dataset):
         local_index = index - self.cumulative_lengths[dataset_idx]
         return self.readers[dataset_idx][local_index]
 
+    def __getitems__(self, indices: list[int]) -> list[dict[str, Any]]:
+        return gather_sharded(self.readers, self.cumulative_lengths, indices)
+
+    def read_columns(self, start: int = 0, stop: Optional[int] = None, columns: Optional[list[str]] = None) -> dict[str, Any]:
+        """Decodes the given columns of samples start to stop shard by shard, see MDSRAMReader.read_columns."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = min(max(start, 0), stop)
+        first = bisect.bisect_right(self.cumulative_lengths, start) - 1
+        parts = []
+        for idx in range(first, len(self.readers)):
+            offset = self.cumulative_lengths[idx]
+            if offset >= stop and parts:
+                break
+            parts.append(self.readers[idx].read_columns(start - offset, stop - offset, columns))
+            if columns is None:
+                columns = list(parts[-1])
+        if not parts:
+            return {name: [] for name in columns or []}
+        return _concat_columns(parts, columns)
+
     def __enter__(self) -> "MDSRAMDatasetReader":
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
-        for reader in self.readers:
-            reader.__exit__(exc_type, exc_value, traceback)
+        self.readers.close()
 
 class MDSRAMReader:
     """Reader for MDS shards that reads samples fast with random access, among others by caching the index. Supports sample compression."""
@@ -178,21 +364,19 @@ class MDSRAMReader:
         filename: str,
         compression: Optional[str],
         buf_size: int = 2**24,
+        columns: Optional[list[str]] = None,
+        scratch_dir: Optional[str] = None,
+        scratch_bytes: Optional[int] = None,
     ) -> None:
+        self.columns = None if columns is None else set(columns)
         self.sample_compression = None
         if compression is not None and compression.startswith("sample::"):
             compression, self.sample_compression = None, compression.removeprefix("sample::")
-        self.uncompressed_filename = None
         if compression is not None:
-            self.uncompressed_filename = filename.rsplit(".mds", 1)[0]+".mds"
-            with open_compression(filename, "rb", compression=compression) as f_in, open(self.uncompressed_filename, "wb") as f_out:
-                while True:
-                    buf = f_in.read(buf_size)
-                    if not buf:
-                        break
-                    f_out.write(buf)
-            filename = self.uncompressed_filename
-        self._fp = open(filename, "rb", 0)
+            # compressed shards are read from a decompressed copy in the shared scratch cache
+            self._fp = ScratchCache(scratch_dir, scratch_bytes).open(filename, compression, buf_size)
+        else:
+            self._fp = open(filename, "rb", 0)
         self.map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
         self.samples = np.ndarray(shape=(1,), dtype=np.uint32, buffer=self.map, offset=0)[0]
         self.index = np.ndarray(shape=(1+self.samples,), dtype=np.uint32, buffer=self.map, offset=4)
@@ -201,7 +385,8 @@ class MDSRAMReader:
         self.column_names = info["column_names"]
         self.column_sizes = info["column_sizes"]
 
-    def decode_sample(self, data: bytes) -> dict[str, Any]:
+    def decode_sample(self, data: bytes, columns: Optional[list[str]] = None) -> dict[str, Any]:
+        columns = self.columns if columns is None else set(columns)
         sizes = []
         idx = 0
         for key, size in zip(self.column_names, self.column_sizes):
@@ -213,8 +398,9 @@ class MDSRAMReader:
                 idx += 4
         sample = {}
         for key, encoding, size in zip(self.column_names, self.column_encodings, sizes):
-            value = data[idx:idx + size]
-            sample[key] = mds_decode(encoding, value)
+            if columns is None or key in columns:
+                value = data[idx:idx + size]
+                sample[key] = mds_decode(encoding, value)
             idx += size
         return sample
 
@@ -223,6 +409,53 @@ class MDSRAMReader:
         data = self.map[begin:end]
         return data
 
+    def _column_names(self, columns: Optional[list[str]]) -> list[str]:
+        if columns is None:
+            return [name for name in self.column_names if self.columns is None or name in self.columns]
+        unknown = [name for name in columns if name not in self.column_names]
+        if unknown:
+            raise KeyError(f"Unknown columns {unknown}, available columns are {self.column_names}")
+        return list(columns)
+
+    def read_columns(self, start: int = 0, stop: Optional[int] = None, columns: Optional[list[str]] = None) -> dict[str, Any]:
+        """Decodes the given columns of samples start to stop. Fixed-size numeric columns are decoded into NumPy arrays in one vectorized pass over the offsets index, other columns into lists."""
+        names = self._column_names(columns)
+        stop = self.samples if stop is None else min(stop, self.samples)
+        start = min(max(start, 0), stop)
+        if self.sample_compression is not None:
+            samples = [self.decode_sample(decompress(self.sample_compression, self.get_sample_data(idx)), names) for idx in range(start, stop)]
+            return {name: self._column_values(name, [sample[name] for sample in samples]) for name in names}
+        wanted = set(names)
+        buf = np.frombuffer(self.map, np.uint8)
+        offsets = self.index[start:stop].astype(np.int64)
+        num_variable = sum(1 for size in self.column_sizes if not size)
+        if num_variable:
+            sizes = buf[offsets[:, None] + np.arange(4 * num_variable)].view(np.uint32)
+            offsets = offsets + 4 * num_variable
+        result = {}
+        variable = 0
+        for name, encoding, size in zip(self.column_names, self.column_encodings, self.column_sizes):
+            if size:
+                lengths = None
+            else:
+                lengths = sizes[:, variable].astype(np.int64)
+                variable += 1
+            if name in wanted:
+                if size and encoding in _FIXED_DTYPES:
+                    result[name] = buf[offsets[:, None] + np.arange(size)].view(_FIXED_DTYPES[encoding]).reshape(-1)
+                else:
+                    ends = offsets + (size if lengths is None else lengths)
+                    result[name] = [mds_decode(encoding, self.map[begin:end]) for begin, end in zip(offsets.tolist(), ends.tolist())]
+            offsets = offsets + (size if lengths is None else lengths)
+        del buf
+        return {name: result[name] for name in names}
+
+    def _column_values(self, name: str, values: list[Any]) -> Any:
+        encoding = self.column_encodings[self.column_names.index(name)]
+        if encoding in _FIXED_DTYPES:
+            return np.array(values, dtype=_FIXED_DTYPES[encoding])
+        return values
+
     def get_item(self, idx: int) -> dict[str, Any]:
         data = self.get_sample_data(idx)
         if self.sample_compression is not None:
@@ -237,6 +470,14 @@ class MDSRAMReader:
             raise IndexError("Index out of range")
         return self.get_item(index)
 
+    def __getitems__(self, indices: list[int]) -> list[dict[str, Any]]:
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("Index out of range")
+        unique, inverse = np.unique(indices, return_inverse=True)
+        samples = [self.get_item(idx) for idx in unique]
+        return [samples[i] for i in inverse]
+
     def __iter__(self) -> Generator[dict[str, Any], None, None]:
         for i in range(self.samples):
             yield self.get_item(i)
@@ -245,12 +486,18 @@ class MDSRAMReader:
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # the map holds a duplicate of the file descriptor and thereby the scratch cache lock, the index view must go first
+        self.index = None
+        self.map.close()
         self._fp.close()
-        if self.uncompressed_filename is not None:
-            os.remove(self.uncompressed_filename)
 
 class MDSSampleWriter:
-    """Writer for MDS format that works as a sample compression-aware replacement for the MDSWriter from python-streaming."""
+    """Writer for MDS format that works as a sample compression-aware replacement for the MDSWriter from python-streaming.
+
+    With flush_workers, full shards are compressed, hashed and written by that many background threads while encoding
+    continues. At most max_pending_shards (default: twice the number of workers) full shards are held in memory. Shards
+    are named when they are submitted and recorded in the index in submission order, so the output is deterministic.
+    """
 
     format = 'mds'
     extra_bytes_per_sample = 4
@@ -262,6 +509,9 @@ class MDSSampleWriter:
                  compression: Optional[str] = None,
                  hashes: Optional[list[str]] = None,
                  size_limit: Optional[Union[int, str]] = 1 << 26,
+                 append: bool = False,
+                 flush_workers: Optional[int] = None,
+                 max_pending_shards: Optional[int] = None,
                  **kwargs: Any) -> None:
         compression = compression or None
         sample_compression = None
@@ -298,6 +548,10 @@ class MDSSampleWriter:
         ]
         if invalid_kwargs:
             raise ValueError(f'Invalid Writer argument(s): {invalid_kwargs} ')
+        if flush_workers is not None and flush_workers < 1:
+            raise ValueError(f'`flush_workers` must be positive, instead, found as {flush_workers}.')
+        if max_pending_shards is not None and max_pending_shards < 1:
+            raise ValueError(f'`max_pending_shards` must be positive, instead, found as {max_pending_shards}.')
 
         self.compression = compression
         self.sample_compression = sample_compression
@@ -307,10 +561,20 @@ class MDSSampleWriter:
         self.new_shard_size: int
 
         self.shards = []
+        self.pending = deque()
+        self.executor = ThreadPoolExecutor(max_workers=flush_workers) if flush_workers else None
+        self.max_pending_shards = max_pending_shards or 2 * (flush_workers or 1)
 
-        # Remove local directory if requested prior to creating writer
+        # Remove local directory if requested prior to creating writer, unless appending to its shards
         self.local = os.path.expanduser(out)
-        if os.path.exists(self.local) and len(os.listdir(self.local)) != 0:
+        index_filename = os.path.join(self.local, get_index_basename())
+        if append and os.path.exists(index_filename):
+            with open(index_filename) as f:
+                self.shards = json.load(f)["shards"]
+        elif append and os.path.exists(self.local) and len(os.listdir(self.local)) != 0:
+            # appending never deletes anything
+            raise FileExistsError(f'Cannot append to a non-empty directory without {get_index_basename()}: {self.local}')
+        elif os.path.exists(self.local) and len(os.listdir(self.local)) != 0:
             if kwargs.get('exist_ok', False):
                 raise FileExistsError(f'Directory is not empty: {self.local}')
             shutil.rmtree(self.local)
@@ -331,6 +595,10 @@ class MDSSampleWriter:
             self.column_sizes.append(size)
 
         obj = self.get_config()
+        for shard in self.shards:
+            if (shard['column_names'], shard['column_encodings']) != (self.column_names, self.column_encodings):
+                raise ValueError(f'Cannot append columns {dict(zip(self.column_names, self.column_encodings))} to shards with columns ' +
+                                 f'{dict(zip(shard["column_names"], shard["column_encodings"]))}.')
         text = json.dumps(obj, sort_keys=True)
         self.config_data = text.encode('utf-8')
         self.extra_bytes_per_shard = 4 + 4 + len(self.config_data)
@@ -369,22 +637,36 @@ class MDSSampleWriter:
     def flush_shard(self) -> None:
         raw_data_basename, zip_data_basename = self._name_next_shard()
         raw_data = self.encode_joint_shard()
-        raw_data_info, zip_data_info = self._process_file(raw_data, raw_data_basename,
-                                                          zip_data_basename)
+        if self.executor is None:
+            raw_data_info, zip_data_info = self._process_file(raw_data, raw_data_basename,
+                                                              zip_data_basename)
+            self._add_shard(len(self.new_samples), raw_data_info, zip_data_info)
+            return
+        while len(self.pending) >= self.max_pending_shards:
+            self._collect_shard()
+        future = self.executor.submit(self._process_file, raw_data, raw_data_basename, zip_data_basename)
+        self.pending.append((len(self.new_samples), future))
+
+    def _add_shard(self, samples: int, raw_data_info: dict, zip_data_info: Optional[dict]) -> None:
         obj = {
-            'samples': len(self.new_samples),
+            'samples': samples,
             'raw_data': raw_data_info,
             'zip_data': zip_data_info
         }
         obj.update(self.get_config())
         self.shards.append(obj)
 
+    def _collect_shard(self) -> None:
+        samples, future = self.pending.popleft()
+        self._add_shard(samples, *future.result())
+
     def _reset_cache(self) -> None:
         self.new_samples = []
         self.new_shard_size = self.extra_bytes_per_shard
 
     def _name_next_shard(self, extension: Optional[str] = None) -> tuple[str, Optional[str]]:
-        shard = len(self.shards)
+        # shards still being written by the flush workers already have their numbers
+        shard = len(self.shards) + len(self.pending)
         parts = ['shard', f'{shard:05}', self.format]
         if extension:
             parts.append(extension)
@@ -454,9 +736,16 @@ class MDSSampleWriter:
             json.dump(obj, out, sort_keys=True)
 
     def finish(self) -> None:
-        if self.new_samples:
-            self.flush_shard()
-            self._reset_cache()
+        try:
+            if self.new_samples:
+                self.flush_shard()
+                self._reset_cache()
+            while self.pending:
+                self._collect_shard()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
         self._write_index()
 
     def __enter__(self) -> Self:
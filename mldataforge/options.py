@@ -1,12 +1,21 @@
 import click
 
-from .compression import JSONL_COMPRESSIONS, MDS_COMPRESSIONS, MSGPACK_COMPRESSIONS, PARQUET_COMPRESSIONS
+from .compression import JINX_BLOCK_COMPRESSIONS, JSONL_COMPRESSIONS, MDS_COMPRESSIONS, MSGPACK_COMPRESSIONS, PARQUET_COMPRESSIONS
+from .jinx import parse_compress_rules, parse_where
 from .mds import MDS_READERS
+from .prefetch import PREFETCH_BACKENDS
+from .scratch import SCRATCH_BYTES, SCRATCH_DIR
 
 __all__ = [
+    "append_option",
     "batch_size_option",
     "binary_threshold_option",
+    "block_compression_option",
+    "block_lines_option",
+    "block_size_option",
     "buf_size_option",
+    "columns_option",
+    "compress_rules_option",
     "compress_threshold_option",
     "compress_ratio_option",
     "compression_args_option",
@@ -14,6 +23,8 @@ __all__ = [
     "encoding_option",
     "every_option",
     "ext_sep_option",
+    "flush_workers_option",
+    "index_cache_option",
     "index_option",
     "lazy_option",
     "mmap_option",
@@ -24,17 +35,38 @@ __all__ = [
     "override_encoding_option",
     "overwrite_option",
     "percentage_option",
+    "prefetch_backend_option",
+    "prefetch_option",
     "prefix_option",
     "reader_option",
+    "scratch_bytes_option",
+    "scratch_dir_option",
     "shard_size_option",
+    "shard_workers_option",
     "shuffle_option",
     "size_hint_option",
     "sort_key_option",
     "split_option",
+    "stats_keys_option",
     "trafo_option",
+    "unordered_option",
+    "where_option",
+    "workers_option",
     "yes_option",
+    "zstd_dict_samples_option",
+    "zstd_dict_size_option",
 ]
 
+def append_option():
+    """
+    Option for appending new shards to an existing output directory instead of replacing it.
+    """
+    return click.option(
+        "--append",
+        is_flag=True,
+        help="Append new shards to an existing output directory instead of replacing it.",
+    )
+
 def batch_size_option(default=2**16):
     """
     Option for specifying the batch size.
@@ -56,6 +88,39 @@ def binary_threshold_option(default=None):
         help=f"Binary threshold for compression (default: {default}).",
     )
 
+def block_compression_option():
+    """
+    Option for specifying the compression of line blocks in JINX shards.
+    """
+    return click.option(
+        "--block-compression",
+        default=JINX_BLOCK_COMPRESSIONS["default"],
+        type=click.Choice(JINX_BLOCK_COMPRESSIONS["choices"], case_sensitive=False),
+        help="Compress groups of lines as independent blocks that can still be accessed randomly (default: no blocks).",
+    )
+
+def block_lines_option(default=None):
+    """
+    Option for specifying the maximum number of lines per compressed block.
+    """
+    return click.option(
+        "--block-lines",
+        default=default,
+        type=int,
+        help="Maximum number of lines per compressed block (default: no limit).",
+    )
+
+def block_size_option(default=2**20):
+    """
+    Option for specifying the uncompressed size at which a compressed block is closed.
+    """
+    return click.option(
+        "--block-size",
+        default=default,
+        type=int,
+        help=f"Uncompressed size in bytes at which a compressed block is closed (default: {default}).",
+    )
+
 def buf_size_option(default=2**24):
     """
     Option for specifying the buffer size.
@@ -66,6 +131,34 @@ def buf_size_option(default=2**24):
         help=f"Buffer size for pigz compression (default: {default}).",
     )
 
+def columns_option():
+    """
+    Option for specifying a comma-separated list of columns to read. Other columns are skipped without being decoded.
+    """
+    return click.option(
+        "--columns",
+        default=None,
+        callback=lambda ctx, param, value: None if value is None else [column.strip() for column in value.split(",") if column.strip()],
+        help="Comma-separated list of columns to read (default: all columns).",
+    )
+
+def _compress_rules(ctx, param, value):
+    try:
+        return parse_compress_rules(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+def compress_rules_option():
+    """
+    Option for specifying per-key compression rules that override the learned compression decisions.
+    """
+    return click.option(
+        "--compress-rules",
+        default=None,
+        callback=_compress_rules,
+        help="Comma-separated per-key compression rules, e.g. 'images=none,text=zstd:3' (default: learn per key).",
+    )
+
 def compress_threshold_option(default=2**6):
     """
     Option for specifying the compression threshold under which to not compress.
@@ -141,6 +234,27 @@ def ext_sep_option(default="."):
         help=f"Extension separator (default: {default}).",
     )
 
+def flush_workers_option(default=None):
+    """
+    Option for specifying the number of background threads that flush MDS shards.
+    """
+    return click.option(
+        "--flush-workers",
+        default=default,
+        type=int,
+        help="Number of background threads that compress, hash and write full MDS shards while encoding continues (default: flush in the writing thread).",
+    )
+
+def index_cache_option():
+    """
+    Option for specifying whether to cache decoded JINX indexes next to the shards.
+    """
+    return click.option(
+        "--index-cache",
+        is_flag=True,
+        help="Cache decoded shard indexes in .idx files next to the JINX shards.",
+    )
+
 def index_option():
     """
     Option for specifying an index file.
@@ -245,6 +359,28 @@ def percentage_option(default=None):
         help=f"Percentage of items to process (default: {default}).",
     )
 
+def prefetch_backend_option(default=PREFETCH_BACKENDS["default"]):
+    """
+    Option for specifying whether samples are prefetched by a thread or shards by worker processes.
+    """
+    return click.option(
+        "--prefetch-backend",
+        default=default,
+        type=click.Choice(PREFETCH_BACKENDS["choices"], case_sensitive=False),
+        help=f"Prefetch backend: 'process' decodes whole shards in parallel worker processes (not with --lazy), 'thread' decodes in one background thread that shares the GIL with the consumer and therefore only overlaps I/O (default: {default}).",
+    )
+
+def prefetch_option(default=None):
+    """
+    Option for specifying how far ahead to read while iterating.
+    """
+    return click.option(
+        "--prefetch",
+        default=default,
+        type=int,
+        help="Number of samples (thread backend) or shards (process backend) to read and decode ahead (default: no prefetching).",
+    )
+
 def prefix_option(default="part-"):
     """
     Option for specifying the prefix for output files.
@@ -266,6 +402,28 @@ def reader_option(default=MDS_READERS["default"]):
         help=f"Reader type (default: {default}).",
     )
 
+def scratch_bytes_option(default=SCRATCH_BYTES):
+    """
+    Option for specifying the size limit of the scratch cache for decompressed shards.
+    """
+    return click.option(
+        "--scratch-bytes",
+        default=default,
+        type=int,
+        help=f"Size limit in bytes of the scratch cache for decompressed shards, least recently used shards are evicted first (default: {default}).",
+    )
+
+def scratch_dir_option(default=SCRATCH_DIR):
+    """
+    Option for specifying the scratch directory for decompressed shards.
+    """
+    return click.option(
+        "--scratch-dir",
+        default=default,
+        type=click.Path(file_okay=False),
+        help=f"Directory to cache decompressed copies of compressed shards in, shared by processes and runs of the current user (default: {default}).",
+    )
+
 def shard_size_option(default=2**26):
     """
     Option for specifying the shard size.
@@ -277,6 +435,17 @@ def shard_size_option(default=2**26):
         help=f"Shard size for the dataset (default: {default}).",
     )
 
+def shard_workers_option(default=None):
+    """
+    Option for specifying the number of worker processes that decode shards for the bulk reader.
+    """
+    return click.option(
+        "--shard-workers",
+        default=default,
+        type=int,
+        help="Number of worker processes that decompress and decode shards with --reader bulk, keeping sample order (default: decode in the main process).",
+    )
+
 def shuffle_option(default=None):
     """
     Option for specifying whether to shuffle the dataset by providing a random seed.
@@ -306,7 +475,7 @@ def sort_key_option():
         "--sort-key",
         default=None,
         type=str,
-        help="Sort key function for the dataset.",
+        help="Column name or code defining a function 'key' to sort the dataset by.",
     )
 
 def split_option(default=None):
@@ -320,6 +489,17 @@ def split_option(default=None):
         help="Split to use for the dataset (default: {default}).",
     )
 
+def stats_keys_option():
+    """
+    Option for specifying a comma-separated list of keys to record per-shard statistics for.
+    """
+    return click.option(
+        "--stats-keys",
+        default=None,
+        callback=lambda ctx, param, value: None if value is None else [key.strip() for key in value.split(",") if key.strip()],
+        help="Comma-separated list of keys to record min/max, length and null statistics for in every shard footer (default: none).",
+    )
+
 def trafo_option():
     """
     Option for specifying the transformation function.
@@ -332,6 +512,44 @@ def trafo_option():
         multiple=True,
     )
 
+def unordered_option():
+    """
+    Option for specifying whether samples may be written in completion order when using workers.
+    """
+    return click.option(
+        "--unordered",
+        is_flag=True,
+        help="Write samples in the order the workers finish them instead of the input order.",
+    )
+
+def _where(ctx, param, value):
+    try:
+        return parse_where(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+def where_option():
+    """
+    Option for specifying numeric conditions that samples must satisfy. Shards whose statistics rule them out are skipped.
+    """
+    return click.option(
+        "--where",
+        default=None,
+        callback=_where,
+        help="Comma-separated conditions like 'len(text)<=2048,score>=0.5' (default: all samples).",
+    )
+
+def workers_option(default=None):
+    """
+    Option for specifying the number of worker processes for encoding samples.
+    """
+    return click.option(
+        "--workers",
+        default=default,
+        type=int,
+        help=f"Number of worker processes for encoding samples (default: {default}).",
+    )
+
 def yes_option():
     """
     Option for specifying whether to assume yes to all prompts.
@@ -341,3 +559,25 @@ def yes_option():
         is_flag=True,
         help="Assume yes to all prompts. Use with caution as it will remove files or even entire directories without confirmation.",
     )
+
+def zstd_dict_samples_option(default=2**10):
+    """
+    Option for specifying the number of leading samples to train zstd dictionaries on.
+    """
+    return click.option(
+        "--zstd-dict-samples",
+        default=default,
+        type=int,
+        help=f"Number of leading samples to train zstd dictionaries on (default: {default}).",
+    )
+
+def zstd_dict_size_option(default=None):
+    """
+    Option for specifying the size of per-key zstd dictionaries for JINX value compression.
+    """
+    return click.option(
+        "--zstd-dict-size",
+        default=default,
+        type=int,
+        help="Train a zstd dictionary of this many bytes per key and use it to compress values (default: no dictionaries).",
+    )
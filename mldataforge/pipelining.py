@@ -109,7 +109,14 @@ def load_sources(defaults, sources, named_iterators):
             raise click.BadArgumentUsage(f"Named iterator '{name}' not found")
         path = str(source["path"])
         if fmt == "jinx":
-            iterators.append(load_jinx_paths([path]))
+            iterators.append(load_jinx_paths(
+                [path],
+                index_cache=source.get("index_cache", defaults.get("index_cache", False)),
+                prefetch=source.get("prefetch", defaults.get("prefetch", None)),
+                prefetch_backend=source.get("prefetch_backend", defaults.get("prefetch_backend", "process")),
+                columns=source.get("columns", None),
+                where=source.get("where", None),
+            ))
         elif fmt == "jsonl":
             iterators.append(load_jsonl_files([path]))
         elif fmt == "mds":
@@ -118,12 +125,19 @@ def load_sources(defaults, sources, named_iterators):
                 split=source.get("split", '.'),
                 batch_size=source.get("batch_size", defaults.get("batch_size", 2**16)),
                 reader=source.get("reader", defaults.get("reader", "ram")),
+                prefetch=source.get("prefetch", defaults.get("prefetch", None)),
+                prefetch_backend=source.get("prefetch_backend", defaults.get("prefetch_backend", "process")),
+                columns=source.get("columns", None),
+                scratch_dir=source.get("scratch_dir", defaults.get("scratch_dir", None)),
+                scratch_bytes=source.get("scratch_bytes", defaults.get("scratch_bytes", None)),
+                where=source.get("where", None),
+                shard_workers=source.get("shard_workers", defaults.get("shard_workers", None)),
             )
             iterators.append(ds)
         elif fmt == "msgpack":
             iterators.append(load_msgpack_files([path]))
         elif fmt == "parquet":
-            iterators.append(load_parquet_files([path]))
+            iterators.append(load_parquet_files([path], columns=source.get("columns", None)))
         else:
             raise click.BadArgumentUsage(f"Unknown source format '{fmt}'")
     if all(hasattr(it, "__len__") for it in iterators):
@@ -166,6 +180,7 @@ def save_sink(defaults, sink, ds, named_iterators):
             path,
             compression=sink.get("compression", defaults.get("compression", "snappy")),
             compression_args=sink.get("compression_args", defaults.get("compression_args", {"processes": 64})),
+            shard_size=sink.get("shard_size", defaults.get("shard_size", None)),
             size_hint=sink.get("size_hint", defaults.get("size_hint", None)),
             overwrite=sink.get("overwrite", defaults.get("overwrite", False)),
             yes=sink.get("yes", defaults.get("yes", False)),
@@ -174,6 +189,16 @@ def save_sink(defaults, sink, ds, named_iterators):
             encoding=sink.get("encoding", defaults.get("encoding", "a85")),
             binary_threshold=sink.get("binary_threshold", defaults.get("binary_threshold", 2**8)),
             ext_sep=sink.get("ext_sep", defaults.get("ext_sep", ".")),
+            workers=sink.get("workers", defaults.get("workers", None)),
+            unordered=sink.get("unordered", defaults.get("unordered", False)),
+            zstd_dict_size=sink.get("zstd_dict_size", defaults.get("zstd_dict_size", None)),
+            zstd_dict_samples=sink.get("zstd_dict_samples", defaults.get("zstd_dict_samples", 2**10)),
+            compress_rules=sink.get("compress_rules", defaults.get("compress_rules", None)),
+            block_compression=sink.get("block_compression", defaults.get("block_compression", None)),
+            block_size=sink.get("block_size", defaults.get("block_size", 2**20)),
+            block_lines=sink.get("block_lines", defaults.get("block_lines", None)),
+            append=sink.get("append", defaults.get("append", False)),
+            stats_keys=sink.get("stats_keys", defaults.get("stats_keys", None)),
         )
     elif fmt == "jsonl":
         path = sink["path"]
@@ -199,6 +224,8 @@ def save_sink(defaults, sink, ds, named_iterators):
             size_hint=sink.get("size_hint", defaults.get("size_hint", None)),
             overwrite=sink.get("overwrite", defaults.get("overwrite", False)),
             yes=sink.get("yes", defaults.get("yes", False)),
+            append=sink.get("append", defaults.get("append", False)),
+            flush_workers=sink.get("flush_workers", defaults.get("flush_workers", None)),
         )
     elif fmt == "msgpack":
         path = sink["path"]
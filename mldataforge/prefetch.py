@@ -0,0 +1,82 @@
+from collections import deque
+import concurrent.futures
+import itertools
+import os
+import queue
+import threading
+
+__all__ = ["PREFETCH_BACKENDS", "check_prefetch_backend", "prefetch", "prefetch_shards"]
+
+PREFETCH_BACKENDS = dict(
+    default="process",
+    choices=["thread", "process"],
+)
+
+_CHUNK_SIZE = 2**6
+_DONE = object()
+
+class _Failure:
+    def __init__(self, exception):
+        self.exception = exception
+
+def check_prefetch_backend(backend):
+    if backend not in PREFETCH_BACKENDS["choices"]:
+        raise ValueError(f"Invalid prefetch backend: {backend}. Supported backends are {PREFETCH_BACKENDS['choices']}.")
+
+def prefetch(iterable, depth):
+    """Iterates on a background thread, keeping up to depth items read and decoded ahead of the consumer."""
+    chunk_size = max(1, min(depth, _CHUNK_SIZE))
+    chunks = queue.Queue(maxsize=max(1, depth // chunk_size))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            iterator = iter(iterable)
+            while True:
+                chunk = list(itertools.islice(iterator, chunk_size))
+                if not chunk or not put(chunk):
+                    break
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                break
+            if isinstance(chunk, _Failure):
+                raise chunk.exception
+            yield from chunk
+    finally:
+        stop.set()
+        thread.join()
+
+def prefetch_shards(load_shard, shards, depth, workers=None):
+    """Loads up to depth shards ahead in worker processes (one per shard in flight, at most one per CPU, unless workers is given) and yields their samples in shard order. load_shard must be picklable and return a list of samples."""
+    shards = iter(shards)
+    pending = deque()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers or min(depth, os.cpu_count() or 1)) as executor:
+        try:
+            for args in itertools.islice(shards, depth):
+                pending.append(executor.submit(load_shard, *args))
+            while pending:
+                samples = pending.popleft().result()
+                args = next(shards, None)
+                if args is not None:
+                    pending.append(executor.submit(load_shard, *args))
+                yield from samples
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,126 @@
+import fcntl
+import hashlib
+import os
+from pathlib import Path
+import tempfile
+
+from .compression import open_compression
+
+__all__ = ["SCRATCH_BYTES", "SCRATCH_DIR", "ScratchCache"]
+
+SCRATCH_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "mldataforge", "scratch")
+SCRATCH_BYTES = 2**34
+
+class ScratchCache:
+    """Directory of decompressed copies of compressed shards that is shared by processes and reused across runs of the same user.
+
+    Entries are keyed by the source path, size and mtime. Every reader holds a shared lock on the entry it uses, so the
+    locks count references across processes. When a new entry would exceed max_bytes, unlocked entries are evicted in
+    least recently used order. Entries in use are never evicted, so max_bytes can be exceeded temporarily. The directory
+    must be owned by the current user and not writable by others, since its entries are trusted when reading.
+    """
+
+    _LOCK_NAME = ".lock"
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = Path(SCRATCH_DIR if directory is None else directory)
+        self.max_bytes = SCRATCH_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        stat = os.stat(self.directory)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+            raise PermissionError(f"Scratch directory {self.directory} must be owned by the current user and not writable by group or others")
+
+    def path(self, filename):
+        """Returns the path of the entry for the current version of filename."""
+        stat = os.stat(filename)
+        source = f"{os.path.realpath(filename)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        return self.directory / f"{hashlib.sha1(source.encode('utf-8')).hexdigest()}.mds"
+
+    def open(self, filename, compression, buf_size=2**24):
+        """Returns the decompressed copy of filename opened for reading, decompressing it first if needed. The shared lock is held until the file is closed."""
+        path = self.path(filename)
+        while True:
+            f = self._open_shared(path)
+            if f is not None:
+                os.utime(path)
+                return f
+            self._create(path, filename, compression, buf_size)
+
+    def _open_shared(self, path):
+        try:
+            f = open(path, "rb", 0)
+        except FileNotFoundError:
+            return None
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        if os.fstat(f.fileno()).st_nlink == 0:
+            # evicted between opening and locking
+            f.close()
+            return None
+        return f
+
+    def _create(self, path, filename, compression, buf_size):
+        lock = self._lock(path.with_name(f"{path.name}.lock"), fcntl.LOCK_EX)
+        try:
+            if path.exists():
+                return
+            with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f".{path.name}.", suffix=".tmp", delete=False) as f_out:
+                tmp_path = f_out.name
+                try:
+                    with open_compression(filename, "rb", compression=compression) as f_in:
+                        while True:
+                            buf = f_in.read(buf_size)
+                            if not buf:
+                                break
+                            f_out.write(buf)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+            self.evict(os.path.getsize(tmp_path))
+            os.replace(tmp_path, path)
+        finally:
+            os.close(lock)
+
+    def _lock(self, path, operation):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, operation)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _try_remove(self, path):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        else:
+            os.remove(path)
+            return True
+        finally:
+            os.close(fd)
+
+    def evict(self, incoming=0):
+        """Removes unused entries, least recently used first, until incoming more bytes fit into max_bytes."""
+        lock = self._lock(self.directory / self._LOCK_NAME, fcntl.LOCK_EX)
+        try:
+            entries = []
+            for path in self.directory.glob("*.mds"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total = incoming + sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if self._try_remove(path):
+                    self._try_remove(path.with_name(f"{path.name}.lock"))
+                    total -= size
+        finally:
+            os.close(lock)
@@ -5,6 +5,7 @@ import PIL.JpegImagePlugin
 import PIL.PngImagePlugin
 import click
 from datasets import Dataset, load_dataset
+import itertools
 import json
 import msgpack
 import numpy as np
@@ -18,8 +19,8 @@ from tqdm import tqdm
 import yaml
 
 from .compression import determine_compression, open_compression, pigz_compress
-from .indexing import IndexedDatasetView, reverse_permutation, shuffle_permutation, sort_permutation
-from .jinx import JinxDatasetReader, JinxDatasetWriter
+from .indexing import IndexedDatasetView, gather_sharded, reverse_permutation, shuffle_permutation, sort_permutation
+from .jinx import MANIFEST_NAME, CompressionPolicy, JinxDatasetReader, JinxDatasetWriter, JinxEncoderPool, column_mask, parse_where, read_jinx_header, sample_matches, train_dictionaries
 from .lazy_dict import LazyDict
 from .mds import MDS_READERS, MDSBulkDatasetReader, MDSRAMDatasetReader, MDSSampleWriter
 from .trafos import get_transformations
@@ -70,6 +71,9 @@ class ConcatDataset(Dataset):
         local_index = index - self.cumulative_lengths[dataset_idx]
         return self.datasets[dataset_idx][local_index]
 
+    def __getitems__(self, indices):
+        return gather_sharded(self.datasets, self.cumulative_lengths, indices)
+
     def __iter__(self):
         for ds in self.datasets:
             yield from ds
@@ -84,9 +88,21 @@ def _batch_iterable(iterable, batch_size):
     if batch:
         yield batch
 
-def check_arguments(output_path, overwrite, yes, input_paths=None):
+def _is_shard_directory(path):
+    path = Path(path)
+    return (path / "index.json").exists() or (path / MANIFEST_NAME).exists() or any(path.glob("shard-*.jinx"))
+
+def check_arguments(output_path, overwrite, yes, input_paths=None, append=False):
     if input_paths is not None and not input_paths:
         raise click.BadArgumentUsage("No input paths provided.")
+    if append:
+        if overwrite:
+            raise click.BadArgumentUsage("Cannot use both --append and --overwrite.")
+        if os.path.isfile(output_path):
+            raise click.BadParameter(f"Cannot append to file '{output_path}', only to a directory of shards.")
+        if os.path.isdir(output_path) and os.listdir(output_path) and not _is_shard_directory(output_path):
+            raise click.BadParameter(f"Cannot append to '{output_path}', it is not empty and holds no MDS index, JINX manifest or JINX shards.")
+        return
     if os.path.exists(output_path):
         if os.path.isfile(output_path):
             if not overwrite:
@@ -255,7 +271,7 @@ def load_index(input_file):
         indices = np.load(f)
     return indices
 
-def load_jinx_paths(jinx_paths, split=None, shuffle=None, index=None, sort_key=None, lazy=False, trafo=None, mmap=False, encoding=None):
+def load_jinx_paths(jinx_paths, split=None, shuffle=None, index=None, sort_key=None, lazy=False, trafo=None, mmap=False, encoding=None, index_cache=False, prefetch=None, prefetch_backend="process", columns=None, where=None):
     if shuffle is not None:
         if index is not None:
             raise click.BadArgumentUsage("Cannot use index and shuffling simultaneously.")
@@ -264,7 +280,12 @@ def load_jinx_paths(jinx_paths, split=None, shuffle=None, index=None, sort_key=N
     if index is not None:
         if sort_key is not None:
             raise click.BadArgumentUsage("Cannot use sort key and indexing simultaneously.")
-    ds = JinxDatasetReader(jinx_paths, split=split, lazy=lazy, mmap=mmap, encoding=encoding)
+    if lazy and prefetch and prefetch_backend == "process":
+        raise click.BadArgumentUsage("Cannot prefetch lazy samples with worker processes, use --prefetch-backend thread.")
+    where = parse_where(where)
+    ds = JinxDatasetReader(jinx_paths, split=split, lazy=lazy, mmap=mmap, encoding=encoding, index_cache=index_cache, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, where=where)
+    if where and CFG["echo"]:
+        click.echo(f"Skipped {ds.pruned} of {len(ds.lengths)} shards using key statistics")
     if shuffle is not None:
         indices = shuffle_permutation(len(ds), seed=abs(shuffle))
         if shuffle < 0:
@@ -282,6 +303,8 @@ def load_jinx_paths(jinx_paths, split=None, shuffle=None, index=None, sort_key=N
         if CFG["echo"]:
             click.echo(f"Created sort key with {len(indices)} indices")
         ds = IndexedDatasetView(ds, indices)
+    if where:
+        ds = (sample for sample in ds if sample_matches(sample, where))
     ds = get_transformations(trafo)(ds)
     return ds
 
@@ -294,7 +317,9 @@ def load_jsonl_files(jsonl_files, shuffle=None, sort_key=None):
         if sort_key is not None:
             raise click.BadArgumentUsage("Cannot use sort key and shuffling simultaneously.")
         ds = ds.shuffle(seed=abs(shuffle))
-    if sort_key is not None:
+    if sort_key is not None and isinstance(sort_key, str) and sort_key.isidentifier():
+        ds = ds.sort(column_names=[sort_key])
+    elif sort_key is not None:
         if isinstance(sort_key, str):
             global_context = {}
             exec(sort_key, global_context)
@@ -305,7 +330,7 @@ def load_jsonl_files(jsonl_files, shuffle=None, sort_key=None):
         ds = ds.sort(column_names=["__key__"])
     return ds
 
-def load_mds_directories(mds_directories, split='.', batch_size=2**16, reader="ram", shuffle=None, index=None, sort_key=None):
+def load_mds_directories(mds_directories, split='.', batch_size=2**16, reader="ram", shuffle=None, index=None, sort_key=None, prefetch=None, prefetch_backend="process", columns=None, scratch_dir=None, scratch_bytes=None, where=None, shard_workers=None):
     if shuffle is not None:
         if reader == "bulk":
             raise click.BadArgumentUsage("Bulk reader does not support shuffling by design.")
@@ -321,10 +346,28 @@ def load_mds_directories(mds_directories, split='.', batch_size=2**16, reader="r
     if sort_key is not None:
         if reader == "bulk":
             raise click.BadArgumentUsage("Bulk reader does not support sorting by design.")
+    if prefetch:
+        if reader == "streaming":
+            raise click.BadArgumentUsage("Streaming reader does not support prefetching.")
+    if columns is not None:
+        if reader == "streaming":
+            raise click.BadArgumentUsage("Streaming reader does not support column projection.")
+    if shard_workers is not None:
+        if reader != "bulk":
+            raise click.BadArgumentUsage("Only the bulk reader supports shard workers.")
+    where = parse_where(where)
     if reader == "bulk":
-        return MDSBulkDatasetReader(mds_directories, split=split)
+        ds = MDSBulkDatasetReader(mds_directories, split=split, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, shard_workers=shard_workers)
+        if where:
+            ds = (sample for sample in ds if sample_matches(sample, where))
+        return ds
+    mask = None
     if reader == "ram":
-        ds = MDSRAMDatasetReader(mds_directories, split=split)
+        ds = MDSRAMDatasetReader(mds_directories, split=split, prefetch=prefetch, prefetch_backend=prefetch_backend, columns=columns, scratch_dir=scratch_dir, scratch_bytes=scratch_bytes)
+        if where:
+            mask = column_mask(ds.read_columns(columns=sorted({condition[0] for condition in where})), where)
+            if CFG["echo"]:
+                click.echo(f"Selected {int(mask.sum())} of {len(ds)} samples")
     elif reader == "streaming":
         dss = []
         for mds_directory in mds_directories:
@@ -364,19 +407,28 @@ def load_mds_directories(mds_directories, split='.', batch_size=2**16, reader="r
         if CFG["echo"]:
             click.echo(f"Created sort key with {len(indices)} indices")
         ds = IndexedDatasetView(ds, indices)
+    if mask is not None:
+        if isinstance(ds, IndexedDatasetView):
+            ds = IndexedDatasetView(ds.dataset, [i for i in ds.indices if mask[i]])
+        else:
+            ds = IndexedDatasetView(ds, np.flatnonzero(mask))
+    elif where:
+        ds = (sample for sample in ds if sample_matches(sample, where))
     return ds
 
 def load_msgpack_files(msgpack_files):
     compressions = [determine_compression("msgpack", msgpack_file) for msgpack_file in msgpack_files]
     return _streaming_msgpack(msgpack_files, compressions)
 
-def load_parquet_files(parquet_files, shuffle=None, sort_key=None):
-    ds = load_dataset("parquet", data_files=parquet_files, split="train")
+def load_parquet_files(parquet_files, shuffle=None, sort_key=None, columns=None):
+    ds = load_dataset("parquet", data_files=parquet_files, split="train", columns=columns)
     if shuffle is not None:
         if sort_key is not None:
             raise click.BadArgumentUsage("Cannot use sort key and shuffling simultaneously.")
         ds = ds.shuffle(seed=abs(shuffle))
-    if sort_key is not None:
+    if sort_key is not None and isinstance(sort_key, str) and sort_key.isidentifier():
+        ds = ds.sort(column_names=[sort_key])
+    elif sort_key is not None:
         if isinstance(sort_key, str):
             global_context = {}
             exec(sort_key, global_context)
@@ -403,27 +455,86 @@ def save_index(indices, output_file, overwrite=True, yes=True):
     with open(output_file, "wb") as f:
         np.save(f, indices)
 
-def save_jinx(iterable, output_file, compression=None, compression_args={"processes": 64}, shard_size=None, size_hint=None, overwrite=True, yes=True, trafo=None, compress_ratio=0.67, compress_threshold=128, encoding="a85", binary_threshold=None, ext_sep="."):
+def _jinx_raw_lines(ds, settings):
+    """Returns the encoded lines of an unmodified JINX dataset whose shards all match the settings, or None."""
+    if not isinstance(ds, JinxDatasetReader):
+        return None
+    reader_kwargs = ds.shards.reader_kwargs
+    if reader_kwargs.get("columns") is not None or reader_kwargs.get("encoding") is not None:
+        return None
+    for path, length in zip(ds.shard_paths, ds.lengths):
+        if not length:
+            continue
+        header = read_jinx_header(path)
+        if header.get("zstd_dicts") or any(header.get(key) != value for key, value in settings.items()):
+            return None
+    return ds.iter_raw()
+
+def save_jinx(iterable, output_file, compression=None, compression_args={"processes": 64}, shard_size=None, size_hint=None, overwrite=True, yes=True, trafo=None, compress_ratio=0.67, compress_threshold=128, encoding="a85", binary_threshold=None, ext_sep=".", workers=None, unordered=False, zstd_dict_size=None, zstd_dict_samples=2**10, compress_rules=None, block_compression=None, block_size=2**20, block_lines=None, append=False, stats_keys=None):
+    if append and shard_size is None:
+        raise click.BadArgumentUsage("Appending to a JINX dataset requires a shard size.")
     compression = determine_compression("jinx", output_file, compression)
+    block_compression = determine_compression("jinx", output_file, block_compression) if block_compression is not None else None
+    policy = CompressionPolicy(compression=compression, rules=compress_rules, compress_ratio=compress_ratio, level=compression_args.get("level"))
     writer = None
     part = 0
     trafo = get_transformations(trafo)
-    for sample in tqdm(trafo(iterable), desc="Writing to JINX", unit="sample", disable=not CFG["progress"]):
-        if writer is None:
-            part_file = output_file.format(part=part)
-            check_arguments(part_file, overwrite, yes)
-            writer = JinxDatasetWriter(part_file, shard_size=shard_size, compression=compression, index_compression=compression, compress_threshold=compress_threshold, compress_ratio=compress_ratio, encoding=encoding, binary_threshold=binary_threshold, ext_sep=ext_sep)
-            offset = 0
-        prev = writer.tell()
-        writer.write(sample)
-        post = writer.tell()
-        offset += (post - prev) if prev < post else post
-        if size_hint is not None and offset >= size_hint:
-            writer.close()
-            part += 1
-            writer = None
+    samples = trafo(iterable)
+    dictionaries = None
+    if zstd_dict_size is not None:
+        samples = iter(samples)
+        head = list(itertools.islice(samples, zstd_dict_samples))
+        dictionaries = {key: value for key, value in train_dictionaries(head, dict_size=zstd_dict_size).items() if key not in policy.rules}
+        samples = itertools.chain(head, samples)
+        if CFG["echo"]:
+            click.echo(f"Trained zstd dictionaries for {len(dictionaries)} keys on {len(head)} samples")
+    raw = None
+    if dictionaries is None and compress_rules is None and not stats_keys:
+        raw = _jinx_raw_lines(samples, dict(compression=compression, compress_threshold=compress_threshold, compress_ratio=compress_ratio, encoding=encoding, binary_threshold=binary_threshold, ext_sep=ext_sep))
+    if raw is not None:
+        samples = raw
+        if CFG["echo"]:
+            click.echo("Copying encoded lines from JINX shards with identical settings")
+    pool = None
+    if raw is None and workers is not None and workers > 1:
+        pool = JinxEncoderPool(workers, ordered=not unordered, compression=compression, compress_threshold=compress_threshold, compress_ratio=compress_ratio, encoding=encoding, binary_threshold=binary_threshold, ext_sep=ext_sep, dictionaries=dictionaries, compression_policy=policy, stats_keys=stats_keys)
+        samples = pool.encode(samples)
+        if CFG["echo"]:
+            click.echo(f"Encoding samples with {workers} worker processes")
+    try:
+        for sample in tqdm(samples, desc="Writing to JINX", unit="sample", disable=not CFG["progress"]):
+            if writer is None:
+                part_file = output_file.format(part=part)
+                if not append:
+                    check_arguments(part_file, overwrite, yes)
+                writer = JinxDatasetWriter(part_file, shard_size=shard_size, append=append, compression=compression, index_compression=compression, compress_threshold=compress_threshold, compress_ratio=compress_ratio, encoding=encoding, binary_threshold=binary_threshold, ext_sep=ext_sep, dictionaries=dictionaries, compression_policy=policy, block_compression=block_compression, block_size=block_size, block_lines=block_lines, stats_keys=stats_keys)
+                offset = 0
+            prev = writer.tell()
+            if raw is not None:
+                writer.write_raw(*sample)
+            elif pool is None:
+                writer.write(sample)
+            else:
+                writer.write_encoded(*sample)
+            post = writer.tell()
+            offset += (post - prev) if prev < post else post
+            if size_hint is not None and offset >= size_hint:
+                writer.close()
+                part += 1
+                writer = None
+    finally:
+        if pool is not None:
+            pool.close()
     if writer is not None:
         writer.close()
+    if pool is not None:
+        for stats in pool.compression_stats():
+            policy.merge(stats)
+    report = policy.report()
+    if report and CFG["echo"]:
+        click.echo("Compression decisions per key:")
+        for line in report:
+            click.echo(f"  {line}")
 
 def save_jsonl(iterable, output_file, compression=None, compression_args={"processes": 64}, size_hint=None, overwrite=True, yes=True, trafo=None):
     f = None
@@ -445,7 +556,17 @@ def save_jsonl(iterable, output_file, compression=None, compression_args={"proce
     if f is not None:
         f.close()
 
-def save_mds(it, output_dir, compression=None, compression_args={"processes": 64}, buf_size=2**24, pigz=True, shard_size=None, size_hint=None, overwrite=True, yes=True, trafo=None):
+def _existing_mds_columns(output_dir):
+    index_path = os.path.join(output_dir, "index.json")
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "rt") as f:
+        shards = json.load(f)["shards"]
+    if not shards:
+        return None
+    return dict(zip(shards[-1]["column_names"], shards[-1]["column_encodings"]))
+
+def save_mds(it, output_dir, compression=None, compression_args={"processes": 64}, buf_size=2**24, pigz=True, shard_size=None, size_hint=None, overwrite=True, yes=True, trafo=None, append=False, flush_workers=None):
     compression = determine_compression("mds", output_dir, compression, no_pigz=not pigz)
     if shard_size is not None and shard_size > 2**31:
         shard_size = 2**31
@@ -456,10 +577,13 @@ def save_mds(it, output_dir, compression=None, compression_args={"processes": 64
     for sample in tqdm(trafo(it), desc="Writing to MDS", unit="sample", disable=not CFG["progress"]):
         if writer is None:
             part_dir = output_dir.format(part=part)
-            check_arguments(part_dir, overwrite, yes)
-            files.append(part_dir)
-            columns = {key: _infer_mds_encoding(value) for key, value in sample.items()}
-            writer = MDSSampleWriter(out=part_dir, columns=columns, compression=compression, size_limit=shard_size)
+            if not append:
+                check_arguments(part_dir, overwrite, yes)
+            files.append((part_dir, set(os.listdir(part_dir)) if append and os.path.isdir(part_dir) else set()))
+            columns = _existing_mds_columns(part_dir) if append else None
+            if columns is None:
+                columns = {key: _infer_mds_encoding(value) for key, value in sample.items()}
+            writer = MDSSampleWriter(out=part_dir, columns=columns, compression=compression, size_limit=shard_size, append=append, flush_workers=flush_workers)
             offset = 0
         prev = writer.new_shard_size
         if isinstance(sample, LazyDict):
@@ -473,12 +597,12 @@ def save_mds(it, output_dir, compression=None, compression_args={"processes": 64
     if writer is not None:
         writer.finish()
     if pigz:
-        for output_dir in files:
+        for output_dir, existing in files:
             index_path = os.path.join(output_dir, "index.json")
             index = json.load(open(index_path, "rt"))
             name2info = {shard["raw_data"]["basename"]: shard for shard in index["shards"]}
-            file_names = [file for file in os.listdir(output_dir) if file.endswith(".mds")]
-            assert set(file_names) == set(name2info.keys())
+            file_names = [file for file in os.listdir(output_dir) if file.endswith(".mds") and file not in existing]
+            assert set(file_names) <= set(name2info.keys())
             for file_name in tqdm(file_names, desc="Compressing with pigz", unit="file", disable=not CFG["progress"]):
                 compressed_file_name = file_name + ".gz"
                 file_path = os.path.join(output_dir, file_name)
@@ -514,17 +638,28 @@ def save_msgpack(iterable, output_file, compression=None, compression_args={"pro
     if f is not None:
         f.close()
 
-def save_parquet(it, output_file, compression=None, compression_args={"processes": 64}, batch_size=2**16, size_hint=None, overwrite=True, yes=True, trafo=None):
-    compression = determine_compression("parquet", output_file, compression)
-    writer = None
-    part = 0
+def _parquet_tables(it, batch_size, trafo):
+    if not trafo and isinstance(it, MDSRAMDatasetReader):
+        # unmodified MDS datasets are converted column by column instead of sample by sample
+        with tqdm(total=len(it), desc="Writing to Parquet", unit="sample", disable=not CFG["progress"]) as progress:
+            for start in range(0, len(it), batch_size):
+                table = pa.table(it.read_columns(start, start + batch_size))
+                progress.update(table.num_rows)
+                yield table
+        return
     trafo = get_transformations(trafo)
     it = tqdm(it, desc="Writing to Parquet", unit="sample", disable=not CFG["progress"])
     for batch in _batch_iterable(trafo(it), batch_size):
         if isinstance(batch[0], LazyDict):
             for i in range(len(batch)):
                 batch[i] = batch[i].materialize()
-        table = pa.Table.from_pylist(batch)
+        yield pa.Table.from_pylist(batch)
+
+def save_parquet(it, output_file, compression=None, compression_args={"processes": 64}, batch_size=2**16, size_hint=None, overwrite=True, yes=True, trafo=None):
+    compression = determine_compression("parquet", output_file, compression)
+    writer = None
+    part = 0
+    for table in _parquet_tables(it, batch_size, trafo):
         if writer is None:
             part_file = output_file.format(part=part)
             check_arguments(part_file, overwrite, yes)
@@ -18,6 +18,12 @@ def jsonl_tools():
         return load_jsonl(file1_path) == load_jsonl(file2_path)
     return SimpleNamespace(**locals())
 
+@pytest.fixture
+def text_samples():
+    def samples(n=10_000):
+        return ({"id": i, "text": "x" * (i % 97)} for i in range(n))
+    return samples
+
 def pytest_collection_modifyitems(config, items):
     name_to_node = {}
     dependency_graph = defaultdict(set)
@@ -1,6 +1,10 @@
+import click
 from click.testing import CliRunner
 from mldataforge.commands import cli
+from mldataforge.jinx import read_manifest
+from mldataforge.utils import check_arguments, load_jinx_paths, load_mds_directories, save_jinx, save_mds
 import pytest
+import shutil
 
 @pytest.mark.parametrize("src_fmt,target_fmt,out_file,in_file", [
     pytest.param("jinx", "jsonl", "test.jsonl.jinx.jsonl", "test.jsonl.jinx", marks=pytest.mark.dependency(name="convert_jinx_jsonl", depends=["convert_jsonl_jinx"], scope="session")),
@@ -82,3 +86,37 @@ def test_split(fmt, in_files, tmp_dir):
     ])
     assert result.exit_code == 0, f"Failed splitting files for {fmt}: {result.output}"
     assert [None for f in tmp_dir.iterdir() if f.name.startswith(f"test_{fmt}")]
+
+@pytest.mark.parametrize("fmt", ["jinx", "mds"])
+def test_append(fmt, tmp_dir):
+    output = tmp_dir / f"test.append.{fmt}"
+    for part, start in enumerate((0, 300, 600)):
+        batch = [{"id": i, "text": f"sample {i} " * (i % 7)} for i in range(start, start + 300)]
+        if fmt == "jinx":
+            save_jinx(batch, str(output), shard_size=2**12, overwrite=part == 0, yes=True, append=part > 0)
+        else:
+            save_mds(batch, str(output), shard_size=2**12, pigz=False, overwrite=part == 0, yes=True, append=part > 0)
+    if fmt == "jinx":
+        assert sum(entry["num_samples"] for entry in read_manifest(output)) == 900
+        ds = load_jinx_paths([str(output)])
+    else:
+        ds = load_mds_directories([str(output)])
+    assert [sample["id"] for sample in ds] == list(range(900))
+    with pytest.raises(click.BadArgumentUsage):
+        check_arguments(str(output), True, True, append=True)
+
+@pytest.mark.parametrize("fmt", ["jinx", "mds"])
+def test_append_foreign_directory(fmt, tmp_dir):
+    output = tmp_dir / f"test.append.foreign.{fmt}"
+    shutil.rmtree(output, ignore_errors=True)
+    output.mkdir()
+    (output / "important.txt").write_text("keep me")
+    batch = [{"id": i} for i in range(10)]
+    with pytest.raises(click.BadParameter):
+        check_arguments(str(output), False, True, append=True)
+    with pytest.raises((click.BadParameter, FileExistsError)):
+        if fmt == "jinx":
+            save_jinx(batch, str(output), shard_size=2**12, yes=True, append=True)
+        else:
+            save_mds(batch, str(output), shard_size=2**12, pigz=False, yes=True, append=True)
+    assert (output / "important.txt").read_text() == "keep me"
@@ -4,7 +4,20 @@ from mldataforge.commands.convert.jinx import jinx_to_jsonl
 from mldataforge.commands.convert.mds import mds_to_jsonl
 from mldataforge.commands.convert.msgpack import msgpack_to_jsonl
 from mldataforge.commands.convert.parquet import parquet_to_jsonl
+from mldataforge import mds
+from mldataforge.indexing import shuffle_permutation
+from mldataforge.jinx import JinxShardReader, JinxShardWriter, read_jinx_header
+from mldataforge.mds import MDSBulkDatasetReader, MDSBulkReader, MDSRAMDatasetReader
+from mldataforge.scratch import ScratchCache
+from mldataforge.utils import load_jinx_paths, save_jinx, save_mds
+import numpy as np
+import os
 import pytest
+import re
+import shutil
+
+def clean(x):
+    return re.sub(r'[^A-Za-z0-9._-]', '', str(x))
 
 @pytest.mark.parametrize("fmt,compression,out_file,in_file", [
     pytest.param("jinx", None, "test.None.jinx", "test.jsonl.jinx", marks=pytest.mark.dependency(depends=["convert_jsonl_jinx"], scope="session")),
@@ -250,3 +263,94 @@ def test_decompression(fmt, out_file, in_file, tmp_dir, scale_factor, jsonl_tool
             trafo=None,
         )
         assert jsonl_tools.equal(str(tmp_dir / "test.jsonl"), str(tmp_dir / out_file)), f"Output file {out_file} is not equal to test.jsonl"
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_scratch_cache(compression, tmp_dir):
+    samples = [{"id": i, "text": f"sample {i} " * (i % 17)} for i in range(3_000)]
+    source = tmp_dir / f"test.scratch.{compression}.mds"
+    scratch = tmp_dir / f"test.scratch.{compression}.cache"
+    shutil.rmtree(scratch, ignore_errors=True)
+    save_mds(iter(samples), str(source), compression=compression, shard_size=2**14, overwrite=True, yes=True, pigz=False)
+    shards = sorted(source.iterdir())
+    with MDSRAMDatasetReader([str(source)], split=None, scratch_dir=str(scratch)) as ds:
+        assert [ds[i] for i in range(len(ds))] == samples
+        entries = {path.name: path.stat().st_ino for path in scratch.glob("*.mds")}
+        assert len(entries) == len(ds.readers) > 1
+        assert ScratchCache(scratch, max_bytes=0).evict() is None and len(list(scratch.glob("*.mds"))) == len(entries)
+    assert sorted(source.iterdir()) == shards
+    with MDSRAMDatasetReader([str(source)], split=None, scratch_dir=str(scratch)) as ds:
+        assert list(ds) == samples
+        assert {path.name: path.stat().st_ino for path in scratch.glob("*.mds")} == entries
+    os.utime(shards[0], ns=(0, 0))
+    with MDSRAMDatasetReader([str(source)], split=None, scratch_dir=str(scratch), scratch_bytes=0) as ds:
+        assert list(ds) == samples
+        assert len(list(scratch.glob("*.mds"))) == len(ds.readers)
+    ScratchCache(scratch, max_bytes=0).evict()
+    assert not list(scratch.glob("*.mds"))
+
+def test_scratch_cache_permissions(tmp_dir):
+    scratch = tmp_dir / "test.scratch.permissions.cache"
+    shutil.rmtree(scratch, ignore_errors=True)
+    ScratchCache(scratch)
+    assert scratch.stat().st_mode & 0o777 == 0o700
+    os.chmod(scratch, 0o777)
+    with pytest.raises(PermissionError):
+        ScratchCache(scratch)
+
+@pytest.mark.parametrize("compression", [None, "gzip", "zstd", "sample::zstd"])
+@pytest.mark.parametrize("block_size", [1, 2**6, 2**24])
+def test_mds_bulk_blocks(compression, block_size, tmp_dir):
+    samples = [{"id": i, "score": i / 7, "text": f"sample {i} " * (i % 23), "data": bytes(i % 251 for i in range(i % 300))} for i in range(2_000)]
+    source = tmp_dir / f"test.bulk_blocks.{str(compression).replace(':', '')}.mds"
+    save_mds(iter(samples), str(source), compression=compression, shard_size=2**18, overwrite=True, yes=True, pigz=False)
+    shards = MDSBulkDatasetReader([str(source)], split=None).shards
+    assert len(shards) > 1
+    actual = []
+    for shard in shards:
+        with MDSBulkReader(**shard, block_size=block_size, debug=True) as reader:
+            actual.extend(reader)
+    assert actual == samples
+    with MDSBulkReader(shards[0]["filename"], shards[0]["compression"], columns=["id"], block_size=block_size) as reader:
+        assert list(reader) == [{"id": sample["id"]} for sample in samples[:reader.samples]]
+
+def test_mds_bulk_public_decode(monkeypatch, tmp_dir):
+    samples = [{"id": i, "score": i / 7, "text": f"sample {i} " * (i % 23)} for i in range(1_000)]
+    source = tmp_dir / "test.bulk_public_decode.mds"
+    save_mds(iter(samples), str(source), compression=None, overwrite=True, yes=True, pigz=False)
+    monkeypatch.setattr(mds, "_get_coder", None)
+    assert list(MDSBulkDatasetReader([str(source)], split=None)) == samples
+
+@pytest.mark.parametrize("block_compression,block_size,block_lines,mmap", [("zstd", 2**16, None, False), ("lz4", 2**12, None, True), ("zstd", 2**20, 7, False), ("zstd", 2**12, None, True)], ids=clean)
+def test_block_compression(block_compression, block_size, block_lines, mmap, tmp_dir):
+    def samples():
+        for i in range(3_000):
+            yield {"id": i, "text": f"sample {i} with some repetitive text " * (i % 5), "payload": bytes([i % 256]) * (i % 101)}
+    plain = tmp_dir / "test.blocks.plain.jinx"
+    output = tmp_dir / f"test.blocks.{block_compression}.{block_size}.{block_lines}.jinx"
+    save_jinx(samples(), str(plain), compression="zstd", overwrite=True, yes=True, compress_threshold=2**6, compress_ratio=1.0)
+    save_jinx(samples(), str(output), overwrite=True, yes=True, block_compression=block_compression, block_size=block_size, block_lines=block_lines)
+    assert output.stat().st_size < plain.stat().st_size
+    header = read_jinx_header(output)
+    assert header["block_compression"] == ("zst" if block_compression == "zstd" else block_compression)
+    expected = list(samples())
+    with JinxShardReader(str(output), lazy=False, mmap=mmap, block_cache=2) as reader:
+        assert len(reader.block_starts) > 2
+        if block_lines is not None:
+            assert (np.diff(reader.block_starts) <= block_lines).all()
+        assert list(reader) == expected
+        indices = [int(i) for i in shuffle_permutation(3_000, seed=42)]
+        assert [reader[i] for i in indices[:500]] == [expected[i] for i in indices[:500]]
+        assert reader.__getitems__(indices) == [expected[i] for i in indices]
+        with pytest.raises(IndexError):
+            reader[3_000]
+    assert [dict(sample) for sample in load_jinx_paths([str(output)], shuffle=42)] == [expected[i] for i in shuffle_permutation(3_000, seed=42)]
+
+def test_block_tell(tmp_dir):
+    with JinxShardWriter(str(tmp_dir / "test.blocks.tell.jinx"), block_compression="zst", block_size=2**14, block_lines=100) as writer:
+        for i in range(1_050):
+            writer.write_sample({"id": i, "text": f"sample {i} with some repetitive text " * (i % 5)})
+        assert np.diff(writer.block_starts).tolist() == [100] * 10 and writer.block_count == 50
+        estimate = writer.tell()
+        assert writer.file_offset < estimate < writer.file_offset + writer.block_bytes
+        writer._flush_block()
+        assert abs(writer.tell() - estimate) < 0.2 * (writer.tell() - writer.block_offsets[-2])
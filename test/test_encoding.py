@@ -1,7 +1,57 @@
+import base64
 import filecmp
+import io
 from mldataforge.commands.convert.jinx import jinx_to_jsonl
 from mldataforge.commands.join import join_jinx
+from mldataforge.compression import compress_data, decompress_data
+from mldataforge.jinx import CompressionPolicy, JinxSampleEncoder
+from mldataforge.encoding import a85decode, a85encode
+from mldataforge.utils import load_jinx_paths, save_jinx
+import numpy as np
+import orjson
+import os
 import pytest
+import re
+import tempfile
+import zstandard
+
+def clean(x):
+    return re.sub(r'[^A-Za-z0-9._-]', '', str(x))
+
+@pytest.mark.parametrize("size", [0, 1, 3, 4, 255, 256, 257, 4099, 2**16 + 1])
+@pytest.mark.parametrize("kind", ["random", "zeros", "spaces", "mixed"])
+def test_a85_codec(size, kind):
+    rng = np.random.default_rng(size)
+    if kind == "random":
+        data = rng.integers(0, 256, size=size, dtype=np.uint8).tobytes()
+    elif kind == "zeros":
+        data = bytes(size)
+    elif kind == "spaces":
+        data = b" " * size
+    else:
+        data = rng.choice(np.array([0, 0, 32, 255], dtype=np.uint8), size=size).tobytes()
+    encoded = base64.a85encode(data)
+    assert a85encode(data) == encoded
+    assert a85decode(encoded) == data
+    assert a85decode(base64.a85encode(data, foldspaces=True)) == data
+
+@pytest.mark.parametrize("size", [0, 1, 255, 2**16 + 1, 2**18])
+@pytest.mark.parametrize("ext", ["br", "bz2", "gz", "lz4", "lzma", "snappy", "xz", "zst"])
+def test_codecs(size, ext):
+    data = np.random.default_rng(size).integers(0, 16, size=size, dtype=np.uint8).tobytes()
+    for view in (data, memoryview(data), bytearray(data)):
+        compressed = compress_data(view, ext)
+        assert decompress_data(compressed, ext) == data
+        assert decompress_data(memoryview(compressed), ext, size=size) == data
+    if ext == "zst":
+        output = io.BytesIO()
+        with zstandard.ZstdCompressor(level=1).stream_writer(output, closefd=False) as writer:
+            writer.write(data)
+        assert size == 0 or zstandard.frame_content_size(output.getvalue()) == -1
+        assert decompress_data(output.getvalue(), ext) == data
+        assert decompress_data(output.getvalue(), ext, size=size) == data
+    with pytest.raises(ValueError):
+        compress_data(data, "unknown")
 
 @pytest.mark.parametrize("encoding", [
     pytest.param("a85", marks=pytest.mark.dependency(name="encoding_a85", dependency=["convert_jsonl_jinx"], scope="session")),
@@ -81,3 +131,151 @@ def test_decoding(encoding, tmp_dir, jsonl_tools):
         override_encoding=None,
     )
     assert jsonl_tools.equal(str(tmp_dir / "test.jsonl"), output_file), f"Files {output_file} and test.jsonl are different"
+
+@pytest.mark.parametrize("encoding", ["a85", "b64", "hex"])
+@pytest.mark.parametrize("compression", [None, "zstd"])
+@pytest.mark.parametrize("index_cache", [False, True])
+def test_index_decoding(encoding, compression, index_cache, tmp_dir):
+    output_path = tmp_dir / f"test.index.{encoding}.{compression}.{index_cache}.jinx"
+    save_jinx(
+        ({"id": i, "payload": np.arange(i % 17, dtype=np.int32)} for i in range(1000)),
+        str(output_path),
+        compression=compression,
+        overwrite=True,
+        yes=True,
+        compress_threshold=2**6,
+        compress_ratio=1.0,
+        encoding=encoding,
+    )
+    tmp_before = set(os.listdir(tempfile.gettempdir()))
+    for _ in range(2):
+        ids = [sample["id"] for sample in load_jinx_paths([str(output_path)], encoding=encoding, index_cache=index_cache)]
+        assert ids == list(range(1000))
+        assert output_path.with_suffix(".idx").exists() == index_cache
+    assert set(os.listdir(tempfile.gettempdir())) <= tmp_before, "Index decoding left files in the temp directory"
+
+@pytest.mark.parametrize("encoding", ["a85", "b64"])
+@pytest.mark.parametrize("workers", [None, 2])
+@pytest.mark.parametrize("binary_threshold", [None, 2**6])
+def test_zstd_dictionaries(encoding, workers, binary_threshold, tmp_dir):
+    phrases = ["Can you help me with", "Sure, here is", "Please explain", "In summary,"]
+    def samples():
+        for i in range(2000):
+            yield {
+                "id": i,
+                "messages": [{"role": role, "content": f"{phrases[(i + j) % 4]} item {i} of the dataset, detail {i % 97}."} for j, role in enumerate(["user", "assistant"])],
+                "meta": {"note": f"generated sample number {i} for testing the dictionaries"},
+            }
+    paths = {}
+    for dict_size in (None, 2**12):
+        paths[dict_size] = tmp_dir / f"test.zdict.{encoding}.{workers}.{binary_threshold}.{dict_size}.jinx"
+        save_jinx(samples(), str(paths[dict_size]), compression="zstd", overwrite=True, yes=True, compress_threshold=2**5, compress_ratio=1.0, encoding=encoding, binary_threshold=binary_threshold, workers=workers, zstd_dict_size=dict_size, zstd_dict_samples=2**9)
+    assert os.path.getsize(paths[2**12]) < os.path.getsize(paths[None])
+    for lazy in (False, True):
+        loaded = [{"id": s["id"], "messages": [dict(m) for m in s["messages"]], "meta": dict(s["meta"])} for s in load_jinx_paths([str(paths[2**12])], lazy=lazy)]
+        assert loaded == list(samples())
+    joined = tmp_dir / f"test.zdict.{encoding}.{workers}.{binary_threshold}.joined.jinx"
+    join_jinx(output_file=str(joined), jinx_paths=[str(paths[2**12])], compression="zstd", compression_args={"processes": 64}, overwrite=True, yes=True, shard_size=None, trafo=None, mmap=False, shuffle=None, index=None, sort_key=None, lazy=True, compress_threshold=2**5, compress_ratio=1.0, encoding=encoding, binary_threshold=binary_threshold, ext_sep=".", override_encoding=None)
+    loaded = [{"id": s["id"], "messages": [dict(m) for m in s["messages"]], "meta": dict(s["meta"])} for s in load_jinx_paths([str(joined)])]
+    assert loaded == list(samples())
+
+def test_zstd_dictionary_level(tmp_dir):
+    def samples():
+        for i in range(1000):
+            yield {"id": i, "text": f"Sure, here is item {i} of the dataset with detail {i % 97} and {i * 7919 % 1013}."}
+    sizes = {}
+    for level in (1, 19):
+        output_path = tmp_dir / f"test.zdict.level{level}.jinx"
+        save_jinx(samples(), str(output_path), compression="zstd", compression_args={"level": level}, overwrite=True, yes=True, compress_threshold=2**5, compress_ratio=1.0, zstd_dict_size=2**12, zstd_dict_samples=2**9)
+        assert [dict(s) for s in load_jinx_paths([str(output_path)])] == list(samples())
+        sizes[level] = os.path.getsize(output_path)
+    assert sizes[19] < sizes[1]
+
+def test_compression_policy():
+    rng = np.random.default_rng(0)
+    policy = CompressionPolicy(compression="zst", rules="images=none,text=lz4:3")
+    for _ in range(2**10):
+        policy.compress("blob", rng.bytes(2**8))
+        assert policy.compress("images", b"a" * 2**8)[1] is None
+        assert policy.compress("text", b"a" * 2**8)[1] == "lz4"
+        assert policy.compress("zeros", bytes(2**8))[1] == "zst"
+    assert policy.stats["blob"]["trials"] < policy.stats["blob"]["values"] // 4
+    assert policy.stats["images"]["trials"] == 0
+    assert policy.stats["zeros"]["trials"] == policy.stats["zeros"]["values"]
+    report = "\n".join(policy.report())
+    assert "blob: skip" in report and "images: rule none" in report and "text: rule lz4:3" in report and "zeros: zst" in report
+    merged = CompressionPolicy(compression="zst")
+    skipping, compressing = CompressionPolicy(compression="zst"), CompressionPolicy(compression="zst")
+    for _ in range(2**5):
+        skipping.compress("mixed", rng.bytes(2**8))
+    for _ in range(2**8):
+        compressing.compress("mixed", bytes(2**8))
+    for worker in (skipping, compressing, compressing):
+        merged.merge(worker.stats)
+    assert "mixed: skip" in skipping.report()[0] and "mixed: zst" in merged.report()[0]
+    assert merged.stats["mixed"]["trials"] == skipping.stats["mixed"]["trials"] + 2**9
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_compress_rules(workers, tmp_dir):
+    def samples():
+        rng = np.random.default_rng(0)
+        for i in range(500):
+            yield {"id": i, "image": rng.bytes(2**9), "text": f"sample {i} " * 20, "noise": rng.bytes(2**8)}
+    output_path = tmp_dir / f"test.rules.{workers}.jinx"
+    save_jinx(samples(), str(output_path), compression="snappy", overwrite=True, yes=True, compress_threshold=2**6, compress_ratio=1.0, workers=workers, compress_rules="image=none,text=zstd:3")
+    with open(output_path, "rb") as f:
+        first = orjson.loads(f.readline())
+    assert set(first) == {"id", "image.raw", "text.str.zst", "noise.raw"}
+    loaded = [dict(sample) for sample in load_jinx_paths([str(output_path)])]
+    assert loaded == list(samples())
+
+def test_compress_rules_override_dictionaries(tmp_dir):
+    def samples():
+        for i in range(500):
+            yield {"id": i, "text": f"sample {i} " * 20, "tag": f"label {i % 7} " * 20}
+    output_path = tmp_dir / "test.rules.zdict.jinx"
+    save_jinx(samples(), str(output_path), compression="zstd", overwrite=True, yes=True, compress_threshold=2**6, zstd_dict_size=2**12, compress_rules="text=none")
+    with open(output_path, "rb") as f:
+        first = orjson.loads(f.readline())
+    assert first["text"] == "sample 0 " * 20
+    assert "tag.str.zdict" in first
+    loaded = [dict(sample) for sample in load_jinx_paths([str(output_path)])]
+    assert loaded == list(samples())
+
+@pytest.mark.parametrize("binary_threshold,block_compression,mmap", [(None, None, False), (2**6, None, False), (2**6, "zstd", False), (2**6, None, True)], ids=clean)
+def test_raw_passthrough(binary_threshold, block_compression, mmap, tmp_dir, monkeypatch):
+    def samples():
+        for i in range(2_000):
+            yield {"id": i, "text": f"sample {i} " * (i % 13), "nested": {"payload": np.random.default_rng(i).bytes(i % 151)}}
+    settings = dict(compression="zstd", compress_threshold=2**5, compress_ratio=1.0, encoding="b64", binary_threshold=binary_threshold)
+    source = tmp_dir / f"test.raw.{binary_threshold}.{block_compression}.source"
+    output = tmp_dir / f"test.raw.{binary_threshold}.{block_compression}.{mmap}.output"
+    save_jinx(samples(), str(source), shard_size=2**15, overwrite=True, yes=True, block_compression=block_compression, **settings)
+    def fail(*args, **kwargs):
+        raise AssertionError("samples were re-encoded")
+    with monkeypatch.context() as m:
+        m.setattr(JinxSampleEncoder, "_prepare_sample", fail)
+        save_jinx(load_jinx_paths([str(source)], mmap=mmap), str(output), shard_size=2**14, overwrite=True, yes=True, **settings)
+    assert any(output.glob("*.binx")) == (binary_threshold is not None)
+    expected = [dict(sample, nested=dict(sample["nested"])) for sample in samples()]
+    loaded = [dict(sample, nested=dict(sample["nested"])) for sample in load_jinx_paths([str(output)])]
+    assert loaded == expected
+    save_jinx(load_jinx_paths([str(source)]), str(output), shard_size=2**14, overwrite=True, yes=True, **dict(settings, encoding="a85"))
+    loaded = [dict(sample, nested=dict(sample["nested"])) for sample in load_jinx_paths([str(output)])]
+    assert loaded == expected
+
+def test_raw_passthrough_nested_bins(tmp_dir, monkeypatch):
+    sources, expected = [], []
+    for name in ("a", "b"):
+        rng = np.random.default_rng(len(sources))
+        samples = [{"parts": [{"blob": rng.bytes(300)}, {"blob": rng.bytes(280)}], "top": rng.bytes(400)} for _ in range(20)]
+        sources.append(str(tmp_dir / f"test.raw.nested.{name}.jinx"))
+        save_jinx(iter(samples), sources[-1], binary_threshold=256, overwrite=True, yes=True)
+        expected.extend(samples)
+    output = tmp_dir / "test.raw.nested.output.jinx"
+    def fail(*args, **kwargs):
+        raise AssertionError("samples were re-encoded")
+    with monkeypatch.context() as m:
+        m.setattr(JinxSampleEncoder, "_prepare_sample", fail)
+        save_jinx(load_jinx_paths(sources), str(output), binary_threshold=256, overwrite=True, yes=True)
+    assert list(load_jinx_paths([str(output)])) == expected
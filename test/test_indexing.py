@@ -1,8 +1,11 @@
+import click
+from concurrent.futures import ThreadPoolExecutor
 import filecmp
-from mldataforge.commands.index import index_identity, index_join, index_slice
+from mldataforge.commands.index import index_identity, index_join, index_manifest, index_slice
 from mldataforge.commands.join import join_jinx, join_mds
-from mldataforge.indexing import shuffle_permutation
-from mldataforge.utils import save_jinx, save_mds
+from mldataforge.indexing import IndexedDatasetView, shuffle_permutation
+from mldataforge.jinx import MANIFEST_NAME, JinxDatasetReader, JinxShardReader, JinxShardWriter, read_jinx_header, read_manifest
+from mldataforge.utils import ConcatDataset, load_jinx_paths, load_mds_directories, save_jinx, save_mds
 import numpy as np
 import pytest
 import re
@@ -310,3 +313,99 @@ def test_sorting(fmt, param, sort_key, input_directory, tmp_dir, request, jsonl_
         assert len(dircmp.left_only) == 0, f"Left only files: {dircmp.left_only}"
         assert len(dircmp.right_only) == 0, f"Right only files: {dircmp.right_only}"
         assert len(dircmp.funny_files) == 0, f"Funny files: {dircmp.funny_files}"        
+
+@pytest.mark.parametrize("fmt,param", [
+    ("jinx", {"lazy": False, "mmap": False, "shard_size": None}),
+    ("jinx", {"lazy": False, "mmap": False, "shard_size": 2**16}),
+    ("jinx", {"lazy": True, "mmap": True, "shard_size": 2**16}),
+    ("mds", {"shard_size": 2**26}),
+    ("mds", {"shard_size": 2**16}),
+], ids=clean)
+def test_gather(fmt, param, tmp_dir, text_samples):
+    samples = text_samples()
+    output = tmp_dir / f"test.gather.{clean(param)}.{fmt}"
+    if fmt == "jinx":
+        save_jinx(samples, str(output), compression=None, compression_args={"processes": 64}, shard_size=param["shard_size"], size_hint=None, overwrite=True, yes=True, trafo=None)
+        ds = load_jinx_paths([str(output)], lazy=param["lazy"], mmap=param["mmap"])
+    else:
+        save_mds(samples, str(output), compression=None, shard_size=param["shard_size"], size_hint=None, overwrite=True, yes=True, trafo=None, pigz=False)
+        ds = load_mds_directories([str(output)], reader="ram")
+    rng = np.random.default_rng(42)
+    indices = np.concatenate([rng.integers(0, len(ds), size=1000), np.arange(100, 200), [0, len(ds) - 1, 0]])
+    expected = [int(i) for i in indices]
+    assert [sample["id"] for sample in ds.__getitems__(indices)] == expected
+    concat = ConcatDataset([ds, ds])
+    assert [sample["id"] for sample in concat.__getitems__(indices + len(ds))] == expected
+    view = IndexedDatasetView(ds, shuffle_permutation(len(ds), seed=42), batch_size=2**8)
+    assert [sample["id"] for sample in view] == [int(i) for i in view.indices]
+    assert [sample["id"] for sample in view[10:500]] == [int(i) for i in view.indices[10:500]]
+    with pytest.raises(IndexError):
+        ds.__getitems__([len(ds)])
+
+@pytest.mark.parametrize("binary_threshold", [None, 2**6])
+def test_manifest(binary_threshold, tmp_dir, text_samples):
+    output = tmp_dir / f"test.manifest.{binary_threshold}.jinx"
+    save_jinx(text_samples(), str(output), compression=None, compression_args={"processes": 64}, shard_size=2**15, size_hint=None, overwrite=True, yes=True, trafo=None, binary_threshold=binary_threshold)
+    manifest = read_manifest(output)
+    shards = sorted(output.glob("shard-*.jinx"))
+    assert [entry["path"] for entry in manifest] == [shard.name for shard in shards]
+    assert [entry["num_samples"] for entry in manifest] == [read_jinx_header(shard)["num_samples"] for shard in shards]
+    assert [entry["size"] for entry in manifest] == [shard.stat().st_size for shard in shards]
+    assert all(entry["binx"] == (binary_threshold is not None) for entry in manifest)
+    with JinxDatasetReader(str(output)) as ds:
+        assert len(ds) == 10_000
+        assert [sample["id"] for sample in ds] == list(range(10_000))
+    original = (output / MANIFEST_NAME).read_bytes()
+    (output / MANIFEST_NAME).unlink()
+    index_manifest(jinx_directories=[str(output)], overwrite=False, yes=True)
+    assert (output / MANIFEST_NAME).read_bytes() == original
+    with pytest.raises(click.BadParameter):
+        index_manifest(jinx_directories=[str(output)], overwrite=False, yes=True)
+    index_manifest(jinx_directories=[str(output)], overwrite=True, yes=True)
+    assert (output / MANIFEST_NAME).read_bytes() == original
+
+def test_stale_manifest(tmp_dir, text_samples):
+    output = tmp_dir / "test.manifest.stale.jinx"
+    save_jinx(text_samples(), str(output), shard_size=2**15, overwrite=True, yes=True)
+    shards = sorted(output.glob("shard-*.jinx"))
+    assert len(read_manifest(output)) == len(shards) > 3
+    expected = list(text_samples())
+    lengths = [read_jinx_header(shard)["num_samples"] for shard in shards]
+    starts = np.cumsum([0] + lengths).tolist()
+    # rewrite the second shard, remove the last one and add a new one behind the manifest's back
+    save_jinx(({"id": -i} for i in range(5)), str(shards[1]), overwrite=True, yes=True)
+    shards[-1].unlink()
+    save_jinx(({"id": 10_000 + i} for i in range(3)), str(output / "shard-99999.jinx"), overwrite=True, yes=True)
+    expected = expected[:starts[1]] + [{"id": -i} for i in range(5)] + expected[starts[2]:starts[-2]] + [{"id": 10_000 + i} for i in range(3)]
+    with JinxDatasetReader(str(output)) as ds:
+        assert len(ds) == len(expected)
+        assert list(ds) == expected
+        assert ds[starts[1] + 4] == {"id": -4}
+
+@pytest.mark.parametrize("lazy,binary_threshold", [(False, None), (False, 2**6), (True, 2**6)], ids=clean)
+def test_threaded_reads(lazy, binary_threshold, tmp_dir):
+    output = tmp_dir / f"test.threaded.{lazy}.{binary_threshold}.jinx"
+    save_jinx(({"id": i, "payload": bytes([i % 256]) * (i % 301)} for i in range(5_000)), str(output), compression=None, compression_args={"processes": 64}, shard_size=None, size_hint=None, overwrite=True, yes=True, trafo=None, binary_threshold=binary_threshold)
+    indices = [int(i) for i in shuffle_permutation(5_000, seed=42)]
+    with JinxShardReader(str(output), lazy=lazy) as reader:
+        def read(i):
+            sample = reader[i]
+            return sample["id"], bytes(sample["payload"])
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(read, indices))
+    assert results == [(i, bytes([i % 256]) * (i % 301)) for i in indices]
+
+@pytest.mark.parametrize("offsets_memory", [2**6, 2**14, 2**27])
+def test_offsets_spill(offsets_memory, tmp_dir):
+    output_dir = tmp_dir / f"test.offsets.{offsets_memory}"
+    output_dir.mkdir(exist_ok=True)
+    output = output_dir / "shard.jinx"
+    writer = JinxShardWriter(str(output), offsets_memory=offsets_memory)
+    for i in range(5_000):
+        writer.write_sample({"id": i, "text": "x" * (i % 37)})
+    header = writer.close(shard_id=0)
+    assert header["num_samples"] == 5_000
+    assert [p.name for p in output_dir.iterdir()] == ["shard.jinx"]
+    with JinxShardReader(str(output)) as reader:
+        assert [reader[i]["id"] for i in range(0, 5_000, 7)] == list(range(0, 5_000, 7))
+        assert reader[4_999]["text"] == "x" * (4_999 % 37)
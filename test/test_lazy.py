@@ -1,9 +1,15 @@
 from mldataforge.commands.join import join_jinx, join_mds
 from mldataforge.indexing import shuffle_permutation
-from mldataforge.utils import save_jinx, save_mds
+from mldataforge.jinx import JinxDatasetReader, parse_where, read_manifest, shard_may_match
+from mldataforge.lazy_dict import LazyDict
+from mldataforge.mds import MDSRAMDatasetReader
+from mldataforge.utils import load_jinx_paths, load_mds_directories, load_parquet_files, save_jinx, save_mds, save_parquet
+import math
 import numpy as np
+import os
 import pytest
 import re
+import shutil
 
 def clean(x):
     return re.sub(r'[^A-Za-z0-9._-]', '', str(x))
@@ -100,3 +106,177 @@ def test_lazy(fmt, param, compression, trafo, tmp_dir, request):
             sort_key=None,
         )
     assert projected_file.exists(), f"File {projected_file} does not exist"
+
+@pytest.mark.parametrize("fmt,param", [
+    ("jinx", {"lazy": True, "mmap": False}),
+    ("jinx", {"lazy": False, "mmap": False}),
+    ("jinx", {"lazy": False, "mmap": True}),
+    ("mds", "ram"),
+    ("mds", "bulk"),
+    ("parquet", None),
+], ids=clean)
+def test_columns(fmt, param, tmp_dir):
+    def samples():
+        for i in range(1_000):
+            yield {"id": i, "text": f"sample {i}", "payload": np.full(2**8, i, dtype=np.uint64)}
+    output = tmp_dir / f"test.columns.{fmt}"
+    if fmt == "jinx":
+        save_jinx(samples(), str(output), compression="zstd", shard_size=2**16, overwrite=True, yes=True, trafo=None, binary_threshold=2**8)
+        ds = load_jinx_paths([str(output)], columns=["id", "text"], **param)
+    elif fmt == "mds":
+        save_mds(samples(), str(output), compression=None, shard_size=2**16, overwrite=True, yes=True, trafo=None, pigz=False)
+        ds = load_mds_directories([str(output)], reader=param, columns=["id", "text"])
+    else:
+        save_parquet(({**sample, "payload": sample["payload"].tolist()} for sample in samples()), str(output), overwrite=True, yes=True)
+        ds = load_parquet_files([str(output)], columns=["id", "text"])
+    projected = [dict(sample) for sample in ds]
+    assert projected == [{"id": i, "text": f"sample {i}"} for i in range(1_000)]
+
+def test_lazy_dict():
+    calls = []
+    def transform(key, value):
+        calls.append(key)
+        return value.upper()
+    d = LazyDict({"a.str": "x", "b": 1, "c.zst": "y", "n": {"d.str": "z"}}, transform, lambda k: k.split(".", 1)[0])
+    assert sorted(d) == ["a", "b", "c", "n"] and len(d) == 4
+    assert "a" in d and "a.str" in d and "e" not in d
+    assert d["a"] == "X" and d["a"] == "X" and calls == ["a.str"]
+    assert d["n"]["d"] == "Z" and d["b"] == 1
+    del d["c"]
+    assert "c" not in d and len(d) == 3 and not any(key.startswith("c") for key, _ in d.raw_items())
+    d["c.str"] = "w"
+    assert d["c"] == "W" and len(d) == 4
+    d["b"] = 2
+    assert d.materialize() == {"a": "X", "b": 2, "c": "W", "n": {"d": "Z"}}
+    with pytest.raises(KeyError):
+        d["e"]
+    with pytest.raises(KeyError):
+        del d["e"]
+
+def test_lazy_dict_nested():
+    messages = [{"role.str": "user", "turn": i} for i in range(500)]
+    d = LazyDict({"id": 1, "messages": messages, "meta": {"tags": [{"name.str": "a"}]}}, lambda key, value: value.upper(), lambda k: k.split(".", 1)[0])
+    assert d["id"] == 1
+    assert d._store["messages"] is messages
+    assert isinstance(d["messages"][3], LazyDict) and d["messages"] is d["messages"]
+    assert d["messages"][3]["role"] == "USER" and messages[3] == {"role.str": "user", "turn": 3}
+    assert isinstance(d._store["meta"], dict) and isinstance(d["meta"], LazyDict)
+    assert d["meta"]["tags"][0]["name"] == "A"
+    assert dict(d.raw_items())["meta"] is d["meta"]
+    assert d.eagerize(d)["messages"][4] == {"role.str": "user", "turn": 4}
+
+@pytest.mark.parametrize("mmap,max_open_shards,max_open_bytes", [
+    (False, 1, 2**32),
+    (False, 4, 2**32),
+    (True, 4, 2**32),
+    (True, 2**7, 2**12),
+], ids=clean)
+def test_lazy_shards(mmap, max_open_shards, max_open_bytes, tmp_dir, text_samples):
+    output = tmp_dir / "test.lazy_shards.jinx"
+    save_jinx(text_samples(), str(output), compression=None, compression_args={"processes": 64}, shard_size=2**15, size_hint=None, overwrite=True, yes=True, trafo=None)
+    with JinxDatasetReader(str(output), mmap=mmap, max_open_shards=max_open_shards, max_open_bytes=max_open_bytes) as ds:
+        assert len(ds.shard_paths) > 8
+        assert len(ds.shards.open) == 0
+        assert len(ds) == 10_000
+        indices = shuffle_permutation(len(ds), seed=42)[:2000]
+        assert [sample["id"] for sample in ds.__getitems__(indices)] == [int(i) for i in indices]
+        assert [ds[int(i)]["id"] for i in indices[:100]] == [int(i) for i in indices[:100]]
+        assert len(ds.shards.open) <= max_open_shards
+        assert len(ds.shards.open) == 1 or ds.shards.open_bytes <= max_open_bytes
+        assert [sample["id"] for sample in ds] == list(range(10_000))
+
+def test_lazy_evicted_bins(tmp_dir):
+    output = tmp_dir / "test.lazy_evicted.jinx"
+    payload = lambda i: bytes([i % 256]) * (64 + i % 97)
+    save_jinx(({"id": i, "payload": payload(i)} for i in range(5_000)), str(output), shard_size=2**15, overwrite=True, yes=True, binary_threshold=2**5)
+    fds = lambda: len(os.listdir("/proc/self/fd"))
+    with JinxDatasetReader(str(output), lazy=True, max_open_shards=2) as ds:
+        assert len(ds.shard_paths) > 8
+        indices = [int(i) for i in shuffle_permutation(len(ds), seed=42)[:500]]
+        samples = [ds[i] for i in indices]
+        before = fds()
+        assert [bytes(sample["payload"]) for sample in samples] == [payload(i) for i in indices]
+        assert fds() <= before + 2
+        assert len(ds.shards.open) <= 2
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_key_stats(workers, tmp_dir):
+    def samples():
+        for i in range(3_000):
+            yield {"id": i, "text": "x" * (i % 50), "score": None if i % 7 == 0 else i / 10, "tags": list(range(i % 5))}
+    output = tmp_dir / f"test.stats.{workers}"
+    save_jinx(samples(), str(output), shard_size=2**14, overwrite=True, yes=True, compression="zstd", workers=workers, stats_keys=["id", "text", "score", "tags", "missing"])
+    manifest = read_manifest(output)
+    assert len(manifest) > 2
+    start = 0
+    for entry in manifest:
+        stats = entry["key_stats"]
+        end = start + entry["num_samples"]
+        assert stats["id"] == {"count": end - start, "nulls": 0, "min": start, "max": end - 1}
+        assert stats["text"]["min_len"] == 0 and stats["text"]["max_len"] == 49
+        assert stats["score"]["nulls"] == sum(1 for i in range(start, end) if i % 7 == 0)
+        assert stats["tags"]["max_len"] == 4
+        assert stats["missing"] == {"count": 0, "nulls": end - start}
+        start = end
+    where = "id>=1000,id<1200,len(text)>=40"
+    with JinxDatasetReader(output, where=where) as ds:
+        assert ds.pruned == len(manifest) - sum(1 for entry in manifest if entry["key_stats"]["id"]["min"] < 1200 and entry["key_stats"]["id"]["max"] >= 1000)
+    expected = [sample for sample in samples() if 1000 <= sample["id"] < 1200 and len(sample["text"]) >= 40]
+    assert list(load_jinx_paths([str(output)], where=where)) == expected
+    assert list(load_jinx_paths([str(output)], where="len(missing)>0")) == []
+    with pytest.raises(ValueError):
+        parse_where("id~3")
+
+def test_key_stats_non_finite(tmp_dir):
+    def samples():
+        for i in range(1_000):
+            yield {"id": i, "score": [float("inf"), float("-inf"), float("nan")][i % 3] if i % 4 == 0 else i / 10}
+    output = tmp_dir / "test.stats.non_finite"
+    save_jinx(samples(), str(output), shard_size=2**12, overwrite=True, yes=True, stats_keys=["score"])
+    for entry in read_manifest(output):
+        assert all(math.isfinite(entry["key_stats"]["score"][bound]) for bound in ("min", "max"))
+    expected = [sample for sample in samples() if math.isfinite(sample["score"]) and sample["score"] > 50]
+    assert list(load_jinx_paths([str(output)], where="score>50")) == expected
+    assert shard_may_match({"score": {"count": 1, "nulls": 0, "min": None, "max": None}}, parse_where("score>50"))
+
+def test_mds_lazy_open(tmp_dir):
+    samples = [{"id": i, "text": f"sample {i} " * (i % 11)} for i in range(3_000)]
+    source = tmp_dir / "test.lazy_open.mds"
+    scratch = tmp_dir / "test.lazy_open.cache"
+    shutil.rmtree(scratch, ignore_errors=True)
+    save_mds(iter(samples), str(source), compression="zstd", shard_size=2**13, overwrite=True, yes=True, pigz=False)
+    with MDSRAMDatasetReader([str(source)], split=None, scratch_dir=str(scratch), max_open_shards=2) as ds:
+        assert len(ds) == len(samples) and len(ds.readers) > 4
+        assert not ds.readers.open and not list(scratch.glob("*.mds"))
+        assert ds[len(ds) - 1] == samples[-1]
+        assert list(ds.readers.open) == [len(ds.readers) - 1] and len(list(scratch.glob("*.mds"))) == 1
+        indices = shuffle_permutation(len(ds), seed=42)
+        assert [ds[int(i)] for i in indices] == [samples[i] for i in indices]
+        assert len(ds.readers.open) <= 2
+        assert ds.__getitems__(indices) == [samples[i] for i in indices]
+        assert list(ds) == samples
+    assert not ds.readers.open
+
+@pytest.mark.parametrize("compression", [None, "zstd", "sample::zstd"])
+def test_mds_read_columns(compression, tmp_dir):
+    samples = [{"id": i, "score": (i * 37 % 101) / 10, "text": f"sample {i} " * (i % 7)} for i in range(2_000)]
+    source = tmp_dir / f"test.read_columns.{clean(compression)}.mds"
+    save_mds(iter(samples), str(source), compression=compression, shard_size=2**13, overwrite=True, yes=True, pigz=False)
+    with MDSRAMDatasetReader([str(source)], split=None) as ds:
+        assert len(ds.readers) > 2
+        columns = ds.read_columns()
+        assert sorted(columns) == ["id", "score", "text"]
+        assert columns["id"].dtype == np.int64 and columns["score"].dtype == np.float64
+        assert columns["id"].tolist() == [sample["id"] for sample in samples]
+        assert columns["score"].tolist() == [sample["score"] for sample in samples]
+        assert list(columns["text"]) == [sample["text"] for sample in samples]
+        columns = ds.read_columns(500, 1_500, columns=["score"])
+        assert list(columns) == ["score"] and columns["score"].tolist() == [sample["score"] for sample in samples[500:1_500]]
+        with pytest.raises(KeyError):
+            ds.read_columns(columns=["missing"])
+    ds = load_mds_directories([str(source)], split=None, sort_key="score")
+    assert list(ds) == sorted(samples, key=lambda sample: sample["score"])
+    ds = load_mds_directories([str(source)], split=None, sort_key="score", where="score>=5,len(text)<=30")
+    assert list(ds) == sorted([sample for sample in samples if sample["score"] >= 5 and len(sample["text"]) <= 30], key=lambda sample: sample["score"])
+    ds = load_mds_directories([str(source)], split=None, reader="streaming", where="id<100")
+    assert list(ds) == samples[:100]
@@ -0,0 +1,149 @@
+from concurrent.futures import Future
+import filecmp
+import gzip
+import json
+import os
+from mldataforge.commands.join import join_jinx
+from mldataforge.jinx import JinxDatasetReader, JinxEncoderPool
+from mldataforge.mds import MDSSampleWriter
+from mldataforge.prefetch import check_prefetch_backend, prefetch
+from mldataforge.utils import load_jinx_paths, load_mds_directories, save_jinx, save_mds
+import pytest
+import shutil
+
+@pytest.mark.parametrize("workers,unordered,binary_threshold", [
+    pytest.param(4, False, None, marks=pytest.mark.dependency(depends=["convert_jsonl_jinx"], scope="session")),
+    pytest.param(4, False, 2**8, marks=pytest.mark.dependency(depends=["convert_jsonl_jinx"], scope="session")),
+    pytest.param(4, True, None, marks=pytest.mark.dependency(depends=["convert_jsonl_jinx"], scope="session")),
+    pytest.param(4, True, 2**8, marks=pytest.mark.dependency(depends=["convert_jsonl_jinx"], scope="session")),
+])
+def test_workers(workers, unordered, binary_threshold, tmp_dir):
+    outputs = {}
+    for w in (None, workers):
+        outputs[w] = str(tmp_dir / f"test.workers.{w}.{unordered}.{binary_threshold}.jinx")
+        join_jinx(
+            output_file=outputs[w],
+            jinx_paths=[str(tmp_dir / "test.jsonl.jinx")],
+            compression="zstd",
+            compression_args={"processes": 64},
+            overwrite=True,
+            yes=True,
+            shard_size=None,
+            trafo=None,
+            mmap=False,
+            shuffle=None,
+            index=None,
+            sort_key=None,
+            lazy=False,
+            compress_threshold=2**6,
+            compress_ratio=1.0,
+            encoding="a85",
+            binary_threshold=binary_threshold,
+            ext_sep=".",
+            override_encoding=None,
+            workers=w,
+            unordered=unordered if w is not None else False,
+        )
+    if unordered:
+        expected = sorted(sample["id"] for sample in load_jinx_paths([outputs[None]]))
+        actual = sorted(sample["id"] for sample in load_jinx_paths([outputs[workers]]))
+        assert expected == actual, "Unordered workers lost or duplicated samples"
+    else:
+        assert filecmp.cmp(outputs[None], outputs[workers], shallow=False), f"Files {outputs[None]} and {outputs[workers]} are different"
+
+def test_encoder_pool_stats_order():
+    def result(values):
+        future = Future()
+        future.set_result(([], 1, {"text": {"values": values}}))
+        return future
+    with JinxEncoderPool(1) as pool:
+        for values in (3, 7, 5):
+            pool._result(result(values))
+        assert pool.compression_stats() == [{"text": {"values": 7}}]
+
+@pytest.mark.parametrize("fmt,reader,backend,depth", [
+    ("jinx", None, "thread", 1),
+    ("jinx", None, "thread", 2**10),
+    ("jinx", None, "process", 4),
+    ("mds", "ram", "thread", 2**10),
+    ("mds", "ram", "process", 4),
+    ("mds", "bulk", "thread", 2**10),
+    ("mds", "bulk", "process", 4),
+])
+def test_prefetch(fmt, reader, backend, depth, tmp_dir, text_samples):
+    samples = text_samples()
+    output = tmp_dir / f"test.prefetch.{fmt}"
+    if fmt == "jinx":
+        save_jinx(samples, str(output), compression="zstd", shard_size=2**15, overwrite=True, yes=True, trafo=None)
+        load = lambda **kwargs: load_jinx_paths([str(output)], **kwargs)
+    else:
+        save_mds(samples, str(output), compression="sample::zstd", shard_size=2**15, overwrite=True, yes=True, trafo=None, pigz=False)
+        load = lambda **kwargs: load_mds_directories([str(output)], reader=reader, **kwargs)
+    expected = list(load())
+    assert list(load(prefetch=depth, prefetch_backend=backend)) == expected
+    for i, sample in enumerate(load(prefetch=depth, prefetch_backend=backend)):
+        if i == 100:
+            break
+
+def test_prefetch_errors():
+    def failing():
+        yield from range(10)
+        raise RuntimeError("broken source")
+    with pytest.raises(RuntimeError, match="broken source"):
+        list(prefetch(failing(), 4))
+    with pytest.raises(ValueError):
+        check_prefetch_backend("fiber")
+    with pytest.raises(ValueError):
+        JinxDatasetReader([], lazy=True, prefetch=4, prefetch_backend="process")
+
+@pytest.mark.parametrize("compression,shard_workers,depth", [
+    ("gzip", 2, None),
+    ("zstd", 3, 3),
+    ("sample::zstd", 1, 4),
+])
+def test_shard_workers(compression, shard_workers, depth, tmp_dir, text_samples):
+    samples = list(text_samples())
+    output = tmp_dir / f"test.shard_workers.{compression.replace(':', '')}.mds"
+    save_mds(iter(samples), str(output), compression=compression, shard_size=2**15, overwrite=True, yes=True, trafo=None, pigz=False)
+    load = lambda **kwargs: load_mds_directories([str(output)], split=None, reader="bulk", **kwargs)
+    assert list(load(shard_workers=shard_workers, prefetch=depth)) == samples
+    for i, sample in enumerate(load(shard_workers=shard_workers, prefetch=depth)):
+        if i == 100:
+            break
+    assert list(load(shard_workers=shard_workers, columns=["id"], where="id<50")) == [{"id": i} for i in range(50)]
+    with pytest.raises(ValueError):
+        load(shard_workers=shard_workers + 1, prefetch=shard_workers)
+
+@pytest.mark.parametrize("compression,flush_workers,max_pending_shards", [
+    (None, 2, None),
+    ("zstd", 1, 1),
+    ("gz", 3, None),
+    ("sample::zstd", 4, 2),
+])
+def test_flush_workers(compression, flush_workers, max_pending_shards, tmp_dir, text_samples):
+    samples = list(text_samples())
+    columns = {"id": "int", "text": "str"}
+    outputs = {}
+    for workers in (None, flush_workers):
+        outputs[workers] = tmp_dir / f"test.flush_workers.{str(compression).replace(':', '')}.{workers}.mds"
+        shutil.rmtree(outputs[workers], ignore_errors=True)
+        for part in (samples[:6_000], samples[6_000:]):
+            with MDSSampleWriter(out=str(outputs[workers]), columns=columns, compression=compression, hashes=["sha1"], size_limit=2**15, append=True, flush_workers=workers, max_pending_shards=max_pending_shards) as writer:
+                for sample in part:
+                    writer.write(sample)
+    files = sorted(os.listdir(outputs[None]))
+    assert len(files) > 10 and sorted(os.listdir(outputs[flush_workers])) == files
+    if compression == "gz":
+        # gzip headers carry the compression time, so only the decompressed shards and the index without the hashes of
+        # the compressed files are comparable
+        def contents(output):
+            index = json.load(open(output / "index.json"))
+            for shard in index["shards"]:
+                del shard["zip_data"]["hashes"]
+            shards = [gzip.decompress((output / name).read_bytes()) for name in files if name.endswith(".gz")]
+            return index, shards
+        assert contents(outputs[None]) == contents(outputs[flush_workers])
+    else:
+        match, mismatch, errors = filecmp.cmpfiles(outputs[None], outputs[flush_workers], files, shallow=False)
+        assert not mismatch and not errors
+    assert list(load_mds_directories([str(outputs[flush_workers])], split=None, reader="bulk")) == samples